@@ -0,0 +1,103 @@
+# app/core/aquecimento.py
+"""
+Aquecimento do worker antes de receber tráfego: abre o pool de conexões até
+o tamanho mínimo e executa as consultas quentes em cada conexão, o que deixa
+prontos o cache de compilação do SQLAlchemy e os prepared statements do
+asyncpg (que são por conexão). /ready só responde 200 depois disso.
+
+As consultas são registradas pelos próprios routers com registrar_consulta().
+Cada uma roda numa transação desfeita ao final, com parâmetros que não
+encontram nada, então comandos de escrita também podem ser aquecidos.
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import DB_POOL_SIZE
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+AQUECIMENTO = os.getenv("AQUECIMENTO", "1").strip().lower() in ("1", "true", "sim", "yes", "on")
+# conexões abertas no aquecimento; o padrão é o pool_size, que o pool mantém abertas depois
+AQUECIMENTO_CONEXOES = int(os.getenv("AQUECIMENTO_CONEXOES", str(DB_POOL_SIZE)))
+
+_consultas: list[tuple[str, Callable]] = []
+
+_estado = {
+    "pronto": False,
+    "erro": None,
+    "importacao_s": None,
+    "inicializacao_s": None,
+    "aquecimento_s": None,
+    "conexoes": 0,
+    "consultas": 0,
+}
+
+
+def registrar_consulta(nome: str, montar: Callable):
+    """montar() devolve o comando (select/insert/update) a ser executado em cada conexão do aquecimento."""
+    _consultas.append((nome, montar))
+
+
+def marcar_importacao(inicio: float):
+    """Tempo desde inicio (perf_counter no topo de app/main.py) até o app montado."""
+    _estado["importacao_s"] = round(time.perf_counter() - inicio, 3)
+
+
+def pronto() -> bool:
+    return _estado["pronto"]
+
+
+def estado() -> dict:
+    return dict(_estado)
+
+
+async def _aquecer_conexao(engine) -> int:
+    executadas = 0
+    async with engine.connect() as conn:
+        async with AsyncSession(bind=conn) as db:
+            for nome, montar in _consultas:
+                try:
+                    await db.execute(montar())
+                    executadas += 1
+                except Exception as e:
+                    print(f"Aquecimento: consulta {nome} falhou: {e}")
+                    await db.rollback()
+            await db.rollback()
+    return executadas
+
+
+async def aquecer(engine, preparar: Callable | None = None):
+    """
+    Roda preparar() (tarefas de inicialização que dependem do banco) e o
+    aquecimento, e marca o worker como pronto. As conexões são abertas todas
+    ao mesmo tempo para que cada uma seja uma conexão diferente do pool.
+    """
+    inicio = time.perf_counter()
+    try:
+        if preparar is not None:
+            await preparar()
+        _estado["inicializacao_s"] = round(time.perf_counter() - inicio, 3)
+
+        if AQUECIMENTO and engine is not None:
+            inicio_aquecimento = time.perf_counter()
+            executadas = await asyncio.gather(*[_aquecer_conexao(engine) for _ in range(AQUECIMENTO_CONEXOES)])
+            _estado["aquecimento_s"] = round(time.perf_counter() - inicio_aquecimento, 3)
+            _estado["conexoes"] = len(executadas)
+            _estado["consultas"] = sum(executadas)
+        _estado["pronto"] = True
+    except Exception as e:
+        _estado["erro"] = str(e)
+        print(f"❌ Falha na inicialização do worker: {e}")
+        return
+
+    print(
+        f"Worker pronto: importação {_estado['importacao_s']}s, inicialização {_estado['inicializacao_s']}s, "
+        f"aquecimento {_estado['aquecimento_s']}s ({_estado['conexoes']} conexões, {_estado['consultas']} consultas)"
+    )
@@ -0,0 +1,194 @@
+# app/core/autocompletar.py
+"""
+Autocomplete de produtos por código e nome_basico (GET /api/produtos/autocomplete)
+servido da memória do worker, sem ir ao banco. O índice são listas
+ordenadas de chaves com busca binária (bisect): o código como texto, o nome
+inteiro sem acentos em minúsculas e o nome a partir de cada palavra, para
+que "inox" também encontre "Parafuso inox".
+
+O índice é montado na inicialização (preparar_banco em app/main.py) e os
+routers de cadastro, edição e exclusão o atualizam depois do commit. As
+escritas feitas por outros workers chegam pela versão do cadastro
+(tabela versaoprodutos, migração 0005): cada worker a consulta a cada
+AUTOCOMPLETE_INTERVALO segundos e, quando ela muda, aplica só os códigos
+alterados desde a sua versão (tabela alteracoesprodutos, migração 0010). O
+índice só é remontado do zero quando o registro não cobre o intervalo
+(worker muito atrasado) ou quando um comando alterou produtos demais
+(importação em lote).
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.busca import palavras
+from app.models.produto import DimProduto
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# intervalo entre as consultas à versão do cadastro (atraso máximo para ver escritas de outros workers)
+AUTOCOMPLETE_INTERVALO = float(os.getenv("AUTOCOMPLETE_INTERVALO", "2"))
+
+_VERSAO = text("SELECT versao FROM versaoprodutos WHERE id = 1")
+# primeira versão registrada no intervalo e se alguma pede remontar tudo (codigo NULL)
+_INTERVALO_ALTERACOES = text(
+    "SELECT min(versao), bool_or(codigo IS NULL) FROM alteracoesprodutos "
+    "WHERE versao > :desde AND versao <= :ate"
+)
+# códigos alterados no intervalo com o nome atual (NULL: produto removido)
+_ALTERACOES = text(
+    "SELECT a.codigo, p.nome_basico "
+    "FROM (SELECT DISTINCT codigo FROM alteracoesprodutos WHERE versao > :desde AND versao <= :ate) a "
+    "LEFT JOIN dimproduto p ON p.codigo = a.codigo"
+)
+
+
+def _normalizar(texto: str) -> str:
+    return " ".join(palavras(texto))
+
+
+def _sufixos(nome: str) -> list[str]:
+    """O nome a partir da segunda palavra em diante ("parafuso sextavado inox" -> "sextavado inox", "inox")."""
+    termos = palavras(nome)
+    return [" ".join(termos[i:]) for i in range(1, len(termos))]
+
+
+class _ListaPrefixos:
+    """Chaves ordenadas e, na mesma posição, o código do produto de cada uma."""
+
+    __slots__ = ("chaves", "codigos")
+
+    def __init__(self, pares: list[tuple[str, int]] = ()):
+        pares = sorted(pares)
+        self.chaves = [chave for chave, _ in pares]
+        self.codigos = [codigo for _, codigo in pares]
+
+    def adicionar(self, chave: str, codigo: int):
+        i = bisect_left(self.chaves, chave)
+        self.chaves.insert(i, chave)
+        self.codigos.insert(i, codigo)
+
+    def remover(self, chave: str, codigo: int):
+        i = bisect_left(self.chaves, chave)
+        while i < len(self.chaves) and self.chaves[i] == chave:
+            if self.codigos[i] == codigo:
+                del self.chaves[i]
+                del self.codigos[i]
+                return
+            i += 1
+
+    def buscar(self, prefixo: str, vistos: dict[int, None], limite: int):
+        i = bisect_left(self.chaves, prefixo)
+        while len(vistos) < limite and i < len(self.chaves) and self.chaves[i].startswith(prefixo):
+            vistos.setdefault(self.codigos[i])
+            i += 1
+
+
+class IndiceAutocompletar:
+    def __init__(self):
+        self.versao: int | None = None
+        self.carregado_em: float | None = None
+        self._nomes: dict[int, str] = {}
+        self._codigos = _ListaPrefixos()
+        self._nomes_inteiros = _ListaPrefixos()
+        self._sufixos = _ListaPrefixos()
+
+    @property
+    def pronto(self) -> bool:
+        return self.versao is not None
+
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+    async def carregar(self, db: AsyncSession):
+        """Monta o índice do zero. A versão é lida antes dos produtos: se mudar no meio, a próxima consulta remonta."""
+        versao = (await db.execute(_VERSAO)).scalar_one()
+        result = await db.execute(select(DimProduto.codigo, DimProduto.nome_basico))
+        nomes = {codigo: nome for codigo, nome in result.all()}
+
+        # listas novas trocadas de uma vez, para que as buscas não vejam o índice pela metade
+        self._codigos = _ListaPrefixos([(str(codigo), codigo) for codigo in nomes])
+        self._nomes_inteiros = _ListaPrefixos([(_normalizar(nome), codigo) for codigo, nome in nomes.items()])
+        self._sufixos = _ListaPrefixos(
+            [(sufixo, codigo) for codigo, nome in nomes.items() for sufixo in _sufixos(nome)]
+        )
+        self._nomes = nomes
+        self.versao = versao
+        self.carregado_em = time.time()
+
+    def adicionar(self, codigo: int, nome_basico: str):
+        if codigo in self._nomes:
+            self.remover(codigo)
+        self._nomes[codigo] = nome_basico
+        self._codigos.adicionar(str(codigo), codigo)
+        self._nomes_inteiros.adicionar(_normalizar(nome_basico), codigo)
+        for sufixo in _sufixos(nome_basico):
+            self._sufixos.adicionar(sufixo, codigo)
+
+    def remover(self, codigo: int):
+        nome = self._nomes.pop(codigo, None)
+        if nome is None:
+            return
+        self._codigos.remover(str(codigo), codigo)
+        self._nomes_inteiros.remover(_normalizar(nome), codigo)
+        for sufixo in _sufixos(nome):
+            self._sufixos.remover(sufixo, codigo)
+
+    def buscar(self, prefixo: str, limite: int) -> list[dict]:
+        """
+        Produtos cujo código ou nome começa com prefixo (sem diferenciar
+        acentos e maiúsculas): primeiro os códigos, depois os nomes que
+        começam com o prefixo e por fim os que têm uma palavra que começa com ele.
+        """
+        prefixo = _normalizar(prefixo)
+        if not prefixo:
+            return []
+        vistos: dict[int, None] = {}
+        if prefixo.isdigit():
+            self._codigos.buscar(prefixo, vistos, limite)
+        self._nomes_inteiros.buscar(prefixo, vistos, limite)
+        self._sufixos.buscar(prefixo, vistos, limite)
+        return [{"codigo": codigo, "nome_basico": self._nomes[codigo]} for codigo in vistos]
+
+    async def aplicar_alteracoes(self, db: AsyncSession, versao: int) -> bool:
+        """
+        Aplica os produtos alterados entre self.versao e versao. False quando o
+        registro não cobre o intervalo e o índice precisa ser remontado.
+        """
+        if self.versao is None or versao < self.versao:
+            return False
+        intervalo = {"desde": self.versao, "ate": versao}
+        primeira, recarregar = (await db.execute(_INTERVALO_ALTERACOES, intervalo)).one()
+        # as versões são consecutivas (gatilho da migração 0010): faltar a primeira
+        # quer dizer que já foi apagada do registro
+        if recarregar or primeira != self.versao + 1:
+            return False
+        for codigo, nome in (await db.execute(_ALTERACOES, intervalo)).all():
+            if nome is None:
+                self.remover(codigo)
+            elif self._nomes.get(codigo) != nome:
+                self.adicionar(codigo, nome)
+        self.versao = versao
+        return True
+
+    async def acompanhar(self, sessionmaker):
+        """Laço de fundo: acompanha a versão do cadastro (escritas de outros workers)."""
+        while True:
+            await asyncio.sleep(AUTOCOMPLETE_INTERVALO)
+            try:
+                async with sessionmaker() as db:
+                    versao = (await db.execute(_VERSAO)).scalar_one()
+                    if versao != self.versao and not await self.aplicar_alteracoes(db, versao):
+                        print(f"Autocomplete: remontando o índice (versão {self.versao} -> {versao})")
+                        await self.carregar(db)
+            except Exception as e:
+                print(f"Autocomplete: falha ao conferir a versão do cadastro: {e}")
+
+
+indice_produtos = IndiceAutocompletar()
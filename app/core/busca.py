@@ -0,0 +1,60 @@
+# app/core/busca.py
+"""
+Apoio à busca de produtos (GET /api/produtos/buscar): normalização do texto
+digitado do mesmo jeito que a coluna gerada DimProduto.busca, montagem da
+tsquery com prefixo em cada palavra e detecção da extensão pg_trgm, usada
+na busca aproximada quando está instalada no servidor.
+"""
+import os
+import re
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# similaridade mínima (0 a 1) da busca aproximada por trigramas
+BUSCA_SIMILARIDADE_MINIMA = float(os.getenv("BUSCA_SIMILARIDADE_MINIMA", "0.3"))
+
+# mesmo mapa da função SQL sem_acento() (migração 0004_busca_produtos)
+_SEM_ACENTO = str.maketrans(
+    "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ",
+    "aaaaaeeeeiiiiooooouuuucnAAAAAEEEEIIIIOOOOOUUUUCN",
+)
+_PALAVRA = re.compile(r"[^\W_]+")
+
+CONFIG_PORTUGUES = literal_column("'portuguese'::regconfig")
+
+_trigramas: bool | None = None
+
+
+def sem_acento(texto: str) -> str:
+    return texto.translate(_SEM_ACENTO)
+
+
+def palavras(texto: str) -> list[str]:
+    return _PALAVRA.findall(sem_acento(texto).lower())
+
+
+def consulta_texto(texto: str):
+    """
+    tsquery em português com todas as palavras (E) e prefixo na busca de
+    cada uma, para que "paraf inox" encontre "Parafuso inox". None quando o
+    texto não tem nenhuma palavra.
+    """
+    termos = palavras(texto)
+    if not termos:
+        return None
+    return func.to_tsquery(CONFIG_PORTUGUES, " & ".join(f"{termo}:*" for termo in termos))
+
+
+async def trigramas_disponiveis(db: AsyncSession) -> bool:
+    """pg_trgm instalada no banco; consultado uma vez por processo."""
+    global _trigramas
+    if _trigramas is None:
+        result = await db.execute(select(text("1")).select_from(text("pg_extension")).where(text("extname = 'pg_trgm'")))
+        _trigramas = result.first() is not None
+    return _trigramas
@@ -0,0 +1,122 @@
+# app/core/cache.py
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Hashable
+
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# o contador de versão é por processo; as escritas de outros workers chegam pelo
+# LISTEN de app/core/eventos.py. O TTL é só uma rede de segurança para o caso de
+# um aviso se perder (0 = sem expiração)
+RESPOSTAS_CACHE_TTL = float(os.getenv("RESPOSTAS_CACHE_TTL", "900"))
+
+_versao_dados = 0
+_caches: list["CacheVersionado"] = []
+
+
+def versao_dados() -> int:
+    return _versao_dados
+
+
+def marcar_dados_alterados():
+    """
+    Chamar após o commit de qualquer escrita em produtos, recebimentos ou
+    saídas. Os outros workers são avisados pelos gatilhos do canal eventos_estoque.
+    """
+    global _versao_dados
+    _versao_dados += 1
+
+
+class _Entrada:
+    __slots__ = ("versao", "corpo", "etag", "criado_em")
+
+    def __init__(self, versao: int, corpo: bytes):
+        self.versao = versao
+        self.corpo = corpo
+        self.etag = '"' + hashlib.md5(corpo).hexdigest() + '"'
+        self.criado_em = time.monotonic()
+
+
+class CacheVersionado:
+    """
+    Guarda respostas já serializadas, uma por combinação de parâmetros,
+    válidas enquanto a versão dos dados não mudar. Requisições simultâneas
+    com o cache vazio esperam a primeira montar a resposta em vez de repetir
+    a consulta. As combinações menos usadas saem quando passa de max_entradas.
+    """
+
+    def __init__(self, nome: str, ttl: float = RESPOSTAS_CACHE_TTL, max_entradas: int = 64):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: OrderedDict[Hashable, _Entrada] = OrderedDict()
+        # um lock por chave enquanto houver requisições montando ou esperando por ela
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._usando_lock: dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        _caches.append(self)
+
+    def _valida(self, chave: Hashable) -> _Entrada | None:
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada.versao != versao_dados():
+            return None
+        if self.ttl > 0 and time.monotonic() - entrada.criado_em >= self.ttl:
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada
+
+    async def obter(self, montar: Callable[[], Awaitable[bytes]], chave: Hashable = None) -> tuple[bytes, str]:
+        """Devolve (corpo, etag), chamando montar() só quando o cache está desatualizado."""
+        entrada = self._valida(chave)
+        if entrada is not None:
+            self.hits += 1
+            return entrada.corpo, entrada.etag
+
+        lock = self._locks.setdefault(chave, asyncio.Lock())
+        self._usando_lock[chave] = self._usando_lock.get(chave, 0) + 1
+        try:
+            async with lock:
+                entrada = self._valida(chave)
+                if entrada is not None:
+                    self.hits += 1
+                    return entrada.corpo, entrada.etag
+                self.misses += 1
+                # versão lida antes da consulta: uma escrita concorrente invalida o resultado
+                versao = versao_dados()
+                entrada = _Entrada(versao, await montar())
+                self._entradas[chave] = entrada
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+                return entrada.corpo, entrada.etag
+        finally:
+            # o lock sai com a última requisição que o usava, mesmo quando montar()
+            # falha: quem ainda espera por ele continua serializado no mesmo lock
+            # (as chaves vêm dos parâmetros da requisição e não podem acumular)
+            restantes = self._usando_lock[chave] - 1
+            if restantes:
+                self._usando_lock[chave] = restantes
+            else:
+                del self._usando_lock[chave]
+                del self._locks[chave]
+
+    def estatisticas(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entradas": len(self._entradas),
+            "versao_atual": versao_dados(),
+            "ttl_segundos": self.ttl,
+        }
+
+
+def estatisticas_caches() -> dict:
+    return {cache.nome: cache.estatisticas() for cache in _caches}
@@ -0,0 +1,543 @@
+# app/core/estoque.py
+from datetime import date
+from sqlalchemy import select, insert, update, delete, func, case, and_, or_, text, literal, true, bindparam, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DimProduto, FactRecebimento, FactSaida, SaldoEstoque, MovimentoDiario
+
+# chave usada no lock que protege a reconstrução inicial do saldo entre workers
+_LOCK_RECONSTRUCAO = 7_310_001
+
+_COLUNAS_CHAVE = [SaldoEstoque.codigo, SaldoEstoque.lote, SaldoEstoque.fornecedor]
+
+
+def _upsert_saldo():
+    """
+    INSERT ... ON CONFLICT que soma os valores ao saldo existente do lote.
+    As expressões do SET enxergam a linha antiga, então a data do último
+    recebimento só substitui a quantidade recente quando for mais nova.
+    """
+    stmt = pg_insert(SaldoEstoque.__table__)
+    novo = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=_COLUNAS_CHAVE,
+        set_={
+            "quant_recebida": SaldoEstoque.quant_recebida + novo.quant_recebida,
+            "quant_saida": SaldoEstoque.quant_saida + novo.quant_saida,
+            "validade": func.least(SaldoEstoque.validade, novo.validade),
+            "data_ultimo_receb": func.greatest(SaldoEstoque.data_ultimo_receb, novo.data_ultimo_receb),
+            "quant_ultimo_receb": case(
+                (novo.data_ultimo_receb.is_(None), SaldoEstoque.quant_ultimo_receb),
+                (SaldoEstoque.data_ultimo_receb.is_(None), novo.quant_ultimo_receb),
+                (novo.data_ultimo_receb > SaldoEstoque.data_ultimo_receb, novo.quant_ultimo_receb),
+                (novo.data_ultimo_receb == SaldoEstoque.data_ultimo_receb,
+                 SaldoEstoque.quant_ultimo_receb + novo.quant_ultimo_receb),
+                else_=SaldoEstoque.quant_ultimo_receb
+            ),
+        }
+    )
+
+
+def _upsert_movimento(origem=None):
+    """
+    INSERT ... ON CONFLICT que soma recebimentos/saídas ao total do dia do
+    produto. Com origem, os valores vêm de um SELECT.
+    """
+    stmt = pg_insert(MovimentoDiario.__table__)
+    if origem is not None:
+        stmt = stmt.from_select(["dia", "codigo", "quant_recebida", "quant_saida"], origem)
+    novo = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[MovimentoDiario.dia, MovimentoDiario.codigo],
+        set_={
+            "quant_recebida": MovimentoDiario.quant_recebida + novo.quant_recebida,
+            "quant_saida": MovimentoDiario.quant_saida + novo.quant_saida,
+        }
+    )
+
+
+async def registrar_recebimento(
+    db: AsyncSession,
+    codigo: int,
+    lote: str,
+    fornecedor: str | None,
+    quant: int,
+    data_receb: date,
+    validade: date | None,
+) -> int:
+    """
+    Soma um recebimento ao saldo do lote e ao movimento do dia.
+    Deve rodar na transação do INSERT em FactRecebimento.
+    """
+    result = await db.execute(_upsert_saldo().returning(SaldoEstoque.saldo), {
+        "codigo": codigo,
+        "lote": lote,
+        "fornecedor": fornecedor,
+        "validade": validade,
+        "quant_recebida": quant,
+        "quant_saida": 0,
+        "data_ultimo_receb": data_receb,
+        "quant_ultimo_receb": quant,
+    })
+    saldo = result.scalar_one()
+    await db.execute(_upsert_movimento(), {
+        "dia": data_receb,
+        "codigo": codigo,
+        "quant_recebida": quant,
+        "quant_saida": 0,
+    })
+    return saldo
+
+
+async def registrar_recebimentos(db: AsyncSession, recebimentos: list[dict]) -> None:
+    """
+    Versão em lote de registrar_recebimento. Agrega as linhas por lote e por
+    dia antes do upsert, já que um mesmo INSERT ... ON CONFLICT não pode
+    atualizar a mesma linha duas vezes. As linhas vão ordenadas pela chave
+    para que lotes concorrentes travem sempre na mesma ordem.
+    """
+    por_lote: dict[tuple, dict] = {}
+    por_dia: dict[tuple, int] = {}
+    for r in recebimentos:
+        chave_dia = (r["data_receb"], r["codigo"])
+        por_dia[chave_dia] = por_dia.get(chave_dia, 0) + r["quant"]
+
+        chave = (r["codigo"], r["lote"], r["fornecedor"])
+        atual = por_lote.get(chave)
+        if atual is None:
+            por_lote[chave] = {
+                "codigo": r["codigo"],
+                "lote": r["lote"],
+                "fornecedor": r["fornecedor"],
+                "validade": r["validade"],
+                "quant_recebida": r["quant"],
+                "quant_saida": 0,
+                "data_ultimo_receb": r["data_receb"],
+                "quant_ultimo_receb": r["quant"],
+            }
+            continue
+
+        atual["quant_recebida"] += r["quant"]
+        if r["validade"] is not None and (atual["validade"] is None or r["validade"] < atual["validade"]):
+            atual["validade"] = r["validade"]
+        if r["data_receb"] > atual["data_ultimo_receb"]:
+            atual["data_ultimo_receb"] = r["data_receb"]
+            atual["quant_ultimo_receb"] = r["quant"]
+        elif r["data_receb"] == atual["data_ultimo_receb"]:
+            atual["quant_ultimo_receb"] += r["quant"]
+
+    if por_lote:
+        # executemany: o SQLAlchemy agrupa as linhas em INSERTs multi-row ("insertmanyvalues")
+        ordenados = sorted(por_lote.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or ""))
+        await db.execute(_upsert_saldo(), [valores for _, valores in ordenados])
+        await db.execute(_upsert_movimento(), [
+            {"dia": dia, "codigo": codigo, "quant_recebida": quant, "quant_saida": 0}
+            for (dia, codigo), quant in sorted(por_dia.items())
+        ])
+
+
+def filtro_lote(codigo: int, lote: str, fornecedor: str | None):
+    """Condição do saldo de um lote; fornecedor None usa IS NULL (o índice único não cobre IS NOT DISTINCT FROM)."""
+    condicao_fornecedor = (
+        SaldoEstoque.fornecedor.is_(None) if fornecedor is None else SaldoEstoque.fornecedor == fornecedor
+    )
+    return and_(SaldoEstoque.codigo == codigo, SaldoEstoque.lote == lote, condicao_fornecedor)
+
+
+async def baixar_saldo(
+    db: AsyncSession,
+    codigo: int,
+    lote: str,
+    fornecedor: str | None,
+    quant: int,
+    data_saida: date,
+) -> tuple[int, int] | None:
+    """
+    Registra uma saída em um único comando (mais um upsert na primeira saída
+    do dia para o lote): o UPDATE do saldo só acontece se
+    houver quantidade suficiente e trava apenas a linha do lote; o INSERT em
+    FactSaida e a soma no movimento do dia usam a linha devolvida pelo UPDATE.
+    Saídas concorrentes no mesmo lote esperam a trava e reavaliam o saldo,
+    então o lote nunca fica negativo.
+    Retorna (id da saída, saldo restante) ou None se o saldo for insuficiente.
+    """
+    result = await db.execute(get_baixa_saldo_query(codigo, lote, fornecedor, quant, data_saida))
+    row = result.first()
+    if row is None:
+        return None
+    if not row.movimentos:
+        await db.execute(_upsert_movimento(), {
+            "dia": data_saida, "codigo": codigo, "quant_recebida": 0, "quant_saida": quant
+        })
+    return row.idrecebimento, row.saldo
+
+
+def get_baixa_saldo_query(codigo: int, lote: str, fornecedor: str | None, quant: int, data_saida: date):
+    """Comando único de baixar_saldo: UPDATE do saldo, INSERT da saída e UPDATE do movimento do dia."""
+    saldo = (
+        update(SaldoEstoque)
+        .where(filtro_lote(codigo, lote, fornecedor), SaldoEstoque.saldo >= quant)
+        .values(quant_saida=SaldoEstoque.quant_saida + quant)
+        .returning(SaldoEstoque.codigo, SaldoEstoque.lote, SaldoEstoque.fornecedor, SaldoEstoque.saldo)
+        .cte("saldo")
+    )
+    nova = (
+        insert(FactSaida)
+        .from_select(
+            ["data_saida", "quant", "codigo", "lote", "fornecedor"],
+            select(literal(data_saida), literal(quant), saldo.c.codigo, saldo.c.lote, saldo.c.fornecedor)
+        )
+        .returning(FactSaida.idrecebimento)
+        .cte("nova")
+    )
+    # o UPDATE do movimento do dia vai no mesmo comando; o upsert (pg_insert) não
+    # entra no cache de compilação do SQLAlchemy e fica só para a primeira saída do dia
+    movimento = (
+        update(MovimentoDiario)
+        .where(MovimentoDiario.dia == data_saida, MovimentoDiario.codigo == saldo.c.codigo)
+        .values(quant_saida=MovimentoDiario.quant_saida + quant)
+        .returning(MovimentoDiario.dia)
+        .cte("movimento")
+    )
+    return (
+        select(
+            nova.c.idrecebimento,
+            saldo.c.saldo,
+            select(func.count()).select_from(movimento).scalar_subquery().label("movimentos")
+        )
+        .select_from(nova)
+        .join(saldo, true())
+    )
+
+
+async def alocar_saida_fefo(
+    db: AsyncSession,
+    codigo: int,
+    quant: int,
+    data_saida: date,
+) -> list[dict] | None:
+    """
+    Distribui uma saída entre os lotes do produto, vencimento mais próximo
+    primeiro (FEFO; lotes sem validade por último). Trava com FOR UPDATE só
+    os saldos positivos do produto, sempre na mesma ordem, então alocações
+    concorrentes não entram em deadlock. Não faz commit.
+    Retorna a alocação por lote ou None se o saldo total for insuficiente.
+    """
+    result = await db.execute(
+        select(
+            SaldoEstoque.idsaldo,
+            SaldoEstoque.lote,
+            SaldoEstoque.fornecedor,
+            SaldoEstoque.validade,
+            SaldoEstoque.saldo
+        )
+        .where(SaldoEstoque.codigo == codigo, SaldoEstoque.saldo > 0)
+        .order_by(
+            SaldoEstoque.validade.asc().nulls_last(),
+            SaldoEstoque.lote,
+            SaldoEstoque.fornecedor
+        )
+        .with_for_update()
+    )
+    lotes = result.mappings().all()
+
+    alocacao = []
+    restante = quant
+    for lote in lotes:
+        if restante == 0:
+            break
+        retirada = min(restante, lote["saldo"])
+        restante -= retirada
+        alocacao.append({
+            "idsaldo": lote["idsaldo"],
+            "lote": lote["lote"],
+            "fornecedor": lote["fornecedor"],
+            "validade": lote["validade"],
+            "quantidade": retirada,
+            "saldo_restante": lote["saldo"] - retirada,
+        })
+
+    if restante > 0:
+        return None
+
+    t = SaldoEstoque.__table__
+    await db.execute(
+        update(t)
+        .where(t.c.idsaldo == bindparam("b_idsaldo"))
+        .values(quant_saida=t.c.quant_saida + bindparam("b_quantidade")),
+        [{"b_idsaldo": a["idsaldo"], "b_quantidade": a["quantidade"]} for a in alocacao]
+    )
+    await db.execute(
+        insert(FactSaida.__table__),
+        [
+            {
+                "data_saida": data_saida,
+                "quant": a["quantidade"],
+                "codigo": codigo,
+                "lote": a["lote"],
+                "fornecedor": a["fornecedor"],
+            }
+            for a in alocacao
+        ]
+    )
+    await db.execute(_upsert_movimento(), {
+        "dia": data_saida, "codigo": codigo, "quant_recebida": 0, "quant_saida": quant
+    })
+    return alocacao
+
+
+def get_saldos_calculados_query(codigo: int | None = None, lote: str | None = None):
+    """
+    Recalcula os saldos por lote direto das tabelas de fatos (custo O(histórico)).
+    Usado apenas na reconstrução e na verificação da tabela SaldoEstoque.
+    """
+    filtros_receb, filtros_saida = [], []
+    if codigo is not None:
+        filtros_receb.append(FactRecebimento.codigo == codigo)
+        filtros_saida.append(FactSaida.codigo == codigo)
+    if lote is not None:
+        filtros_receb.append(FactRecebimento.lote == lote)
+        filtros_saida.append(FactSaida.lote == lote)
+
+    chave_receb = [FactRecebimento.codigo, FactRecebimento.lote, FactRecebimento.fornecedor]
+    recebimentos = select(
+        *chave_receb,
+        FactRecebimento.validade,
+        FactRecebimento.quant,
+        FactRecebimento.data_receb,
+        func.max(FactRecebimento.data_receb).over(partition_by=chave_receb).label("ultima")
+    ).where(*filtros_receb).subquery()
+
+    r = select(
+        recebimentos.c.codigo,
+        recebimentos.c.lote,
+        recebimentos.c.fornecedor,
+        func.min(recebimentos.c.validade).label("validade"),
+        func.sum(recebimentos.c.quant).label("quant_recebida"),
+        func.max(recebimentos.c.ultima).label("data_ultimo_receb"),
+        func.sum(
+            case((recebimentos.c.data_receb == recebimentos.c.ultima, recebimentos.c.quant), else_=0)
+        ).label("quant_ultimo_receb")
+    ).group_by(
+        recebimentos.c.codigo, recebimentos.c.lote, recebimentos.c.fornecedor
+    ).subquery("r")
+
+    s = select(
+        FactSaida.codigo,
+        FactSaida.lote,
+        FactSaida.fornecedor,
+        func.sum(FactSaida.quant).label("quant_saida")
+    ).where(*filtros_saida).group_by(
+        FactSaida.codigo, FactSaida.lote, FactSaida.fornecedor
+    ).subquery("s")
+
+    codigo_col = func.coalesce(r.c.codigo, s.c.codigo)
+    return (
+        select(
+            codigo_col.label("codigo"),
+            func.coalesce(r.c.lote, s.c.lote).label("lote"),
+            case((r.c.codigo.is_(None), s.c.fornecedor), else_=r.c.fornecedor).label("fornecedor"),
+            r.c.validade,
+            func.coalesce(r.c.quant_recebida, 0).label("quant_recebida"),
+            func.coalesce(s.c.quant_saida, 0).label("quant_saida"),
+            r.c.data_ultimo_receb,
+            func.coalesce(r.c.quant_ultimo_receb, 0).label("quant_ultimo_receb"),
+        )
+        .select_from(r)
+        .join(
+            s,
+            and_(
+                r.c.codigo == s.c.codigo,
+                r.c.lote == s.c.lote,
+                r.c.fornecedor.is_not_distinct_from(s.c.fornecedor)
+            ),
+            full=True
+        )
+        # saídas de produtos já excluídos não têm onde ser registradas
+        .where(codigo_col.in_(select(DimProduto.codigo)))
+    )
+
+
+async def recalcular_saldos(db: AsyncSession, codigo: int | None = None, lote: str | None = None) -> int:
+    """
+    Reconstrói a tabela SaldoEstoque a partir das tabelas de fatos, inteira
+    ou apenas para um produto/lote. Não faz commit.
+    """
+    stmt_delete = delete(SaldoEstoque)
+    if codigo is not None:
+        stmt_delete = stmt_delete.where(SaldoEstoque.codigo == codigo)
+    if lote is not None:
+        stmt_delete = stmt_delete.where(SaldoEstoque.lote == lote)
+    await db.execute(stmt_delete)
+
+    calculados = get_saldos_calculados_query(codigo, lote)
+    colunas = ["codigo", "lote", "fornecedor", "validade", "quant_recebida",
+               "quant_saida", "data_ultimo_receb", "quant_ultimo_receb"]
+    result = await db.execute(
+        pg_insert(SaldoEstoque).from_select(colunas, calculados)
+    )
+    return result.rowcount
+
+
+async def verificar_saldos(db: AsyncSession) -> list[dict]:
+    """Compara a tabela SaldoEstoque com o cálculo a partir dos fatos e devolve as divergências."""
+    c = get_saldos_calculados_query().subquery("c")
+    t = SaldoEstoque.__table__
+
+    campos = ["validade", "quant_recebida", "quant_saida", "data_ultimo_receb", "quant_ultimo_receb"]
+    query = (
+        select(
+            func.coalesce(c.c.codigo, t.c.codigo).label("codigo"),
+            func.coalesce(c.c.lote, t.c.lote).label("lote"),
+            case((c.c.codigo.is_(None), t.c.fornecedor), else_=c.c.fornecedor).label("fornecedor"),
+            *[c.c[campo].label(f"{campo}_esperado") for campo in campos],
+            *[t.c[campo].label(f"{campo}_tabela") for campo in campos],
+        )
+        .select_from(c)
+        .join(
+            t,
+            and_(
+                c.c.codigo == t.c.codigo,
+                c.c.lote == t.c.lote,
+                c.c.fornecedor.is_not_distinct_from(t.c.fornecedor)
+            ),
+            full=True
+        )
+        .where(
+            or_(
+                c.c.codigo.is_(None),
+                t.c.codigo.is_(None),
+                *[c.c[campo].is_distinct_from(t.c[campo]) for campo in campos]
+            )
+        )
+    )
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
+
+
+def get_movimentos_calculados_query(codigo: int | None = None):
+    """
+    Totais por dia e produto direto das tabelas de fatos (custo O(histórico)).
+    Usado apenas na reconstrução e na verificação da
+    tabela MovimentoDiario.
+    """
+    recebimentos = select(
+        FactRecebimento.data_receb.label("dia"),
+        FactRecebimento.codigo.label("codigo"),
+        FactRecebimento.quant.label("quant_recebida"),
+        literal(0).label("quant_saida")
+    )
+    saidas = select(
+        FactSaida.data_saida.label("dia"),
+        FactSaida.codigo.label("codigo"),
+        literal(0).label("quant_recebida"),
+        FactSaida.quant.label("quant_saida")
+    )
+    if codigo is not None:
+        recebimentos = recebimentos.where(FactRecebimento.codigo == codigo)
+        saidas = saidas.where(FactSaida.codigo == codigo)
+
+    movimentos = union_all(recebimentos, saidas).subquery("movimentos")
+    return (
+        select(
+            movimentos.c.dia,
+            movimentos.c.codigo,
+            func.sum(movimentos.c.quant_recebida).label("quant_recebida"),
+            func.sum(movimentos.c.quant_saida).label("quant_saida")
+        )
+        .where(movimentos.c.codigo.in_(select(DimProduto.codigo)))
+        .group_by(movimentos.c.dia, movimentos.c.codigo)
+    )
+
+
+async def recalcular_movimentos(db: AsyncSession, codigo: int | None = None) -> int:
+    """Reconstrói a tabela MovimentoDiario, inteira ou de um produto. Não faz commit."""
+    stmt_delete = delete(MovimentoDiario)
+    if codigo is not None:
+        stmt_delete = stmt_delete.where(MovimentoDiario.codigo == codigo)
+    await db.execute(stmt_delete)
+
+    calculados = get_movimentos_calculados_query(codigo).subquery()
+    result = await db.execute(
+        pg_insert(MovimentoDiario).from_select(
+            ["dia", "codigo", "quant_recebida", "quant_saida"],
+            select(calculados.c.dia, calculados.c.codigo,
+                   calculados.c.quant_recebida, calculados.c.quant_saida)
+        )
+    )
+    return result.rowcount
+
+
+async def verificar_movimentos(db: AsyncSession) -> list[dict]:
+    """Compara a tabela MovimentoDiario com o cálculo a partir dos fatos e devolve as divergências."""
+    c = get_movimentos_calculados_query().subquery("c")
+    t = MovimentoDiario.__table__
+
+    campos = ["quant_recebida", "quant_saida"]
+    query = (
+        select(
+            func.coalesce(c.c.dia, t.c.dia).label("dia"),
+            func.coalesce(c.c.codigo, t.c.codigo).label("codigo"),
+            *[c.c[campo].label(f"{campo}_esperado") for campo in campos],
+            *[t.c[campo].label(f"{campo}_tabela") for campo in campos],
+        )
+        .select_from(c)
+        .join(t, and_(c.c.dia == t.c.dia, c.c.codigo == t.c.codigo), full=True)
+        .where(
+            or_(
+                c.c.codigo.is_(None),
+                t.c.codigo.is_(None),
+                *[c.c[campo].is_distinct_from(t.c[campo]) for campo in campos]
+            )
+        )
+    )
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def inicializar_saldos(db: AsyncSession) -> bool:
+    """
+    Preenche as tabelas de saldos e de movimento diário na primeira subida
+    após a sua criação. O advisory lock garante que apenas um worker faça a
+    reconstrução.
+    """
+    await db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": _LOCK_RECONSTRUCAO})
+    existem_fatos = (await db.execute(select(FactRecebimento.idrecebimento).limit(1))).first() is not None
+    if not existem_fatos:
+        await db.rollback()
+        return False
+
+    saldos_vazios = (await db.execute(select(SaldoEstoque.idsaldo).limit(1))).first() is None
+    movimentos_vazios = (await db.execute(select(MovimentoDiario.dia).limit(1))).first() is None
+    if saldos_vazios:
+        await recalcular_saldos(db)
+    if movimentos_vazios:
+        await recalcular_movimentos(db)
+    if saldos_vazios or movimentos_vazios:
+        await db.commit()
+        return True
+    await db.rollback()
+    return False
+
+
+def estoque_por_produto():
+    """
+    Saldo total e quantidade recebida na data mais recente, por produto,
+    lidos da tabela materializada (custo O(lotes) em vez de O(histórico)).
+    """
+    lotes = select(
+        SaldoEstoque.codigo,
+        SaldoEstoque.saldo,
+        SaldoEstoque.data_ultimo_receb,
+        SaldoEstoque.quant_ultimo_receb,
+        func.max(SaldoEstoque.data_ultimo_receb).over(partition_by=SaldoEstoque.codigo).label("ultima")
+    ).subquery()
+
+    return select(
+        lotes.c.codigo,
+        func.sum(lotes.c.saldo).label("quantidade"),
+        func.sum(
+            case((lotes.c.data_ultimo_receb == lotes.c.ultima, lotes.c.quant_ultimo_receb), else_=0)
+        ).label("quant_recente")
+    ).group_by(lotes.c.codigo).subquery("estoque")
@@ -0,0 +1,308 @@
+# app/core/eventos.py
+"""
+Eventos de estoque para GET /eventos/estoque (Server-Sent Events).
+
+Os gatilhos da migração 0008 publicam no canal eventos_estoque do
+Postgres, no commit, as mudanças de saldo por lote (recebimentos, saídas,
+edição de lotes) e as alterações de produto. Cada worker mantém uma única
+conexão em LISTEN nesse canal (fora do pool do SQLAlchemy) e distribui os
+eventos em memória para os seus clientes; assim as escritas de qualquer
+worker, ou de scripts fora do app, chegam a todos. Os mesmos avisos
+invalidam os caches de respostas do worker (app/core/cache.py).
+
+Cada evento é serializado uma vez só e o mesmo bytes vai para a fila de
+todos os clientes. As filas são limitadas (EVENTOS_FILA_CLIENTE): quando um
+cliente lento a enche, os eventos pendentes dele são descartados e
+substituídos por um "ressincronizar" (o cliente relê /estoque e segue com
+os eventos seguintes; "saldo" é o valor absoluto, então reaplicar um evento
+não causa erro). Depois de EVENTOS_DESCARTES_MAXIMOS descartes o cliente é
+desconectado. A mesma mensagem vai para todos os clientes quando a conexão
+de LISTEN cai, já que os eventos do intervalo se perderam.
+
+Cada evento leva um id "<worker>-<sequência>" (sequência crescente por
+worker) e os últimos EVENTOS_HISTORICO ficam guardados. Na reconexão o
+EventSource manda o último id recebido em Last-Event-ID: se ele é deste
+worker e ainda está no histórico, o cliente recebe só os eventos que
+perdeu; "ressincronizar" só quando o id é de outro worker (ou de antes de
+o worker reiniciar) ou mais antigo que o histórico.
+
+Os streams não têm duração máxima. Ao desligar, o uvicorn espera as
+conexões abertas terminarem antes de chamar o shutdown do app, então ele
+deve rodar com --timeout-graceful-shutdown (ex.: 10): vencido o prazo, os
+streams são cancelados e os clientes reconectam sozinhos. O shutdown
+(encerrar) fecha os que ainda restarem e recusa novos clientes.
+"""
+import asyncio
+import json
+import os
+import secrets
+from collections import deque
+from itertools import islice
+from pathlib import Path
+
+import anyio
+import asyncpg
+from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import make_url
+
+from app.core.cache import marcar_dados_alterados
+from app.core.database import DATABASE_URL
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+CANAL = "eventos_estoque"
+
+# eventos pendentes por cliente antes do descarte. Os eventos de um commit chegam
+# de uma vez, antes que qualquer cliente tenha vez de escrever: com menos que o
+# MAXIMO_POR_COMANDO da migração 0008 um recebimento em lote grande faria todos os
+# clientes, e não só os lentos, ressincronizarem. A fila guarda só referências ao
+# mesmo bytes, compartilhado entre clientes.
+EVENTOS_FILA_CLIENTE = int(os.getenv("EVENTOS_FILA_CLIENTE", "5000"))
+# descartes (filas cheias) tolerados antes de desconectar o cliente lento
+EVENTOS_DESCARTES_MAXIMOS = int(os.getenv("EVENTOS_DESCARTES_MAXIMOS", "3"))
+EVENTOS_MAXIMO_CLIENTES = int(os.getenv("EVENTOS_MAXIMO_CLIENTES", "5000"))
+# segundos entre os comentários de keep-alive do stream e as verificações da conexão de LISTEN
+EVENTOS_HEARTBEAT = float(os.getenv("EVENTOS_HEARTBEAT", "15"))
+EVENTOS_RECONEXAO = float(os.getenv("EVENTOS_RECONEXAO", "2"))
+# eventos recentes guardados para reenviar a quem reconecta (Last-Event-ID)
+EVENTOS_HISTORICO = int(os.getenv("EVENTOS_HISTORICO", "10000"))
+
+RESSINCRONIZAR = b"event: ressincronizar\ndata: {}\n\n"
+HEARTBEAT = b": ping\n\n"
+RETRY = b"retry: 3000\n\n"
+
+
+def quadro(tipo: str, dados: dict) -> bytes:
+    """Um evento no formato text/event-stream."""
+    return f"event: {tipo}\ndata: {json.dumps(dados, separators=(',', ':'), ensure_ascii=False)}\n\n".encode()
+
+
+class Assinante:
+    """Um cliente conectado: fila limitada de quadros já serializados e filtro opcional por produto."""
+
+    __slots__ = ("codigos", "descartes", "desconectado", "interromper", "_fila", "_sinal")
+
+    def __init__(self, codigos: set[int] | None):
+        self.codigos = codigos
+        self.descartes = 0
+        self.desconectado = False
+        # cancela o envio em andamento (ver RespostaEventos)
+        self.interromper = None
+        self._fila: deque[bytes] = deque()
+        self._sinal = asyncio.Event()
+
+    def entregar(self, dados: bytes, ident: bytes):
+        """
+        Enfileira um quadro. ident é a linha "id:" do evento sendo entregue:
+        vai no "ressincronizar" que substitui a fila cheia, para que uma
+        reconexão depois dele não reenvie os eventos descartados.
+        """
+        if len(self._fila) >= EVENTOS_FILA_CLIENTE:
+            self.descartes += 1
+            self._fila.clear()
+            if self.descartes > EVENTOS_DESCARTES_MAXIMOS:
+                self.desconectado = True
+                # o stream de um cliente que não lê está parado no envio e não
+                # chegaria a conferir desconectado
+                if self.interromper is not None:
+                    self.interromper()
+            dados = ident + RESSINCRONIZAR
+        self._fila.append(dados)
+        self._sinal.set()
+
+    def acordar(self):
+        self._sinal.set()
+
+    async def proximos(self) -> list[bytes]:
+        """
+        Todos os quadros pendentes; lista vazia quando acordado pelo pulso
+        do distribuidor sem nada na fila (hora do heartbeat).
+        """
+        if not self._fila:
+            self._sinal.clear()
+            await self._sinal.wait()
+        quadros = list(self._fila)
+        self._fila.clear()
+        return quadros
+
+
+class RespostaEventos(StreamingResponse):
+    """
+    StreamingResponse que o distribuidor consegue interromper: com o buffer
+    do socket cheio o envio fica esperando o cliente ler, e sem isso um
+    cliente desconectado por lentidão seguraria a conexão para sempre.
+    """
+
+    def __init__(self, assinante: Assinante, conteudo, **kwargs):
+        super().__init__(conteudo, **kwargs)
+        self.assinante = assinante
+
+    async def stream_response(self, send):
+        with anyio.CancelScope() as escopo:
+            self.assinante.interromper = escopo.cancel
+            await super().stream_response(send)
+        if escopo.cancelled_caught:
+            print("Eventos: cliente lento desconectado")
+            # roda o finally do gerador (cancelamento da assinatura) agora
+            await self.body_iterator.aclose()
+
+
+class DistribuidorEventos:
+    def __init__(self):
+        self._assinantes: set[Assinante] = set()
+        # identifica o worker (e a sua vida: muda ao reiniciar) nos ids dos eventos
+        self.prefixo = secrets.token_hex(4)
+        self.sequencia = 0
+        # (sequência, código ou None para todos, quadro)
+        self._historico: deque[tuple[int, int | None, bytes]] = deque(maxlen=EVENTOS_HISTORICO)
+        self.encerrando = False
+        self.conectado = False
+        self._ja_conectou = False
+        self.recebidos = 0
+        self.descartes = 0
+
+    def __len__(self) -> int:
+        return len(self._assinantes)
+
+    def estatisticas(self) -> dict:
+        return {
+            "clientes": len(self._assinantes),
+            "conectado": self.conectado,
+            "recebidos": self.recebidos,
+            # descartes dos clientes já desconectados mais os dos conectados
+            "descartes": self.descartes + sum(assinante.descartes for assinante in self._assinantes),
+        }
+
+    def _ident(self) -> bytes:
+        return f"id: {self.prefixo}-{self.sequencia}\n".encode()
+
+    def inicio(self) -> bytes:
+        """Primeira mensagem do stream: o id atual, para que o navegador mande Last-Event-ID ao reconectar."""
+        return self._ident() + RETRY
+
+    def assinar(self, codigos: set[int] | None = None) -> Assinante | None:
+        """Novo cliente; None quando o worker já tem EVENTOS_MAXIMO_CLIENTES ou está encerrando."""
+        if self.encerrando or len(self._assinantes) >= EVENTOS_MAXIMO_CLIENTES:
+            return None
+        assinante = Assinante(codigos)
+        self._assinantes.add(assinante)
+        return assinante
+
+    def cancelar(self, assinante: Assinante):
+        self._assinantes.discard(assinante)
+        self.descartes += assinante.descartes
+
+    def retomar(self, assinante: Assinante, ultimo_id: str):
+        """
+        Reconexão com Last-Event-ID: enfileira os eventos do histórico
+        posteriores a ultimo_id, ou "ressincronizar" quando o histórico deste
+        worker não cobre o intervalo.
+        """
+        prefixo, _, numero = ultimo_id.rpartition("-")
+        ident = self._ident()
+        if prefixo != self.prefixo or not numero.isdigit() or int(numero) > self.sequencia:
+            assinante.entregar(ident + RESSINCRONIZAR, ident)
+            return
+        desde = int(numero)
+        if desde == self.sequencia:
+            return
+        # as sequências no histórico são consecutivas
+        primeira = self._historico[0][0] if self._historico else self.sequencia + 1
+        if primeira > desde + 1:
+            assinante.entregar(ident + RESSINCRONIZAR, ident)
+            return
+        for _, codigo, mensagem in islice(self._historico, desde + 1 - primeira, None):
+            if assinante.codigos is None or codigo is None or codigo in assinante.codigos:
+                assinante.entregar(mensagem, ident)
+
+    def _distribuir(self, codigo: int | None, conteudo: bytes):
+        self.sequencia += 1
+        ident = self._ident()
+        mensagem = ident + conteudo
+        self._historico.append((self.sequencia, codigo, mensagem))
+        for assinante in self._assinantes:
+            if assinante.codigos is None or codigo is None or codigo in assinante.codigos:
+                assinante.entregar(mensagem, ident)
+
+    def publicar(self, tipo: str, dados: dict):
+        self._distribuir(dados.get("codigo"), quadro(tipo, dados))
+
+    def ressincronizar(self):
+        self._distribuir(None, RESSINCRONIZAR)
+
+    def encerrar(self):
+        """Shutdown do worker: termina os streams ainda abertos e recusa novos clientes."""
+        self.encerrando = True
+        for assinante in self._assinantes:
+            assinante.desconectado = True
+            assinante.acordar()
+
+    async def pulsar(self):
+        """
+        Acorda todos os clientes a cada EVENTOS_HEARTBEAT segundos para o
+        keep-alive: um temporizador só para o worker em vez de um por
+        espera de cada cliente.
+        """
+        while True:
+            await asyncio.sleep(EVENTOS_HEARTBEAT)
+            for assinante in self._assinantes:
+                assinante.acordar()
+
+    def _receber(self, conexao, pid, canal, payload: str):
+        try:
+            eventos = json.loads(payload)
+        except ValueError:
+            print(f"Eventos: payload inválido no canal {canal}: {payload[:200]}")
+            return
+        # escrita de outro worker (ou de fora do app): as respostas em cache deste ficaram velhas
+        marcar_dados_alterados()
+        for evento in eventos:
+            self.recebidos += 1
+            tipo = evento.pop("tipo")
+            if tipo == "ressincronizar":
+                self.ressincronizar()
+            else:
+                self.publicar(tipo, evento)
+
+    async def escutar(self):
+        """
+        Laço de fundo: LISTEN numa conexão própria, conferida a cada
+        EVENTOS_HEARTBEAT segundos; se cair, reconecta e avisa os clientes
+        para ressincronizar. O pulso dos clientes roda junto, mesmo com a
+        conexão fora.
+        """
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        pulso = asyncio.create_task(self.pulsar())
+        try:
+            await self._escutar(dsn)
+        finally:
+            pulso.cancel()
+
+    async def _escutar(self, dsn: str):
+        while True:
+            conexao = None
+            try:
+                conexao = await asyncpg.connect(dsn)
+                await conexao.add_listener(CANAL, self._receber)
+                if self._ja_conectou:
+                    # reconexão: o que foi publicado enquanto a conexão estava fora se perdeu
+                    marcar_dados_alterados()
+                    self.ressincronizar()
+                self.conectado = self._ja_conectou = True
+                while True:
+                    await asyncio.sleep(EVENTOS_HEARTBEAT)
+                    await conexao.fetchval("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Eventos: conexão de LISTEN perdida: {e}")
+            finally:
+                self.conectado = False
+                if conexao is not None:
+                    conexao.terminate()
+            await asyncio.sleep(EVENTOS_RECONEXAO)
+
+
+distribuidor_eventos = DistribuidorEventos()
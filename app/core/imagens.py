@@ -0,0 +1,45 @@
+# app/core/imagens.py
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# tempo (segundos) que o navegador pode reutilizar a imagem sem revalidar o ETag
+IMAGEM_CACHE_MAX_AGE = int(os.getenv("IMAGEM_CACHE_MAX_AGE", "300"))
+
+# assinaturas dos formatos aceitos no cadastro de produtos
+_ASSINATURAS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def imagem_url(codigo: int, tem_imagem: bool = True) -> str | None:
+    """URL do endpoint de imagem do produto, usada nas listagens no lugar dos bytes."""
+    if not tem_imagem:
+        return None
+    return f"/api/produtos/{codigo}/imagem"
+
+
+def tipo_imagem(conteudo: bytes) -> str:
+    for assinatura, media_type in _ASSINATURAS:
+        if conteudo.startswith(assinatura):
+            return media_type
+    if conteudo[:4] == b"RIFF" and conteudo[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def etag_corresponde(if_none_match: str | None, etag: str) -> bool:
+    """Compara o cabeçalho If-None-Match (lista, '*' ou ETag fraco) com o ETag atual."""
+    if not if_none_match:
+        return False
+    for valor in if_none_match.split(","):
+        valor = valor.strip()
+        if valor == "*" or valor.removeprefix("W/") == etag:
+            return True
+    return False
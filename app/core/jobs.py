@@ -0,0 +1,368 @@
+# app/core/jobs.py
+"""
+Jobs em segundo plano para relatórios pesados (POST /jobs/{tipo}).
+
+Os dumps completos de /saldos, /recebimento e /saidas e as análises pesadas
+não rodam mais dentro da requisição: cada tipo é registrado aqui pelo seu
+router (registrar_tipo, como registrar_consulta do aquecimento) com um
+gerador assíncrono que devolve as linhas em lotes, e o job grava essas
+linhas num arquivo CSV em JOBS_DIRETORIO, que é baixado depois por
+GET /jobs/{id}/resultado.
+
+Limites:
+- JOBS_MAXIMO_SIMULTANEOS jobs rodam ao mesmo tempo no worker, cada tipo
+  com o seu limite (concorrencia no registro); os outros esperam na fila.
+- JOBS_FILA_MAXIMA jobs pendentes ou em execução por worker; acima disso o
+  POST devolve 429.
+- Os jobs usam um pool de conexões próprio, de JOBS_MAXIMO_SIMULTANEOS
+  conexões, e nunca ocupam as conexões das requisições interativas.
+- O resultado expira JOBS_RESULTADO_TTL segundos depois de pronto; a
+  limpeza roda a cada JOBS_LIMPEZA_INTERVALO segundos.
+
+Os jobs vivem na memória do worker que os recebeu, mas o estado de cada um
+também é gravado em <id>.json no diretório de resultados: com vários
+workers na mesma máquina, qualquer um consulta o estado e entrega o
+arquivo, e o cancelamento pedido a outro worker vira o marcador
+<id>.cancelar, visto pelo dono do job entre um lote e outro.
+"""
+import asyncio
+import csv
+import json
+import os
+import secrets
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+from dotenv import load_dotenv
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import DATABASE_URL, DB_STATEMENT_CACHE_SIZE
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+JOBS_DIRETORIO = Path(os.getenv("JOBS_DIRETORIO", str(Path(tempfile.gettempdir()) / "wms-jobs")))
+JOBS_MAXIMO_SIMULTANEOS = int(os.getenv("JOBS_MAXIMO_SIMULTANEOS", "2"))
+JOBS_FILA_MAXIMA = int(os.getenv("JOBS_FILA_MAXIMA", "20"))
+JOBS_RESULTADO_TTL = float(os.getenv("JOBS_RESULTADO_TTL", "3600"))
+JOBS_LIMPEZA_INTERVALO = float(os.getenv("JOBS_LIMPEZA_INTERVALO", "60"))
+# linhas trazidas do banco (cursor no servidor) e gravadas no arquivo por vez
+JOBS_LINHAS_POR_LOTE = int(os.getenv("JOBS_LINHAS_POR_LOTE", "1000"))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+CANCELADO = "cancelado"
+FINALIZADOS = (CONCLUIDO, FALHOU, CANCELADO)
+
+# intervalo mínimo entre gravações do progresso em <id>.json
+_PROGRESSO_INTERVALO = 1.0
+
+if DATABASE_URL:
+    engine_jobs = create_async_engine(
+        DATABASE_URL,
+        pool_size=JOBS_MAXIMO_SIMULTANEOS,
+        max_overflow=0,
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    )
+else:
+    engine_jobs = None
+SessionJobs = async_sessionmaker(bind=engine_jobs, expire_on_commit=False)
+
+
+class TipoJob:
+    def __init__(self, nome: str, gerar: Callable, concorrencia: int, parametros: tuple[str, ...],
+                 contar: Callable | None, formatar: Callable | None):
+        self.nome = nome
+        self.gerar = gerar
+        self.parametros = parametros
+        self.contar = contar
+        self.formatar = formatar
+        self.concorrencia = concorrencia
+        self.semaforo = asyncio.Semaphore(concorrencia)
+
+
+_tipos: dict[str, TipoJob] = {}
+_jobs: dict[str, "Job"] = {}
+# o pool de execução do worker: no máximo JOBS_MAXIMO_SIMULTANEOS jobs ao mesmo tempo
+_vagas = asyncio.Semaphore(JOBS_MAXIMO_SIMULTANEOS)
+
+
+def registrar_tipo(
+    nome: str,
+    gerar: Callable[[AsyncSession, dict], AsyncIterator[list]],
+    concorrencia: int = 1,
+    parametros: tuple[str, ...] = (),
+    contar: Callable[[AsyncSession, dict], Awaitable[int]] | None = None,
+    formatar: Callable[[dict], dict] | None = None,
+):
+    """
+    Registra um tipo de job. gerar(db, parametros) é um gerador assíncrono
+    de listas de linhas (mappings ou dicts, sempre com as mesmas chaves);
+    formatar(linha), opcional, transforma cada linha antes da gravação;
+    contar(db, parametros), opcional, devolve o total de linhas esperado,
+    usado no percentual. parametros são os nomes aceitos no corpo do POST.
+    """
+    _tipos[nome] = TipoJob(nome, gerar, concorrencia, parametros, contar, formatar)
+
+
+def tipos() -> dict[str, TipoJob]:
+    return _tipos
+
+
+async def em_lotes(db: AsyncSession, query: Select) -> AsyncIterator[list]:
+    """Executa query com cursor no servidor e devolve as linhas em lotes de JOBS_LINHAS_POR_LOTE."""
+    # direto na conexão: o Result da Session passa cada linha pelo carregamento do ORM, à toa para um Select de colunas
+    conn = await db.connection()
+    result = await conn.stream(query.execution_options(yield_per=JOBS_LINHAS_POR_LOTE))
+    async for linhas in result.mappings().partitions():
+        yield linhas
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _arquivo(id: str, extensao: str) -> Path:
+    return JOBS_DIRETORIO / f"{id}.{extensao}"
+
+
+class CancelamentoSolicitado(Exception):
+    """O marcador <id>.cancelar apareceu (cancelamento pedido a outro worker)."""
+
+
+class Job:
+    def __init__(self, tipo: str, parametros: dict):
+        self.id = secrets.token_hex(12)
+        self.tipo = tipo
+        self.parametros = parametros
+        self.status = PENDENTE
+        self.criado_em = _agora()
+        self.iniciado_em: datetime | None = None
+        self.concluido_em: datetime | None = None
+        self.expira_em: datetime | None = None
+        self.linhas = 0
+        self.total: int | None = None
+        self.tamanho_bytes: int | None = None
+        self.erro: str | None = None
+        self.tarefa: asyncio.Task | None = None
+        self._gravado_em = 0.0
+
+    @property
+    def resultado(self) -> Path:
+        return _arquivo(self.id, "csv")
+
+    def para_dict(self) -> dict:
+        if self.status == CONCLUIDO:
+            percentual = 100.0
+        elif self.total:
+            # o total é uma estimativa (ex.: JOINs que repetem linhas); só chega a 100 no fim
+            percentual = min(round(self.linhas * 100 / self.total, 1), 99.0)
+        else:
+            percentual = None
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "parametros": self.parametros,
+            "status": self.status,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "concluido_em": self.concluido_em,
+            "expira_em": self.expira_em,
+            "linhas": self.linhas,
+            "total": self.total,
+            "percentual": percentual,
+            "tamanho_bytes": self.tamanho_bytes,
+            "erro": self.erro,
+        }
+
+    def gravar_estado(self, forcar: bool = True):
+        """Grava <id>.json (escrita atômica por rename) para os outros workers; o progresso no máximo 1x por segundo."""
+        agora = time.monotonic()
+        if not forcar and agora - self._gravado_em < _PROGRESSO_INTERVALO:
+            return
+        self._gravado_em = agora
+        temporario = _arquivo(self.id, "json.tmp")
+        temporario.write_text(json.dumps(self.para_dict(), default=str), encoding="utf-8")
+        temporario.replace(_arquivo(self.id, "json"))
+
+    def conferir_cancelamento(self):
+        if _arquivo(self.id, "cancelar").exists():
+            raise CancelamentoSolicitado()
+
+
+class _ArquivoCsv:
+    """Formata e grava os lotes; roda numa thread (asyncio.to_thread) para não segurar o event loop."""
+
+    def __init__(self, arquivo, formatar: Callable[[dict], dict] | None):
+        self._escritor = csv.writer(arquivo)
+        self._formatar = formatar
+        self._cabecalho = False
+
+    def gravar(self, lote: list):
+        linhas = [self._formatar(dict(linha)) if self._formatar else dict(linha) for linha in lote]
+        if not self._cabecalho:
+            self._escritor.writerow(list(linhas[0]))
+            self._cabecalho = True
+        self._escritor.writerows(map(dict.values, linhas))
+
+
+def _remover_arquivos(id: str):
+    for extensao in ("csv", "csv.parcial", "json", "json.tmp", "cancelar"):
+        _arquivo(id, extensao).unlink(missing_ok=True)
+
+
+async def _executar(job: Job, tipo: TipoJob):
+    parcial = _arquivo(job.id, "csv.parcial")
+    try:
+        # primeiro a vaga do tipo, depois a geral: um job barrado pelo limite do tipo não segura vaga dos outros
+        async with tipo.semaforo, _vagas:
+            job.conferir_cancelamento()
+            job.status = EXECUTANDO
+            job.iniciado_em = _agora()
+            job.gravar_estado()
+            async with SessionJobs() as db:
+                if tipo.contar is not None:
+                    job.total = await tipo.contar(db, job.parametros)
+                with open(parcial, "w", newline="", encoding="utf-8") as arquivo:
+                    escritor = _ArquivoCsv(arquivo, tipo.formatar)
+                    async for lote in tipo.gerar(db, job.parametros):
+                        if not lote:
+                            continue
+                        await asyncio.to_thread(escritor.gravar, lote)
+                        job.linhas += len(lote)
+                        job.conferir_cancelamento()
+                        job.gravar_estado(forcar=False)
+            parcial.replace(job.resultado)
+            job.tamanho_bytes = job.resultado.stat().st_size
+            job.status = CONCLUIDO
+            print(f"Job {job.tipo} {job.id}: {job.linhas} linhas em {(_agora() - job.iniciado_em).total_seconds():.2f}s")
+    except (asyncio.CancelledError, CancelamentoSolicitado):
+        job.status = CANCELADO
+    except Exception as e:
+        print(f"Job {job.tipo} {job.id} falhou: {e}")
+        job.status = FALHOU
+        job.erro = str(e)
+    finally:
+        parcial.unlink(missing_ok=True)
+        _finalizar(job)
+
+
+def _finalizar(job: Job):
+    _arquivo(job.id, "cancelar").unlink(missing_ok=True)
+    job.concluido_em = _agora()
+    job.expira_em = job.concluido_em + timedelta(seconds=JOBS_RESULTADO_TTL)
+    job.gravar_estado()
+
+
+def _ativos() -> int:
+    return sum(1 for job in _jobs.values() if job.status not in FINALIZADOS)
+
+
+def submeter(tipo: str, parametros: dict) -> Job | None:
+    """Cria e enfileira o job; None quando a fila do worker está cheia."""
+    if _ativos() >= JOBS_FILA_MAXIMA:
+        return None
+    JOBS_DIRETORIO.mkdir(parents=True, exist_ok=True)
+    job = Job(tipo, parametros)
+    _jobs[job.id] = job
+    job.gravar_estado()
+    job.tarefa = asyncio.create_task(_executar(job, _tipos[tipo]))
+    return job
+
+
+def consultar(id: str) -> dict | None:
+    """Estado do job: da memória, ou de <id>.json quando foi recebido por outro worker."""
+    job = _jobs.get(id)
+    if job is not None:
+        return job.para_dict()
+    if not id.isalnum():
+        return None
+    try:
+        return json.loads(_arquivo(id, "json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def listar() -> list[dict]:
+    return [job.para_dict() for job in sorted(_jobs.values(), key=lambda job: job.criado_em, reverse=True)]
+
+
+def arquivo_resultado(id: str) -> Path:
+    return _arquivo(id, "csv")
+
+
+def cancelar(id: str) -> dict | None:
+    """
+    Cancela o job pendente ou em execução; se já terminou, apaga o
+    resultado. Job de outro worker em andamento recebe o marcador
+    <id>.cancelar e para no próximo lote.
+    """
+    job = _jobs.get(id)
+    if job is None:
+        estado = consultar(id)
+        if estado is None:
+            return None
+        if estado["status"] in FINALIZADOS:
+            _remover_arquivos(id)
+        else:
+            _arquivo(id, "cancelar").touch()
+        return estado
+    if job.status in FINALIZADOS:
+        _remover_arquivos(id)
+        del _jobs[id]
+    else:
+        job.tarefa.cancel()
+        if job.status == PENDENTE:
+            # a tarefa pode nem ter começado, e aí não passa pelo except de _executar
+            job.status = CANCELADO
+            _finalizar(job)
+    return job.para_dict()
+
+
+def limpar_expirados() -> int:
+    """Remove jobs e arquivos vencidos, inclusive os deixados por outros workers ou por um processo que caiu."""
+    agora = _agora()
+    removidos = 0
+    for id, job in list(_jobs.items()):
+        if job.expira_em is not None and job.expira_em <= agora:
+            _remover_arquivos(id)
+            del _jobs[id]
+            removidos += 1
+    if JOBS_DIRETORIO.exists():
+        # arquivos sem dono nesta memória: vale a data de modificação (o estado é regravado durante a execução)
+        limite = time.time() - JOBS_RESULTADO_TTL
+        for caminho in JOBS_DIRETORIO.iterdir():
+            id = caminho.name.split(".", 1)[0]
+            if id not in _jobs and caminho.stat().st_mtime < limite:
+                caminho.unlink(missing_ok=True)
+                if caminho.suffix == ".json":
+                    removidos += 1
+    return removidos
+
+
+async def acompanhar_jobs():
+    """Laço de fundo da limpeza dos resultados expirados."""
+    while True:
+        await asyncio.sleep(JOBS_LIMPEZA_INTERVALO)
+        try:
+            removidos = limpar_expirados()
+            if removidos:
+                print(f"Jobs: {removidos} resultado(s) expirado(s) removido(s)")
+        except Exception as e:
+            print(f"Jobs: falha na limpeza dos resultados: {e}")
+
+
+async def encerrar_jobs():
+    """Cancela os jobs em andamento (o arquivo parcial é apagado) e fecha o pool de conexões dos jobs."""
+    tarefas = [job.tarefa for job in _jobs.values() if job.tarefa is not None and not job.tarefa.done()]
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    if engine_jobs is not None:
+        await engine_jobs.dispose()
@@ -0,0 +1,180 @@
+# app/core/metricas.py
+"""
+Métricas de requisições no formato texto do Prometheus, sem dependências
+externas: latência por rota, status, requisições em andamento e, por
+requisição, quantos comandos SQL foram executados e quanto tempo passaram
+no banco. Os números são por processo (um conjunto por worker).
+"""
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# limites (le) dos histogramas
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_COMANDOS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# rota usada quando o caminho não corresponde a nenhuma rota (404), para não
+# criar uma série por URL digitada
+ROTA_DESCONHECIDA = "desconhecida"
+
+
+class ContadoresRequisicao:
+    """Acumulado de SQL da requisição atual, compartilhado via contextvar."""
+    __slots__ = ("comandos", "tempo_db")
+
+    def __init__(self):
+        self.comandos = 0
+        self.tempo_db = 0.0
+
+
+_requisicao_atual: ContextVar[ContadoresRequisicao | None] = ContextVar("requisicao_atual", default=None)
+
+
+def contadores_requisicao() -> ContadoresRequisicao | None:
+    return _requisicao_atual.get()
+
+
+class Histograma:
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites: tuple):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+
+    def linhas(self, nome: str, rotulos: str) -> list[str]:
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+        linhas.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {self.total}')
+        linhas.append(f"{nome}_sum{{{rotulos}}} {self.soma}")
+        linhas.append(f"{nome}_count{{{rotulos}}} {self.total}")
+        return linhas
+
+
+_latencia: dict[tuple[str, str], Histograma] = {}
+_comandos_db: dict[tuple[str, str], Histograma] = {}
+_tempo_db: dict[tuple[str, str], Histograma] = {}
+_status: dict[tuple[str, str, int], int] = {}
+_em_andamento = 0
+_comandos_fora_de_requisicao = 0
+
+
+def _registrar(metodo: str, rota: str, status: int, duracao: float, contadores: ContadoresRequisicao):
+    chave = (metodo, rota)
+    if chave not in _latencia:
+        _latencia[chave] = Histograma(BUCKETS_LATENCIA)
+        _comandos_db[chave] = Histograma(BUCKETS_COMANDOS)
+        _tempo_db[chave] = Histograma(BUCKETS_LATENCIA)
+    _latencia[chave].observar(duracao)
+    _comandos_db[chave].observar(contadores.comandos)
+    _tempo_db[chave].observar(contadores.tempo_db)
+    chave_status = (metodo, rota, status)
+    _status[chave_status] = _status.get(chave_status, 0) + 1
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI puro (sem BaseHTTPMiddleware, que enfileira o corpo da
+    resposta). A rota é lida de scope["route"], preenchido pelo roteador do
+    FastAPI, para agrupar /ver_edicao/1 e /ver_edicao/2 em /ver_edicao/{codigo}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _em_andamento
+        status = 500
+        contadores = ContadoresRequisicao()
+        token = _requisicao_atual.set(contadores)
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        _em_andamento += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _em_andamento -= 1
+            _requisicao_atual.reset(token)
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", None) or ROTA_DESCONHECIDA
+            _registrar(scope["method"], caminho, status, duracao, contadores)
+
+
+def instrumentar_engine(engine):
+    """Conta comandos e tempo de banco da requisição atual (eventos do engine síncrono por baixo do async)."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        global _comandos_fora_de_requisicao
+        duracao = time.perf_counter() - conn.info["metricas_inicio"].pop()
+        contadores = _requisicao_atual.get()
+        if contadores is None:
+            _comandos_fora_de_requisicao += 1
+            return
+        contadores.comandos += 1
+        contadores.tempo_db += duracao
+
+
+def _rotulos(metodo: str, rota: str) -> str:
+    rota = rota.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{metodo}",route="{rota}"'
+
+
+def texto_prometheus(extras: dict[str, float] | None = None) -> str:
+    """Exposição no formato texto 0.0.4 do Prometheus."""
+    linhas = [
+        "# HELP http_requests_in_flight Requisições HTTP em andamento neste worker.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_em_andamento}",
+        "# HELP http_requests_total Requisições HTTP concluídas por rota e status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (metodo, rota, status), total in sorted(_status.items()):
+        linhas.append(f'http_requests_total{{{_rotulos(metodo, rota)},status="{status}"}} {total}')
+
+    for nome, descricao, series in (
+        ("http_request_duration_seconds", "Latência das requisições HTTP.", _latencia),
+        ("http_request_db_statements", "Comandos SQL executados por requisição.", _comandos_db),
+        ("http_request_db_seconds", "Tempo gasto no banco por requisição.", _tempo_db),
+    ):
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} histogram")
+        for (metodo, rota), histograma in sorted(series.items()):
+            linhas.extend(histograma.linhas(nome, _rotulos(metodo, rota)))
+
+    linhas.append("# HELP db_statements_outside_request_total Comandos SQL fora de requisições (startup, tarefas).")
+    linhas.append("# TYPE db_statements_outside_request_total counter")
+    linhas.append(f"db_statements_outside_request_total {_comandos_fora_de_requisicao}")
+
+    for nome, valor in (extras or {}).items():
+        linhas.append(f"# TYPE {nome} {'counter' if nome.endswith('_total') else 'gauge'}")
+        linhas.append(f"{nome} {valor}")
+    return "\n".join(linhas) + "\n"
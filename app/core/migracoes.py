@@ -0,0 +1,34 @@
+# app/core/migracoes.py
+"""
+Conferência da versão do esquema na inicialização. O esquema é mantido
+pelas migrações do Alembic (migrations/); o app não cria nem altera tabelas,
+apenas se recusa a subir com o banco numa revisão diferente da do código.
+"""
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+RAIZ = Path(__file__).parent.parent.parent
+
+
+def revisoes_do_codigo() -> set[str]:
+    config = Config(str(RAIZ / "alembic.ini"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+async def revisoes_do_banco(engine) -> set[str]:
+    async with engine.connect() as conn:
+        return set(await conn.run_sync(lambda c: MigrationContext.configure(c).get_current_heads()))
+
+
+async def verificar_esquema(engine):
+    esperadas = revisoes_do_codigo()
+    atuais = await revisoes_do_banco(engine)
+    if atuais != esperadas:
+        atual = ", ".join(sorted(atuais)) or "nenhuma (banco sem migrações)"
+        raise RuntimeError(
+            f"Esquema do banco na revisão {atual}, o código espera {', '.join(sorted(esperadas))}: "
+            "rode 'alembic upgrade head' (banco criado a partir de wmsSrpit.txt: ver README.md)"
+        )
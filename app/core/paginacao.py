@@ -0,0 +1,117 @@
+# app/core/paginacao.py
+import base64
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select, tuple_
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "100"))
+LIMITE_MAXIMO = int(os.getenv("PAGINACAO_LIMITE_MAXIMO", "1000"))
+
+# cabeçalho usado pelas rotas que devolvem lista pura (sem campo "dados")
+CABECALHO_CURSOR = "X-Proximo-Cursor"
+
+
+class Pagina:
+    """
+    Parâmetros ?limit=&after= das listagens.
+    Sem nenhum dos dois a rota devolve tudo, como antes da paginação.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+        after: Optional[str] = Query(None, description="Cursor opaco devolvido pela página anterior"),
+    ):
+        self.after = decodificar_cursor(after) if after else None
+        if limit is None and after is not None:
+            limit = LIMITE_PADRAO
+        self.limit = limit
+
+    @property
+    def ativa(self) -> bool:
+        return self.limit is not None
+
+    def proximo(self, quantidade: int, ultima_chave: tuple | None) -> str | None:
+        """Cursor da próxima página, ou None quando a página veio incompleta."""
+        if not self.ativa or ultima_chave is None or quantidade < self.limit:
+            return None
+        return codificar_cursor(ultima_chave)
+
+
+def _serializar(valor: Any):
+    if isinstance(valor, date):
+        return {"d": valor.isoformat()}
+    return valor
+
+
+def _desserializar(valor: Any):
+    if isinstance(valor, dict) and "d" in valor:
+        return date.fromisoformat(valor["d"])
+    return valor
+
+
+def codificar_cursor(chave: tuple) -> str:
+    dados = json.dumps([_serializar(v) for v in chave], separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        return tuple(_desserializar(v) for v in valores)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginação inválido")
+
+
+# limites de BIGINT: fora disso o asyncpg recusa o parâmetro
+_INTEIRO_MINIMO = -2 ** 63
+_INTEIRO_MAXIMO = 2 ** 63 - 1
+
+
+def _valor_compativel(valor: Any, coluna) -> bool:
+    """Confere o tipo de um valor do cursor com o da coluna da chave."""
+    tipo = coluna.type.python_type
+    if isinstance(valor, bool):
+        return False
+    if tipo is int:
+        return isinstance(valor, int) and _INTEIRO_MINIMO <= valor <= _INTEIRO_MAXIMO
+    if tipo is float:
+        return isinstance(valor, (int, float))
+    if tipo is date:
+        # datetime também é date, mas o cursor só gera datas
+        return type(valor) is date
+    return isinstance(valor, tipo)
+
+
+def paginar(query: Select, colunas: list, pagina: Pagina) -> Select:
+    """
+    Aplica keyset pagination: ordena pelas colunas da chave e continua
+    estritamente depois do cursor. As colunas devem formar uma chave única
+    e ter tipo conhecido (python_type), usado para validar o cursor.
+    Cursor que não corresponde às colunas gera 400 aqui, antes de chegar
+    ao banco: monte a query fora do try/except genérico da rota.
+    """
+    if not pagina.ativa:
+        return query
+
+    query = query.order_by(*colunas)
+    if pagina.after is not None:
+        if len(pagina.after) != len(colunas) or not all(
+            _valor_compativel(valor, coluna) for valor, coluna in zip(pagina.after, colunas)
+        ):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginação inválido")
+        if len(colunas) == 1:
+            query = query.where(colunas[0] > pagina.after[0])
+        else:
+            query = query.where(tuple_(*colunas) > tuple_(*pagina.after))
+    return query.limit(pagina.limit)
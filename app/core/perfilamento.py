@@ -0,0 +1,171 @@
+# app/core/perfilamento.py
+"""
+Modo de perfilamento opcional (PERFILAMENTO=1): registra os comandos SQL de
+cada requisição amostrada, aponta os lentos com o plano do EXPLAIN e as
+requisições que repetem o mesmo comando muitas vezes (N+1, como os INSERTs
+de categoria em laço). Os achados vão para um arquivo JSON lines rotativo.
+Desligado, nada aqui é registrado no app nem no engine.
+"""
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+PERFILAMENTO = os.getenv("PERFILAMENTO", "0").strip().lower() in ("1", "true", "sim", "yes", "on")
+# fração das requisições perfiladas (1 = todas, em desenvolvimento; 0.01 = 1% em produção)
+PERFILAMENTO_AMOSTRA = float(os.getenv("PERFILAMENTO_AMOSTRA", "1"))
+PERFILAMENTO_LENTO_MS = float(os.getenv("PERFILAMENTO_LENTO_MS", "100"))
+# mesmo comando executado mais que isto numa requisição é marcado como N+1
+PERFILAMENTO_REPETICOES = int(os.getenv("PERFILAMENTO_REPETICOES", "5"))
+PERFILAMENTO_ARQUIVO = os.getenv("PERFILAMENTO_ARQUIVO", "logs/perfilamento.jsonl")
+PERFILAMENTO_ARQUIVO_MAX_MB = float(os.getenv("PERFILAMENTO_ARQUIVO_MAX_MB", "20"))
+PERFILAMENTO_ARQUIVO_BACKUPS = int(os.getenv("PERFILAMENTO_ARQUIVO_BACKUPS", "5"))
+
+# só estes comandos passam pelo EXPLAIN (sem ANALYZE: nada é executado de novo)
+_EXPLICAVEIS = ("select", "insert", "update", "delete", "with")
+_TAMANHO_MAXIMO_SQL = 2000
+
+
+class PerfilRequisicao:
+    __slots__ = ("comandos",)
+
+    def __init__(self):
+        # (sql, parâmetros, duração em segundos, executemany)
+        self.comandos: list[tuple[str, object, float, bool]] = []
+
+
+_perfil_atual: ContextVar[PerfilRequisicao | None] = ContextVar("perfil_atual", default=None)
+_logger = logging.getLogger("perfilamento")
+
+
+def _configurar_arquivo():
+    if _logger.handlers:
+        return
+    caminho = Path(PERFILAMENTO_ARQUIVO)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        caminho,
+        maxBytes=int(PERFILAMENTO_ARQUIVO_MAX_MB * 1024 * 1024),
+        backupCount=PERFILAMENTO_ARQUIVO_BACKUPS,
+        encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+
+def instrumentar_engine_perfilamento(engine):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if _perfil_atual.get() is not None:
+            conn.info.setdefault("perfilamento_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        perfil = _perfil_atual.get()
+        inicios = conn.info.get("perfilamento_inicio")
+        if perfil is None or not inicios:
+            return
+        perfil.comandos.append((statement, parameters, time.perf_counter() - inicios.pop(), executemany))
+
+
+async def _explicar(engine, statement: str, parameters) -> list | str | None:
+    """Plano do comando em uma conexão separada, depois de a resposta já ter sido enviada."""
+    if not statement.lstrip().lower().startswith(_EXPLICAVEIS):
+        return None
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters or ())
+            plano = result.scalar()
+            return json.loads(plano) if isinstance(plano, str) else plano
+    except Exception as e:
+        return f"EXPLAIN falhou: {e}"
+
+
+async def _analisar(engine, metodo: str, rota: str, status: int, duracao: float, perfil: PerfilRequisicao):
+    lentos = []
+    for statement, parameters, tempo, executemany in perfil.comandos:
+        if tempo * 1000 < PERFILAMENTO_LENTO_MS:
+            continue
+        lentos.append({
+            "sql": statement[:_TAMANHO_MAXIMO_SQL],
+            "ms": round(tempo * 1000, 2),
+            "executemany": executemany,
+            "plano": None if executemany else await _explicar(engine, statement, parameters),
+        })
+
+    repeticoes = Counter(statement for statement, _, _, _ in perfil.comandos)
+    repetidos = [
+        {"sql": statement[:_TAMANHO_MAXIMO_SQL], "vezes": vezes}
+        for statement, vezes in repeticoes.most_common()
+        if vezes > PERFILAMENTO_REPETICOES
+    ]
+
+    if not lentos and not repetidos:
+        return
+
+    _logger.info(json.dumps({
+        "quando": datetime.now(timezone.utc).isoformat(),
+        "metodo": metodo,
+        "rota": rota,
+        "status": status,
+        "ms": round(duracao * 1000, 2),
+        "comandos": len(perfil.comandos),
+        "ms_db": round(sum(tempo for _, _, tempo, _ in perfil.comandos) * 1000, 2),
+        "lentos": lentos,
+        "repetidos": repetidos,
+    }, ensure_ascii=False, default=str))
+
+    for r in repetidos:
+        print(f"⚠️  Possível N+1 em {metodo} {rota}: {r['vezes']}x {r['sql'][:120]}")
+    for l in lentos:
+        print(f"🐢 Comando lento em {metodo} {rota}: {l['ms']} ms {l['sql'][:120]}")
+
+
+class PerfilamentoMiddleware:
+    """Middleware ASGI que sorteia as requisições perfiladas e analisa seus comandos ao final."""
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.engine = engine
+        _configurar_arquivo()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= PERFILAMENTO_AMOSTRA:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        perfil = PerfilRequisicao()
+        token = _perfil_atual.set(perfil)
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _perfil_atual.reset(token)
+            rota = getattr(scope.get("route"), "path", None) or scope["path"]
+            try:
+                await _analisar(self.engine, scope["method"], rota, status, duracao, perfil)
+            except Exception as e:
+                print(f"Erro no perfilamento de {rota}: {e}")
@@ -0,0 +1,340 @@
+# app/core/previsao.py
+"""
+Job de previsão de demanda diária por produto.
+
+A série de cada produto é a saída diária do movimento diário (soma de
+FactSaidas por dia) nos últimos PREVISAO_JANELA_DIAS dias, a partir do
+primeiro dia com saída. Produtos de demanda intermitente (intervalo médio
+entre demandas acima de 1,32 dia) usam Croston com a correção de
+Syntetos-Boylan; os demais, suavização exponencial simples. O alfa de cada
+produto é o da grade PREVISAO_ALFAS com menor erro um passo à frente.
+
+O ajuste é CPU puro e roda num ProcessPoolExecutor (PREVISAO_PROCESSOS
+processos, spawn), com os produtos divididos em fatias para não bloquear o
+event loop. A leitura das séries e a gravação ficam no processo do app.
+Cada execução grava uma linha em previsaoexecucao e as previsões em
+previsaodemanda; GET /previsao/{codigo} lê a última execução concluída.
+
+O job roda a cada PREVISAO_INTERVALO segundos (0 desliga o agendamento) e
+sob demanda por POST /previsao/executar. Cada execução roda numa conexão
+própria, fora dos pools das requisições e dos jobs, e numa transação só,
+que segura um advisory lock do Postgres (pg_advisory_xact_lock): uma
+execução por vez mesmo com vários workers, e a trava some com a transação
+se o worker cair. Execuções que ficaram "executando" assim são marcadas
+como "falhou" quando o agendamento começa.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.database import DATABASE_URL, DB_STATEMENT_CACHE_SIZE, engine
+from app.models import MovimentoDiario, PrevisaoDemanda, PrevisaoExecucao
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+PREVISAO_JANELA_DIAS = int(os.getenv("PREVISAO_JANELA_DIAS", "365"))
+PREVISAO_PROCESSOS = int(os.getenv("PREVISAO_PROCESSOS", str(os.cpu_count() or 1)))
+# segundos entre execuções agendadas; 0 = só sob demanda
+PREVISAO_INTERVALO = float(os.getenv("PREVISAO_INTERVALO", "86400"))
+# execuções concluídas mantidas no banco (as mais antigas são apagadas ao fim de cada execução)
+PREVISAO_EXECUCOES_MANTIDAS = int(os.getenv("PREVISAO_EXECUCOES_MANTIDAS", "3"))
+PREVISAO_ALFAS = tuple(float(a) for a in os.getenv("PREVISAO_ALFAS", "0.05,0.1,0.2,0.3,0.5").split(","))
+
+# intervalo médio entre demandas a partir do qual a série é tratada como intermitente (Syntetos-Boylan)
+LIMITE_INTERMITENTE = 1.32
+# chave do advisory lock que serializa as execuções entre workers
+CHAVE_TRAVA = 7_301_023
+
+# sem pool: cada execução abre e fecha a sua conexão, que fica ocupada do início ao fim
+if DATABASE_URL:
+    engine_previsao = create_async_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    )
+else:
+    engine_previsao = None
+
+_TENTAR_TRAVA = text("SELECT pg_try_advisory_xact_lock(:chave)")
+
+_pool: ProcessPoolExecutor | None = None
+_tarefas: set[asyncio.Task] = set()
+
+
+# ---------- modelos (rodam nos processos do pool) ----------
+
+def suavizacao_exponencial(serie: list[float], alfa: float) -> tuple[float, float]:
+    """(previsão, soma dos erros quadráticos um passo à frente)."""
+    nivel = serie[0]
+    sse = 0.0
+    for x in serie[1:]:
+        erro = x - nivel
+        sse += erro * erro
+        nivel += alfa * erro
+    return nivel, sse
+
+
+def croston(serie: list[float], alfa: float) -> tuple[float, float]:
+    """
+    Croston com a correção de Syntetos-Boylan: suaviza separadamente o
+    tamanho das demandas e o intervalo entre elas; a previsão por dia é
+    tamanho / intervalo * (1 - alfa / 2). A série começa com uma demanda.
+    """
+    tamanho = serie[0]
+    intervalo = 1.0
+    dias_sem_demanda = 1
+    correcao = 1 - alfa / 2
+    sse = 0.0
+    for x in serie[1:]:
+        erro = x - tamanho / intervalo * correcao
+        sse += erro * erro
+        if x > 0:
+            tamanho += alfa * (x - tamanho)
+            intervalo += alfa * (dias_sem_demanda - intervalo)
+            dias_sem_demanda = 1
+        else:
+            dias_sem_demanda += 1
+    return tamanho / intervalo * correcao, sse
+
+
+def prever_serie(serie: np.ndarray, alfas: tuple[float, ...] = PREVISAO_ALFAS) -> dict:
+    """Escolhe o método pela intermitência e o alfa pelo menor erro; serie é a demanda diária."""
+    com_demanda = np.flatnonzero(serie > 0)
+    if len(com_demanda) == 0:
+        return {"metodo": "sem_demanda", "alfa": None, "previsao_diaria": 0.0,
+                "demanda_media": 0.0, "erro_medio": None, "dias_com_demanda": 0}
+
+    valores = serie[com_demanda[0]:].tolist()
+    intermitente = len(valores) / len(com_demanda) > LIMITE_INTERMITENTE
+    modelo = croston if intermitente else suavizacao_exponencial
+
+    melhor = None
+    for alfa in alfas:
+        previsao, sse = modelo(valores, alfa)
+        if melhor is None or sse < melhor[2]:
+            melhor = (alfa, previsao, sse)
+    alfa, previsao, sse = melhor
+    return {
+        "metodo": "croston" if intermitente else "ses",
+        "alfa": alfa,
+        "previsao_diaria": max(previsao, 0.0),
+        "demanda_media": sum(valores) / len(valores),
+        "erro_medio": (sse / (len(valores) - 1)) ** 0.5 if len(valores) > 1 else None,
+        "dias_com_demanda": len(com_demanda),
+    }
+
+
+def prever_fatia(fatia: list[tuple[int, np.ndarray, np.ndarray]], dias: int) -> list[dict]:
+    """Roda num processo do pool: fatia são (codigo, dias com saída, quantidades) em formato esparso."""
+    resultados = []
+    for codigo, indices, quantidades in fatia:
+        serie = np.zeros(dias)
+        serie[indices] = quantidades
+        resultado = prever_serie(serie)
+        resultado["codigo"] = codigo
+        resultados.append(resultado)
+    return resultados
+
+
+# ---------- execução (processo do app) ----------
+
+def criar_pool(processos: int = PREVISAO_PROCESSOS) -> ProcessPoolExecutor:
+    # spawn: um fork do worker copiaria o event loop, conexões abertas e threads do bcrypt
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = criar_pool()
+    return _pool
+
+
+def encerrar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def get_series_query(inicio: date, fim: date):
+    """Dias com saída (deslocamento a partir de inicio) e quantidades de cada produto."""
+    m = MovimentoDiario
+    return (
+        select(
+            m.codigo,
+            func.array_agg(m.dia - inicio).label("indices"),
+            func.array_agg(m.quant_saida).label("quantidades")
+        )
+        .where(m.dia.between(inicio, fim), m.quant_saida > 0)
+        .group_by(m.codigo)
+    )
+
+
+async def carregar_series(conn: AsyncConnection, fim: date | None = None) -> tuple[list, int]:
+    """(séries esparsas de todos os produtos com saída na janela, tamanho da janela em dias)."""
+    fim = fim or date.today()
+    inicio = fim - timedelta(days=PREVISAO_JANELA_DIAS - 1)
+    result = await conn.execute(get_series_query(inicio, fim))
+    series = [
+        (codigo, np.asarray(indices, dtype=np.int64), np.asarray(quantidades, dtype=np.float64))
+        for codigo, indices, quantidades in result.all()
+    ]
+    return series, PREVISAO_JANELA_DIAS
+
+
+def fatiar(series: list, fatias: int) -> list[list]:
+    """Divide em fatias intercaladas, para que produtos com séries parecidas não caiam todos no mesmo processo."""
+    return [fatia for fatia in (series[i::fatias] for i in range(fatias)) if fatia]
+
+
+async def calcular_previsoes(series: list, dias: int, executor: ProcessPoolExecutor, processos: int) -> list[dict]:
+    """Ajusta todas as séries no pool; várias fatias por processo equilibram a carga entre eles."""
+    loop = asyncio.get_running_loop()
+    tarefas = [loop.run_in_executor(executor, prever_fatia, fatia, dias) for fatia in fatiar(series, processos * 4)]
+    return [resultado for parcial in await asyncio.gather(*tarefas) for resultado in parcial]
+
+
+async def _executar(conn: AsyncConnection, idexecucao: int):
+    """Roda na transação que segura a trava: o commit (ou o rollback) a libera."""
+    inicio = time.perf_counter()
+    try:
+        series, dias = await carregar_series(conn)
+        resultados = await calcular_previsoes(series, dias, _obter_pool(), PREVISAO_PROCESSOS)
+
+        for resultado in resultados:
+            resultado["idexecucao"] = idexecucao
+        if resultados:
+            await conn.execute(insert(PrevisaoDemanda.__table__), resultados)
+        await conn.execute(
+            update(PrevisaoExecucao)
+            .where(PrevisaoExecucao.idexecucao == idexecucao)
+            .values(status="concluida", concluida_em=func.clock_timestamp(), produtos=len(resultados),
+                    duracao_s=round(time.perf_counter() - inicio, 3))
+        )
+        # mantém só as últimas execuções concluídas (as previsões vão junto pelo CASCADE)
+        mantidas = (
+            select(PrevisaoExecucao.idexecucao)
+            .where(PrevisaoExecucao.status == "concluida")
+            .order_by(PrevisaoExecucao.idexecucao.desc())
+            .limit(PREVISAO_EXECUCOES_MANTIDAS)
+        )
+        await conn.execute(
+            delete(PrevisaoExecucao)
+            .where(PrevisaoExecucao.idexecucao.not_in(mantidas), PrevisaoExecucao.status != "executando")
+        )
+        await conn.commit()
+        print(f"Previsão {idexecucao}: {len(resultados)} produtos em {time.perf_counter() - inicio:.1f}s "
+              f"({PREVISAO_PROCESSOS} processos)")
+    except Exception as e:
+        print(f"❌ Previsão {idexecucao} falhou: {e}")
+        await conn.rollback()
+        await conn.execute(
+            update(PrevisaoExecucao)
+            .where(PrevisaoExecucao.idexecucao == idexecucao)
+            .values(status="falhou", concluida_em=func.clock_timestamp(), erro=str(e)[:2000],
+                    duracao_s=round(time.perf_counter() - inicio, 3))
+        )
+        await conn.commit()
+    finally:
+        await conn.close()
+
+
+async def iniciar_previsao() -> int | None:
+    """
+    Registra uma execução e a dispara em segundo plano, devolvendo o id.
+    None se outra execução (deste ou de outro worker) estiver em andamento.
+    """
+    conn = await engine_previsao.connect()
+    try:
+        if not (await conn.execute(_TENTAR_TRAVA, {"chave": CHAVE_TRAVA})).scalar():
+            await conn.close()
+            return None
+        # registrada à parte, para aparecer em /previsao/execucoes enquanto a transação da execução está aberta
+        async with engine.begin() as registro:
+            idexecucao = (await registro.execute(
+                insert(PrevisaoExecucao)
+                .values(status="executando", produtos=0, processos=PREVISAO_PROCESSOS)
+                .returning(PrevisaoExecucao.idexecucao)
+            )).scalar_one()
+    except BaseException:
+        await conn.close()
+        raise
+
+    tarefa = asyncio.create_task(_executar(conn, idexecucao))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+    return idexecucao
+
+
+async def marcar_interrompidas() -> int:
+    """
+    Marca como "falhou" as execuções que ficaram "executando" porque o
+    worker caiu no meio. Só com a trava livre: aí nenhuma execução está em
+    andamento em outro worker (a trava vem antes do registro da execução).
+    """
+    async with engine_previsao.begin() as conn:
+        if not (await conn.execute(_TENTAR_TRAVA, {"chave": CHAVE_TRAVA})).scalar():
+            return 0
+        result = await conn.execute(
+            update(PrevisaoExecucao)
+            .where(PrevisaoExecucao.status == "executando")
+            .values(status="falhou", concluida_em=func.clock_timestamp(),
+                    erro="Interrompida: o worker foi encerrado durante a execução")
+        )
+    if result.rowcount:
+        print(f"Previsão: {result.rowcount} execução(ões) interrompida(s) marcada(s) como falha")
+    return result.rowcount
+
+
+async def encerrar_previsoes():
+    """Cancela as execuções em andamento (o rollback libera a trava) e fecha o pool de processos."""
+    tarefas = list(_tarefas)
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    encerrar_pool()
+
+
+async def agendar_previsoes():
+    """
+    Laço de fundo: marca as execuções interrompidas e dispara a previsão
+    quando a última concluída tem mais de PREVISAO_INTERVALO segundos.
+    """
+    if engine is None:
+        return
+    try:
+        await marcar_interrompidas()
+    except Exception as e:
+        print(f"Previsão: falha ao marcar as execuções interrompidas: {e}")
+    if PREVISAO_INTERVALO <= 0:
+        return
+    while True:
+        # a primeira verificação espera o worker subir e aquecer
+        await asyncio.sleep(min(PREVISAO_INTERVALO, 300))
+        try:
+            # comparado com o relógio do banco, que preencheu iniciada_em
+            async with engine.connect() as conn:
+                recente = (await conn.execute(
+                    select(PrevisaoExecucao.idexecucao)
+                    .where(
+                        PrevisaoExecucao.status == "concluida",
+                        PrevisaoExecucao.iniciada_em > func.now() - timedelta(seconds=PREVISAO_INTERVALO)
+                    )
+                    .limit(1)
+                )).scalar()
+            if recente is None:
+                await iniciar_previsao()
+        except Exception as e:
+            print(f"Agendamento da previsão falhou: {e}")
@@ -0,0 +1,207 @@
+# app/core/reposicao.py
+"""
+Estoque de segurança e ponto de reposição por produto (GET /estoqueseguranca).
+
+A demanda diária vem do movimento diário (MovimentoDiario, que soma as
+saídas de FactSaidas por dia) numa janela de ESTOQUE_SEGURANCA_JANELA_DIAS;
+dias sem saída contam como demanda zero. O lead time é estimado pelo
+intervalo, em dias, entre recebimentos consecutivos do produto na mesma
+janela (não há data de pedido no banco); com menos de dois recebimentos
+vale ESTOQUE_SEGURANCA_LEAD_TIME_PADRAO.
+
+    estoque de segurança = z * sqrt(LT * σd² + d² * σLT²)
+    ponto de reposição   = d * LT + estoque de segurança
+
+onde d e σd são a média e o desvio padrão da demanda diária, LT e σLT os
+do lead time e z o quantil da normal para o nível de serviço.
+
+O banco devolve, numa única consulta, somas e somas de quadrados por
+produto (transferir a série dia a dia de todos os produtos custa segundos);
+médias, desvios e as fórmulas são calculados com NumPy para todos os
+produtos de uma vez. O resultado fica em memória e é refeito em segundo
+plano a cada ESTOQUE_SEGURANCA_ATUALIZACAO segundos; até lá a rota serve o
+cálculo anterior.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import Float, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import SessionLocal
+from app.models import MovimentoDiario
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+ESTOQUE_SEGURANCA_JANELA_DIAS = int(os.getenv("ESTOQUE_SEGURANCA_JANELA_DIAS", "180"))
+ESTOQUE_SEGURANCA_NIVEL_SERVICO = float(os.getenv("ESTOQUE_SEGURANCA_NIVEL_SERVICO", "0.95"))
+ESTOQUE_SEGURANCA_LEAD_TIME_PADRAO = float(os.getenv("ESTOQUE_SEGURANCA_LEAD_TIME_PADRAO", "7"))
+# segundos até o cálculo ser refeito (em segundo plano, servindo o anterior enquanto isso)
+ESTOQUE_SEGURANCA_ATUALIZACAO = float(os.getenv("ESTOQUE_SEGURANCA_ATUALIZACAO", "3600"))
+
+
+def fator_z(nivel_servico: float) -> float:
+    """Quantil da normal padrão: 0.95 -> 1.645."""
+    return NormalDist().inv_cdf(nivel_servico)
+
+
+def get_estatisticas_demanda_query(inicio: date, fim: date):
+    """
+    Uma linha por produto com movimento na janela: dias de histórico (desde
+    o primeiro movimento do produto, se for posterior ao início), soma e soma
+    dos quadrados da saída diária, e quantidade, soma e soma dos quadrados
+    dos intervalos entre dias de recebimento.
+    """
+    m = MovimentoDiario
+    dias = (
+        select(
+            m.codigo,
+            m.dia,
+            m.quant_saida.label("saida"),
+            m.quant_recebida.label("recebida")
+        )
+        .where(m.dia.between(inicio, fim))
+        .subquery("dias")
+    )
+    # último dia com recebimento antes deste, para o intervalo entre recebimentos
+    anterior = func.max(dias.c.dia).filter(dias.c.recebida > 0).over(
+        partition_by=dias.c.codigo, order_by=dias.c.dia, rows=(None, -1)
+    )
+    serie = select(dias, anterior.label("anterior")).subquery("serie")
+
+    intervalo = serie.c.dia - serie.c.anterior
+    recebimento = (serie.c.recebida > 0) & serie.c.anterior.isnot(None)
+    return (
+        select(
+            serie.c.codigo,
+            (literal(fim) - func.min(serie.c.dia) + 1).label("dias"),
+            cast(func.sum(serie.c.saida), Float).label("soma"),
+            cast(func.sum(serie.c.saida * serie.c.saida), Float).label("soma_quadrados"),
+            func.count(intervalo).filter(recebimento).label("intervalos"),
+            cast(func.coalesce(func.sum(intervalo).filter(recebimento), 0), Float).label("soma_intervalos"),
+            cast(func.coalesce(func.sum(intervalo * intervalo).filter(recebimento), 0), Float).label("soma_quadrados_intervalos")
+        )
+        .group_by(serie.c.codigo)
+        .order_by(serie.c.codigo)
+    )
+
+
+def _media_desvio(n: np.ndarray, soma: np.ndarray, soma_quadrados: np.ndarray):
+    """Média e desvio padrão amostral a partir das somas; desvio 0 com menos de duas observações."""
+    media = np.divide(soma, n, out=np.zeros_like(soma), where=n > 0)
+    variancia = np.divide(soma_quadrados - n * media ** 2, n - 1, out=np.zeros_like(soma), where=n > 1)
+    # erro de arredondamento pode deixar a variância levemente negativa
+    return media, np.sqrt(np.clip(variancia, 0, None))
+
+
+class ParametrosReposicao:
+    """Demanda e lead time de todos os produtos, em arrays alinhados por posição."""
+
+    def __init__(self, rows, inicio: date, fim: date):
+        colunas = list(zip(*rows)) if rows else [()] * 7
+        self.inicio = inicio
+        self.fim = fim
+        self.calculado_em = time.time()
+        self.codigos = np.fromiter(colunas[0], dtype=np.int64, count=len(rows))
+        dias, soma, soma_quadrados, intervalos, soma_intervalos, soma_quadrados_intervalos = (
+            np.fromiter(coluna, dtype=np.float64, count=len(rows)) for coluna in colunas[1:]
+        )
+        self.demanda_media, self.demanda_desvio = _media_desvio(dias, soma, soma_quadrados)
+        lead_time, self.lead_time_desvio = _media_desvio(intervalos, soma_intervalos, soma_quadrados_intervalos)
+        self.lead_time = np.where(intervalos > 0, lead_time, ESTOQUE_SEGURANCA_LEAD_TIME_PADRAO)
+        self._posicoes = {int(codigo): i for i, codigo in enumerate(self.codigos)}
+        self._corpos: dict[float, bytes] = {}
+
+    def calcular(self, nivel_servico: float) -> tuple[np.ndarray, np.ndarray]:
+        """(estoque de segurança, ponto de reposição) de todos os produtos."""
+        z = fator_z(nivel_servico)
+        seguranca = z * np.sqrt(
+            self.lead_time * self.demanda_desvio ** 2 + self.demanda_media ** 2 * self.lead_time_desvio ** 2
+        )
+        return seguranca, self.demanda_media * self.lead_time + seguranca
+
+    def _linha(self, i: int, seguranca: np.ndarray, reposicao: np.ndarray) -> dict:
+        return {
+            "codigo": int(self.codigos[i]),
+            "estoque_seguranca": round(float(seguranca[i]), 2),
+            "ponto_reposicao": round(float(reposicao[i]), 2),
+            "demanda_media": round(float(self.demanda_media[i]), 4),
+            "demanda_desvio": round(float(self.demanda_desvio[i]), 4),
+            "lead_time_dias": round(float(self.lead_time[i]), 2),
+            "lead_time_desvio": round(float(self.lead_time_desvio[i]), 2),
+        }
+
+    def linhas(self, nivel_servico: float) -> list[dict]:
+        """Produtos com alguma saída na janela, na ordem do código."""
+        seguranca, reposicao = self.calcular(nivel_servico)
+        return [self._linha(i, seguranca, reposicao) for i in np.flatnonzero(self.demanda_media > 0)]
+
+    def corpo(self, nivel_servico: float) -> bytes:
+        """linhas() já serializadas em JSON, guardadas por nível de serviço até o próximo recálculo."""
+        corpo = self._corpos.get(nivel_servico)
+        if corpo is None:
+            if len(self._corpos) >= 16:
+                self._corpos.clear()
+            corpo = self._corpos[nivel_servico] = json.dumps(self.linhas(nivel_servico)).encode()
+        return corpo
+
+    def produto(self, codigo: int, nivel_servico: float) -> dict | None:
+        i = self._posicoes.get(codigo)
+        if i is None:
+            return None
+        seguranca, reposicao = self.calcular(nivel_servico)
+        return self._linha(i, seguranca, reposicao)
+
+
+async def calcular_parametros(db: AsyncSession, fim: date | None = None) -> ParametrosReposicao:
+    fim = fim or date.today()
+    inicio = fim - timedelta(days=ESTOQUE_SEGURANCA_JANELA_DIAS - 1)
+    result = await db.execute(get_estatisticas_demanda_query(inicio, fim))
+    return ParametrosReposicao(result.all(), inicio, fim)
+
+
+class CacheReposicao:
+    """
+    Guarda o último cálculo. O primeiro pedido espera o cálculo; depois de
+    ESTOQUE_SEGURANCA_ATUALIZACAO segundos o próximo pedido dispara o
+    recálculo em segundo plano e continua recebendo o anterior.
+    """
+
+    def __init__(self, intervalo: float = ESTOQUE_SEGURANCA_ATUALIZACAO):
+        self.intervalo = intervalo
+        self._parametros: ParametrosReposicao | None = None
+        self._lock = asyncio.Lock()
+        self._tarefa: asyncio.Task | None = None
+
+    async def _calcular(self) -> ParametrosReposicao:
+        inicio = time.perf_counter()
+        async with SessionLocal() as db:
+            parametros = await calcular_parametros(db)
+        print(f"Estoque de segurança recalculado para {len(parametros.codigos)} produtos em {time.perf_counter() - inicio:.2f}s")
+        return parametros
+
+    async def _atualizar(self):
+        try:
+            self._parametros = await self._calcular()
+        except Exception as e:
+            print(f"Falha ao recalcular o estoque de segurança: {e}")
+
+    async def obter(self) -> ParametrosReposicao:
+        if self._parametros is None:
+            async with self._lock:
+                if self._parametros is None:
+                    self._parametros = await self._calcular()
+        elif time.time() - self._parametros.calculado_em >= self.intervalo and (self._tarefa is None or self._tarefa.done()):
+            self._tarefa = asyncio.create_task(self._atualizar())
+        return self._parametros
+
+
+cache_reposicao = CacheReposicao()
@@ -1,5 +1,10 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -20,6 +25,12 @@ load_dotenv(dotenv_path=env_path)
 SECRET_KEY = os.getenv("SECRET_KEY", "sua_chave_secreta_super_segura_aqui_mude_para_producao")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# threads dedicadas ao bcrypt (~250 ms por hash) e tamanho máximo da fila antes de recusar com 503
+SENHA_HASH_WORKERS = int(os.getenv("SENHA_HASH_WORKERS", "2"))
+SENHA_HASH_FILA_MAXIMA = int(os.getenv("SENHA_HASH_FILA_MAXIMA", "100"))
+# cache token -> usuário autenticado; o TTL limita o atraso de invalidações feitas em outro worker
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRADAS = int(os.getenv("AUTH_CACHE_MAX_ENTRADAS", "10000"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security_scheme = HTTPBearer()
@@ -33,6 +44,66 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# o bcrypt libera o GIL, então um pool de threads tira o custo do event loop
+_hash_executor = ThreadPoolExecutor(max_workers=SENHA_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_lock = threading.Lock()
+_hash_estatisticas = {
+    "pendentes": 0,       # enviados ao pool e ainda não concluídos
+    "em_execucao": 0,
+    "concluidos": 0,
+    "recusados": 0,       # fila cheia (503)
+    "espera_total_s": 0.0,
+    "execucao_total_s": 0.0,
+}
+
+
+async def _executar_hash(funcao, *args):
+    with _hash_lock:
+        if _hash_estatisticas["pendentes"] - _hash_estatisticas["em_execucao"] >= SENHA_HASH_FILA_MAXIMA:
+            _hash_estatisticas["recusados"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, tente novamente em instantes",
+            )
+        _hash_estatisticas["pendentes"] += 1
+    enviado = time.perf_counter()
+
+    def tarefa():
+        inicio = time.perf_counter()
+        with _hash_lock:
+            _hash_estatisticas["em_execucao"] += 1
+            _hash_estatisticas["espera_total_s"] += inicio - enviado
+        try:
+            return funcao(*args)
+        finally:
+            with _hash_lock:
+                _hash_estatisticas["em_execucao"] -= 1
+                _hash_estatisticas["pendentes"] -= 1
+                _hash_estatisticas["concluidos"] += 1
+                _hash_estatisticas["execucao_total_s"] += time.perf_counter() - inicio
+
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, tarefa)
+
+
+async def verificar_senha(plain_password: str, hashed_password: str) -> bool:
+    """verify_password fora do event loop, para uso nas rotas async."""
+    return await _executar_hash(verify_password, plain_password, hashed_password)
+
+
+async def gerar_hash_senha(password: str) -> str:
+    """get_password_hash fora do event loop, para uso nas rotas async."""
+    return await _executar_hash(get_password_hash, password)
+
+
+def estatisticas_hash() -> dict:
+    with _hash_lock:
+        dados = dict(_hash_estatisticas)
+    dados["fila"] = dados["pendentes"] - dados["em_execucao"]
+    dados["workers"] = SENHA_HASH_WORKERS
+    dados["fila_maxima"] = SENHA_HASH_FILA_MAXIMA
+    return dados
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -57,11 +128,66 @@ def decode_access_token(token: str) -> dict:
         )
 
 
+# token -> (principal, instante de expiração); OrderedDict em ordem de uso para o LRU
+_cache_principais: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+_cache_estatisticas = {"hits": 0, "misses": 0, "expirados": 0, "removidos_lru": 0, "invalidados": 0}
+
+
+def _principal_em_cache(token: str) -> dict | None:
+    entrada = _cache_principais.get(token)
+    if entrada is None:
+        _cache_estatisticas["misses"] += 1
+        return None
+    principal, expira_em = entrada
+    if time.time() >= expira_em:
+        del _cache_principais[token]
+        _cache_estatisticas["expirados"] += 1
+        _cache_estatisticas["misses"] += 1
+        return None
+    _cache_principais.move_to_end(token)
+    _cache_estatisticas["hits"] += 1
+    return principal
+
+
+def _guardar_principal(token: str, principal: dict, exp: float | None):
+    if AUTH_CACHE_TTL_SECONDS <= 0 or AUTH_CACHE_MAX_ENTRADAS <= 0:
+        return
+    expira_em = time.time() + AUTH_CACHE_TTL_SECONDS
+    if exp is not None:
+        expira_em = min(expira_em, float(exp))
+    _cache_principais[token] = (principal, expira_em)
+    _cache_principais.move_to_end(token)
+    while len(_cache_principais) > AUTH_CACHE_MAX_ENTRADAS:
+        _cache_principais.popitem(last=False)
+        _cache_estatisticas["removidos_lru"] += 1
+
+
+def invalidar_principal(email: str):
+    """Remove do cache os tokens de um email; chamar ao criar, alterar ou excluir usuários."""
+    tokens = [token for token, (principal, _) in _cache_principais.items() if principal["email"] == email]
+    for token in tokens:
+        del _cache_principais[token]
+    _cache_estatisticas["invalidados"] += len(tokens)
+
+
+def estatisticas_cache_principais() -> dict:
+    return {
+        **_cache_estatisticas,
+        "entradas": len(_cache_principais),
+        "ttl_segundos": AUTH_CACHE_TTL_SECONDS,
+        "max_entradas": AUTH_CACHE_MAX_ENTRADAS,
+    }
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme),
     db: AsyncSession = Depends(get_db)
 ):
     token = credentials.credentials
+    principal = _principal_em_cache(token)
+    if principal is not None:
+        return principal
+
     payload = decode_access_token(token)
     
     email = payload.get("sub")
@@ -82,7 +208,7 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Usuário não encontrado",
             )
-        return {"user": user, "tipo": "professor", "email": email}
+        principal = {"user": user, "tipo": "professor", "email": email}
     else:
         result = await db.execute(select(DimUsuario).where(DimUsuario.email == email))
         user = result.scalars().first()
@@ -91,7 +217,13 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Usuário não encontrado",
             )
-        return {"user": user, "tipo": "usuario", "email": email}
+        principal = {"user": user, "tipo": "usuario", "email": email}
+
+    # o objeto é compartilhado entre requisições: desvincula da sessão para que
+    # commit/rollback da requisição atual não o expire
+    db.expunge(user)
+    _guardar_principal(token, principal, payload.get("exp"))
+    return principal
 
 
 async def get_current_professor(
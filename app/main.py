@@ -1,7 +1,23 @@
+import time
+
+# início da importação do app, para medir o tempo de subida de cada worker (ver /ready)
+_inicio_importacao = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI
-from app.core.database import engine, Base
+from app.core.database import engine, SessionLocal
+from app.core.aquecimento import aquecer, marcar_importacao
+from app.core.autocompletar import indice_produtos
+from app.core.estoque import inicializar_saldos
+from app.core.migracoes import verificar_esquema
+from app.core.previsao import agendar_previsoes, encerrar_previsoes
+from app.core.jobs import acompanhar_jobs, encerrar_jobs
+from app.core.eventos import distribuidor_eventos
+from app.core.paginacao import CABECALHO_CURSOR
+from app.core.metricas import MetricasMiddleware, instrumentar_engine
+from app.core.perfilamento import PERFILAMENTO, PerfilamentoMiddleware, instrumentar_engine_perfilamento
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import produtos, edicao,  estoque, chart, auth, recebimentos, saidas, saldos
+from app.routers import produtos, edicao,  estoque, chart, auth, recebimentos, saidas, saldos, metricas, saude, previsao, jobs, eventos
 
 
 app = FastAPI()
@@ -11,12 +27,49 @@ app.add_middleware(
     allow_origins=["*"],           # ou ['https://meu‑site.com']
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECALHO_CURSOR],  # cursor de paginação das rotas que devolvem lista
 )
 
+# latência por rota e contagem de SQL por requisição, expostas em /metrics
+app.add_middleware(MetricasMiddleware)
+if engine is not None:
+    instrumentar_engine(engine)
+
+# perfilamento opcional: comandos lentos com EXPLAIN e N+1, em logs/perfilamento.jsonl
+if PERFILAMENTO and engine is not None:
+    app.add_middleware(PerfilamentoMiddleware, engine=engine)
+    instrumentar_engine_perfilamento(engine)
+
+async def preparar_banco():
+    # primeira subida com as tabelas de saldos/movimentos vazias: reconstrói a partir dos fatos
+    async with SessionLocal() as db:
+        if await inicializar_saldos(db):
+            print("Saldos e movimento diário reconstruídos a partir do histórico")
+        # autocomplete de produtos em memória; depois acompanha as escritas dos outros workers
+        await indice_produtos.carregar(db)
+    app.state.autocomplete = asyncio.create_task(indice_produtos.acompanhar(SessionLocal))
+
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # o esquema é das migrações (alembic upgrade head); aqui só confere a revisão
+    await verificar_esquema(engine)
+    # reconstrução e aquecimento em segundo plano: /live já responde e /ready fica 503 até terminar
+    app.state.aquecimento = asyncio.create_task(aquecer(engine, preparar=preparar_banco))
+    # previsão de demanda agendada (PREVISAO_INTERVALO), depois de marcar as execuções interrompidas;
+    # o cálculo vai para um pool de processos
+    app.state.previsao = asyncio.create_task(agendar_previsoes())
+    # limpeza dos resultados expirados dos jobs (POST /jobs/{tipo})
+    app.state.jobs = asyncio.create_task(acompanhar_jobs())
+    # LISTEN no canal de eventos de estoque, repassados aos clientes de /eventos/estoque
+    app.state.eventos = asyncio.create_task(distribuidor_eventos.escutar())
+
+@app.on_event("shutdown")
+async def shutdown():
+    # streams SSE que o --timeout-graceful-shutdown do uvicorn ainda não encerrou
+    distribuidor_eventos.encerrar()
+    app.state.eventos.cancel()
+    await encerrar_previsoes()
+    await encerrar_jobs()
 
 app.include_router(auth.router)
 app.include_router(produtos.router, prefix="/api")
@@ -25,4 +78,11 @@ app.include_router(recebimentos.router)
 app.include_router(saidas.router)
 app.include_router(saldos.router)
 app.include_router(estoque.router)
-app.include_router(chart.router)    
\ No newline at end of file
+app.include_router(chart.router)
+app.include_router(metricas.router)
+app.include_router(saude.router)
+app.include_router(previsao.router)
+app.include_router(jobs.router)
+app.include_router(eventos.router)
+
+marcar_importacao(_inicio_importacao)
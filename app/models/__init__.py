@@ -2,5 +2,8 @@ from .produto import DimProduto
 from .recebimento import FactRecebimento
 from .saida import FactSaida
 from .categoria import FactCategoria, DimCategoria
+from .saldo import SaldoEstoque
+from .movimento import MovimentoDiario
+from .previsao import PrevisaoExecucao, PrevisaoDemanda
 
-__all__ = ["DimProduto", "FactRecebimento", "FactSaida", "FactCategoria", "DimCategoria"]
+__all__ = ["DimProduto", "FactRecebimento", "FactSaida", "FactCategoria", "DimCategoria", "SaldoEstoque", "MovimentoDiario", "PrevisaoExecucao", "PrevisaoDemanda"]
@@ -0,0 +1,21 @@
+from sqlalchemy import Date, BigInteger, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+from datetime import date
+
+class MovimentoDiario(Base):
+    """
+    Totais de recebimento e saída por dia e produto, mantidos na mesma
+    transação de cada movimentação (ver app/core/estoque.py). Alimenta o
+    gráfico de linhas de /telaInicial sem varrer as tabelas de fatos.
+    """
+    __tablename__ = "movimentodiario"
+    __table_args__ = (
+        # a chave primária (dia, ...) atende o gráfico geral; este índice, o filtro por produto
+        Index("ix_movimentodiario_codigo_dia", "codigo", "dia"),
+    )
+
+    dia: Mapped[date] = mapped_column(Date, primary_key=True)
+    codigo: Mapped[int] = mapped_column(BigInteger, ForeignKey("dimproduto.codigo", ondelete="CASCADE"), primary_key=True)
+    quant_recebida: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    quant_saida: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
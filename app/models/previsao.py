@@ -0,0 +1,30 @@
+from sqlalchemy import String, Text, Integer, BigInteger, Float, DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+from datetime import datetime
+
+class PrevisaoExecucao(Base):
+    """Uma execução do job de previsão de demanda (ver app/core/previsao.py)."""
+    __tablename__ = "previsaoexecucao"
+
+    idexecucao: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    iniciada_em: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    concluida_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # executando, concluida ou falhou
+    produtos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processos: Mapped[int] = mapped_column(Integer, nullable=False)
+    duracao_s: Mapped[float | None] = mapped_column(Float, nullable=True)
+    erro: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+class PrevisaoDemanda(Base):
+    """Previsão de demanda diária de um produto numa execução; GET /previsao/{codigo} lê a última concluída."""
+    __tablename__ = "previsaodemanda"
+
+    idexecucao: Mapped[int] = mapped_column(BigInteger, ForeignKey("previsaoexecucao.idexecucao", ondelete="CASCADE"), primary_key=True)
+    codigo: Mapped[int] = mapped_column(BigInteger, ForeignKey("dimproduto.codigo", ondelete="CASCADE"), primary_key=True)
+    metodo: Mapped[str] = mapped_column(String(20), nullable=False)  # ses, croston ou sem_demanda
+    alfa: Mapped[float | None] = mapped_column(Float, nullable=True)
+    previsao_diaria: Mapped[float] = mapped_column(Float, nullable=False)
+    demanda_media: Mapped[float] = mapped_column(Float, nullable=False)
+    erro_medio: Mapped[float | None] = mapped_column(Float, nullable=True)  # raiz do erro quadrático médio um passo à frente
+    dias_com_demanda: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -1,19 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, LargeBinary, BigInteger
+from sqlalchemy import Column, Integer, String, Text, Float, Numeric, Boolean, LargeBinary, BigInteger, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.core.database import Base
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy.orm import relationship, Mapped, deferred
 from app.models.recebimento import FactRecebimento
 from app.models.categoria import FactCategoria
 
 class DimProduto(Base):
     __tablename__ = "dimproduto"
+    __table_args__ = (
+        Index("ix_dimproduto_busca", "busca", postgresql_using="gin"),
+    )
 
-    codigo = Column(BigInteger, primary_key=True, index=True)
+    codigo = Column(BigInteger, primary_key=True, autoincrement=False)
     nome_basico = Column(String(255), nullable=False)
-    nome_modificador = Column(String(255), nullable=False)
-    descricao_tecnica = Column(String)
+    nome_modificador = Column(String(255))
+    descricao_tecnica = Column(Text)
     fabricante = Column(String(255))
     unidade = Column(String(50))
-    preco_de_venda = Column(Float)
+    preco_de_venda = Column(Numeric(10, 2, asdecimal=False))
     fragilidade = Column(Boolean)
     rua = Column(Integer)
     coluna = Column(Integer)
@@ -22,9 +26,20 @@ class DimProduto(Base):
     largura = Column(Float)
     profundidade = Column(Float)
     peso = Column(Float)
-    observacoes_adicional = Column(String)
-    imagem = Column(LargeBinary, nullable=True)
+    observacoes_adicional = Column(Text)
+    # carregada apenas sob demanda (ver GET /api/produtos/{codigo}/imagem)
+    imagem = deferred(Column(LargeBinary, nullable=True))
+    # ETag da imagem, mantido pelo banco (coluna gerada, migração 0009)
+    imagem_md5 = deferred(Column(Text, Computed("md5(imagem)", persisted=True)))
     inserido_por = Column(String(255), nullable=False)
+    # mantida pelo banco (coluna gerada) para GET /api/produtos/buscar; sem_acento() vem da migração 0004
+    busca = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('portuguese', sem_acento(coalesce(nome_basico, ''))), 'A') || "
+        "setweight(to_tsvector('portuguese', sem_acento(coalesce(nome_modificador, ''))), 'B') || "
+        "setweight(to_tsvector('portuguese', sem_acento(coalesce(fabricante, ''))), 'B') || "
+        "setweight(to_tsvector('portuguese', sem_acento(coalesce(descricao_tecnica, ''))), 'C')",
+        persisted=True
+    )))
     recebimentos: Mapped[list["FactRecebimento"]] = relationship(
         "FactRecebimento",
         backref="produto",
@@ -1,12 +1,16 @@
-from sqlalchemy import String, Date, BigInteger, Numeric, Integer, ForeignKey
+from sqlalchemy import String, Date, BigInteger, Numeric, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
 from datetime import date
 
 class FactRecebimento(Base):
     __tablename__ = "factrecebimento"
+    __table_args__ = (
+        # lotes, fornecedores e recálculo de saldos filtram por produto, fornecedor e lote
+        Index("ix_factrecebimento_codigo_fornecedor_lote", "codigo", "fornecedor", "lote"),
+    )
 
-    idrecebimento: Mapped[int] = mapped_column(primary_key=True)
+    idrecebimento: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     data_receb: Mapped[date] = mapped_column(Date, nullable=False)
     quant: Mapped[int] = mapped_column(BigInteger, nullable=False)
     # codigo: Mapped[int] = mapped_column(Integer, nullable=False)
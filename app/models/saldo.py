@@ -0,0 +1,34 @@
+from sqlalchemy import String, Date, BigInteger, ForeignKey, Computed, Index, UniqueConstraint, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+from datetime import date
+
+class SaldoEstoque(Base):
+    """
+    Saldo materializado por lote, mantido na mesma transação de cada
+    recebimento/saída (ver app/core/estoque.py). Pode ser reconstruído a
+    partir das tabelas de fatos com: python recalcular_saldos.py
+    """
+    __tablename__ = "saldoestoque"
+    __table_args__ = (
+        # fornecedor é opcional: NULLS NOT DISTINCT mantém um único saldo por lote sem fornecedor
+        UniqueConstraint("codigo", "lote", "fornecedor", name="uq_saldoestoque_lote", postgresql_nulls_not_distinct=True),
+        # GET /lotes/vencendo: só os lotes com saldo e validade (migração 0006_indice_validade)
+        Index(
+            "ix_saldoestoque_validade_disponivel", "validade",
+            postgresql_where=text("saldo > 0 AND validade IS NOT NULL"),
+            postgresql_include=["codigo", "lote", "fornecedor", "saldo"],
+        ),
+    )
+
+    idsaldo: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    codigo: Mapped[int] = mapped_column(BigInteger, ForeignKey("dimproduto.codigo", ondelete="CASCADE"), nullable=False)
+    lote: Mapped[str] = mapped_column(String(30), nullable=False)
+    fornecedor: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    validade: Mapped[date | None] = mapped_column(Date, nullable=True)  # menor validade recebida no lote
+    quant_recebida: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    quant_saida: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    saldo: Mapped[int] = mapped_column(BigInteger, Computed("quant_recebida - quant_saida"))
+    # usados para o "quant_recente" de /estoque (total recebido na data mais recente)
+    data_ultimo_receb: Mapped[date | None] = mapped_column(Date, nullable=True)
+    quant_ultimo_receb: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -3,12 +3,14 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.aquecimento import registrar_consulta
 from app.core.database import get_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    verificar_senha,
+    gerar_hash_senha,
     create_access_token,
     get_current_professor,
+    invalidar_principal,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.schemas.auth import (
@@ -23,17 +25,27 @@ from app.models.professor import DimProfessor
 router = APIRouter(tags=["Autenticação"])
 
 
+def credenciais_query(modelo, email: str):
+    """Só email e hash da senha, sem carregar a entidade."""
+    return select(modelo.email, modelo.senha).where(modelo.email == email)
+
+
+registrar_consulta("login_professor", lambda: credenciais_query(DimProfessor, ""))
+registrar_consulta("login_usuario", lambda: credenciais_query(DimUsuario, ""))
+
+
 @router.post("/login", response_model=LoginResponse)
 async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     email = request.email
     senha = request.senha
     
-    result_professor = await db.execute(
-        select(DimProfessor).where(DimProfessor.email == email)
-    )
-    professor = result_professor.scalars().first()
+    # lê só email e hash e encerra a transação antes do bcrypt, para não
+    # segurar uma conexão do pool durante a verificação da senha
+    result_professor = await db.execute(credenciais_query(DimProfessor, email))
+    professor = result_professor.first()
+    await db.rollback()
     
-    if professor and verify_password(senha, professor.senha):
+    if professor and await verificar_senha(senha, professor.senha):
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={"sub": professor.email, "tipo_usuario": "professor"},
@@ -46,12 +58,11 @@ async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
             email=professor.email
         )
     
-    result_user = await db.execute(
-        select(DimUsuario).where(DimUsuario.email == email)
-    )
-    usuario = result_user.scalars().first()
+    result_user = await db.execute(credenciais_query(DimUsuario, email))
+    usuario = result_user.first()
+    await db.rollback()
     
-    if usuario and verify_password(senha, usuario.senha):
+    if usuario and await verificar_senha(senha, usuario.senha):
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={"sub": usuario.email, "tipo_usuario": "usuario"},
@@ -86,7 +97,8 @@ async def create_user(
             detail="Email já cadastrado no sistema."
         )
     
-    hashed_password = get_password_hash(data.senha)
+    await db.rollback()  # libera a conexão enquanto o hash é calculado
+    hashed_password = await gerar_hash_senha(data.senha)
     
     new_user = DimUsuario(
         nome=data.nome,
@@ -100,6 +112,7 @@ async def create_user(
     db.add(new_user)
     await db.commit()
     await db.refresh(new_user)
+    invalidar_principal(new_user.email)
     
     return UserResponse(
         idusuario=new_user.idusuario,
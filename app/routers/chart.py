@@ -1,124 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, cast, Date, union_all, String
+from sqlalchemy import select, func, cast, literal, BigInteger, Date, DateTime, Interval
+from app.core.aquecimento import registrar_consulta
+from app.core.cache import CacheVersionado
 from app.core.database import SessionLocal
-from app.models import DimProduto, FactRecebimento, FactSaida
+from app.core.imagens import etag_corresponde
+from app.core.estoque import estoque_por_produto
+from app.models import DimProduto, MovimentoDiario
 from app.schemas.chart import ChartResponse
 from datetime import date, timedelta
+from typing import Literal, Optional
+import os
 
 router = APIRouter()
 
+# limite de pontos do gráfico de linhas, para que um intervalo enorme em granularidade diária não gere milhões de linhas
+GRAFICO_MAXIMO_PERIODOS = int(os.getenv("GRAFICO_MAXIMO_PERIODOS", "3660"))
+# dias cobertos quando desde/ate não são informados, contados a partir da data informada ou da última movimentação
+GRAFICO_JANELA_PADRAO_DIAS = int(os.getenv("GRAFICO_JANELA_PADRAO_DIAS", "365"))
+
+# granularidade da API -> unidade do date_trunc/interval do Postgres
+GRANULARIDADES = {"dia": "day", "semana": "week", "mes": "month"}
+
 async def get_db():
     async with SessionLocal() as session:
         yield session
 
+# os terminais consultam a tela inicial o tempo todo; só refaz as agregações após uma escrita
+cache_tela_inicial = CacheVersionado("telaInicial")
+
+
 # Rota para buscar os dados da tabela na tela inicial
 @router.get('/telaInicial', response_model=ChartResponse)
-async def tabela(db: AsyncSession = Depends(get_db)):
-    # ------------ dados para gráfico de barras -------------------
-    # subquery para agregar os dados de recebimento
-    recebimento_sub = select(
-        FactRecebimento.codigo,
-        func.sum(FactRecebimento.quant).label('quant_recebimento')
-    ).group_by(
-        FactRecebimento.codigo
-    ).subquery()
-
-    # subquery para agregar os dados de saida
-    saida_sub = select(
-        FactSaida.codigo,
-        func.sum(FactSaida.quant).label('quant_saida')
-    ).group_by(
-        FactSaida.codigo
-    ).subquery()
-    query_produtos = (
+async def tabela(
+    request: Request,
+    desde: Optional[date] = Query(None, description="Início do gráfico de linhas (padrão: GRAFICO_JANELA_PADRAO_DIAS dias antes do fim)"),
+    ate: Optional[date] = Query(None, description="Fim do gráfico de linhas (padrão: última movimentação, até GRAFICO_JANELA_PADRAO_DIAS dias após o início)"),
+    granularidade: Literal["dia", "semana", "mes"] = "dia",
+    codigo: Optional[int] = Query(None, description="Restringe os gráficos a um produto"),
+    db: AsyncSession = Depends(get_db)
+):
+    if desde is not None and ate is not None:
+        if desde > ate:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A data inicial deve ser anterior à data final")
+        # antes do cache: intervalos recusados não chegam a criar entrada nem lock
+        validar_intervalo(desde, ate, granularidade)
+
+    async def montar() -> bytes:
+        dados = await montar_tela_inicial(db, desde, ate, granularidade, codigo)
+        return dados.model_dump_json().encode()
+
+    corpo, etag = await cache_tela_inicial.obter(montar, chave=(desde, ate, granularidade, codigo))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+
+def validar_intervalo(desde: date, ate: date, granularidade: str):
+    if quantidade_periodos(inicio_periodo(desde, granularidade), ate, granularidade) > GRAFICO_MAXIMO_PERIODOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Intervalo muito longo: use uma granularidade maior ou no máximo {GRAFICO_MAXIMO_PERIODOS} períodos"
+        )
+
+
+def janela_padrao(
+    desde: date | None, ate: date | None, primeiro: date | None, ultimo: date | None
+) -> tuple[date | None, date | None]:
+    """
+    Completa o intervalo do gráfico com no máximo GRAFICO_JANELA_PADRAO_DIAS
+    dias, limitado pela primeira e pela última movimentação.
+    """
+    janela = timedelta(days=GRAFICO_JANELA_PADRAO_DIAS - 1)
+    if desde is None and ate is None:
+        ate = ultimo
+    if desde is None:
+        if ate is None or primeiro is None:
+            return None, None
+        desde = max(ate - janela, primeiro)
+    if ate is None:
+        if ultimo is None:
+            return None, None
+        ate = min(desde + janela, ultimo)
+    return desde, ate
+
+
+def inicio_periodo(dia: date, granularidade: str) -> date:
+    """Primeiro dia do período que contém a data (semanas começam na segunda, como no date_trunc)."""
+    if granularidade == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def quantidade_periodos(inicio: date, fim: date, granularidade: str) -> int:
+    if granularidade == "semana":
+        return (fim - inicio).days // 7 + 1
+    if granularidade == "mes":
+        return (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    return (fim - inicio).days + 1
+
+
+def get_movimentacoes_query(desde: date, ate: date, granularidade: str, codigo: int | None = None):
+    """
+    Totais de recebimento e saída por período, lidos da tabela de movimento
+    diário. Os períodos sem movimentação vêm do generate_series com zero,
+    então o custo depende do intervalo pedido e não do tamanho do histórico.
+    """
+    unidade = GRANULARIDADES[granularidade]
+
+    filtros = [MovimentoDiario.dia.between(desde, ate)]
+    if codigo is not None:
+        filtros.append(MovimentoDiario.codigo == codigo)
+
+    # primeiro por dia, direto na coluna: o date_trunc de cada linha do movimento
+    # custava quase metade do tempo do gráfico geral de um ano
+    diario = (
         select(
-            DimProduto.nome_basico.label('produto'),
-            (func.coalesce(recebimento_sub.c.quant_recebimento, 0) - func.coalesce(saida_sub.c.quant_saida, 0)).label('quantidade')
+            MovimentoDiario.dia,
+            func.sum(MovimentoDiario.quant_recebida).label('recebido'),
+            func.sum(MovimentoDiario.quant_saida).label('saida')
         )
-        .outerjoin(recebimento_sub, DimProduto.codigo == recebimento_sub.c.codigo)
-        .outerjoin(saida_sub, DimProduto.codigo == saida_sub.c.codigo)
-        .order_by(DimProduto.nome_basico)
+        .where(*filtros)
+        .group_by(MovimentoDiario.dia)
+        .subquery('diario')
     )
+    if granularidade == "dia":
+        periodo = diario.c.dia
+    else:
+        periodo = cast(func.date_trunc(unidade, cast(diario.c.dia, DateTime)), Date)
 
-    # ----------- Movimentações --------------------
-    subquery_recebimentos = select(
-        cast(FactRecebimento.data_receb, Date).label('data_movimentacao'),
-        FactRecebimento.quant.label('quantidade'),
-        func.cast('Recebimento', String).label('tipo_movimentacao')
+    agregado = (
+        select(
+            periodo.label('periodo'),
+            # sum(bigint) devolve numeric no Postgres
+            cast(func.sum(diario.c.recebido), BigInteger).label('recebido'),
+            cast(func.sum(diario.c.saida), BigInteger).label('saida')
+        )
+        .group_by(periodo)
+        .subquery('agregado')
     )
 
-    subquery_saidas = select(
-        cast(FactSaida.data_saida, Date).label('data_movimentacao'),
-        FactSaida.quant.label('quantidade'),
-        func.cast('Saida', String).label('tipo_movimentacao')
+    serie = select(
+        cast(
+            func.generate_series(
+                cast(literal(inicio_periodo(desde, granularidade)), DateTime),
+                cast(literal(ate), DateTime),
+                cast(literal(f"1 {unidade}"), Interval)
+            ),
+            Date
+        ).label('periodo')
+    ).subquery('serie')
+
+    return (
+        select(
+            serie.c.periodo,
+            func.coalesce(agregado.c.recebido, 0).label('recebido'),
+            func.coalesce(agregado.c.saida, 0).label('saida')
+        )
+        .select_from(serie)
+        .outerjoin(agregado, agregado.c.periodo == serie.c.periodo)
+        .order_by(serie.c.periodo)
     )
 
-    # Combinação das duas tabelas anteriores para conseguir todas as datas com as informações necessárias
-    union_query = union_all(
-        subquery_recebimentos,
-        subquery_saidas
-    ).subquery('movimentacoes_diarias')
 
-    movimentacoes_query = (
+def get_produtos_query(codigo: int | None = None):
+    """Saldo por produto para o gráfico de barras, lido da tabela materializada de saldos."""
+    estoque = estoque_por_produto()
+    query = (
         select(
-            union_query.c.data_movimentacao,
-            union_query.c.tipo_movimentacao,
-            func.sum(union_query.c.quantidade).label('quantidade_total')
-        )
-        .group_by(
-            union_query.c.data_movimentacao,
-            union_query.c.tipo_movimentacao
-        )
-        .order_by(
-            union_query.c.data_movimentacao,
-            union_query.c.tipo_movimentacao
+            DimProduto.nome_basico.label('produto'),
+            func.coalesce(estoque.c.quantidade, 0).label('quantidade')
         )
+        .outerjoin(estoque, DimProduto.codigo == estoque.c.codigo)
+        .order_by(DimProduto.nome_basico)
     )
+    if codigo is not None:
+        query = query.where(DimProduto.codigo == codigo)
+    return query
+
+
+registrar_consulta("tela_inicial_produto", lambda: get_produtos_query(-1))
+registrar_consulta("tela_inicial_movimentos", lambda: get_movimentacoes_query(date.today(), date.today(), "dia"))
+registrar_consulta("tela_inicial_movimentos_produto", lambda: get_movimentacoes_query(date.today(), date.today(), "dia", -1))
 
+
+async def montar_tela_inicial(
+    db: AsyncSession,
+    desde: date | None = None,
+    ate: date | None = None,
+    granularidade: str = "dia",
+    codigo: int | None = None
+) -> ChartResponse:
+    # ------------ dados para gráfico de barras -------------------
     try:
-        result = await db.execute(query_produtos)
+        result = await db.execute(get_produtos_query(codigo))
         produtos_result = result.mappings().all()
 
-        result = await db.execute(movimentacoes_query)
-        movimentacoes_result = result.mappings().all()
+        # ----------- Movimentações --------------------
+        # sem datas informadas o gráfico cobre uma janela de GRAFICO_JANELA_PADRAO_DIAS
+        # (min/max pelo índice da tabela de movimento): todo o histórico em granularidade
+        # diária passaria de GRAFICO_MAXIMO_PERIODOS
+        if desde is None or ate is None:
+            limites = select(func.min(MovimentoDiario.dia), func.max(MovimentoDiario.dia))
+            if codigo is not None:
+                limites = limites.where(MovimentoDiario.codigo == codigo)
+            primeiro, ultimo = (await db.execute(limites)).one()
+            desde, ate = janela_padrao(desde, ate, primeiro, ultimo)
+
+        movimentacoes_result = []
+        if desde is not None and ate is not None and desde <= ate:
+            # repetida aqui para o intervalo completado pela janela padrão
+            validar_intervalo(desde, ate, granularidade)
+            result = await db.execute(get_movimentacoes_query(desde, ate, granularidade, codigo))
+            movimentacoes_result = result.mappings().all()
+    except HTTPException:
+        raise
     except Exception as e:
         print('ERRO:', e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao buscar dados")
 
     # --------------- gráfico de barras -------------------
-    produtos = [dict(item)['produto'] for item in produtos_result]
-    quantidade = [dict(item)['quantidade'] for item in produtos_result]
+    produtos = [item['produto'] for item in produtos_result]
+    quantidade = [item['quantidade'] for item in produtos_result]
 
     # --------------- gráfico de linhas -------------------
-
-    # Organiza as datas da mais antiga a mais nova
-    datas_unicas = sorted(list(set(row.data_movimentacao for row in movimentacoes_result)))
-    data_minima = datas_unicas[0]
-    data_maxima = datas_unicas[-1]
-    dias = {}
-
-    delta = data_maxima - data_minima    
-    # cria cada chave no dicionário dias
-    for i in range(delta.days + 1):
-        dia = data_minima + timedelta(days=i)
-        dias[dia] = [0, 0]
-    
-    # Adiciona os dados às datas
-    for row in movimentacoes_result:
-        item = dict(row)
-        if not dias.get(item['data_movimentacao']):
-            dias[item['data_movimentacao']] = [0, 0] # cria a chave caso não exista
-        dias[item['data_movimentacao']][0 if item['tipo_movimentacao'] == 'Recebimento' else 1] = item['quantidade_total']
-    
-    # salva os recebimentos e saídas
-    recebimentos = []
-    saidas = []
-    for day in dias.keys():
-        recebimentos.append(dias[day][0])
-        saidas.append(dias[day][1])
-    # Formata os dias
-    days = [dia for dia in dias.keys()]
+    # um ponto por período, já com os dias sem movimentação preenchidos pelo banco
+    days = [item['periodo'] for item in movimentacoes_result]
+    recebimentos = [item['recebido'] for item in movimentacoes_result]
+    saidas = [item['saida'] for item in movimentacoes_result]
 
     return ChartResponse(
         categories=produtos,
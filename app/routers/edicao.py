@@ -1,12 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import insert, select, delete, and_
 from app.models.produto import DimProduto
 from app.models.recebimento import FactRecebimento
 from app.models.categoria import FactCategoria, DimCategoria
+from app.core.autocompletar import indice_produtos
+from app.core.cache import marcar_dados_alterados
 from app.core.database import get_db
+from app.core.paginacao import Pagina, paginar, CABECALHO_CURSOR
+from app.core.estoque import recalcular_saldos
+from app.core.imagens import imagem_url
 from datetime import date
-import base64
 
 from app.schemas.produto import ProdutoResponse, ProdutoDelete, LoteResponse
 from typing import List, Union, Optional
@@ -14,32 +18,41 @@ from typing import List, Union, Optional
 router = APIRouter()
 
 @router.get("/ver_edicao", response_model=List[ProdutoResponse])
-async def ver_produtos_tela_edicao(db: AsyncSession = Depends(get_db)):
+async def ver_produtos_tela_edicao(response: Response, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
 
-    query = select(DimProduto)
+    # imagem é deferred: só se consulta se existe, os bytes ficam no endpoint de imagem
+    query = select(DimProduto, DimProduto.imagem.isnot(None).label("tem_imagem"))
+    query = paginar(query, [DimProduto.codigo], pagina)
     result = await db.execute(query)
-    produtos = result.scalars().all()
+    produtos = result.all()
+
+    proximo = pagina.proximo(len(produtos), (produtos[-1][0].codigo,) if produtos else None)
+    if proximo:
+        response.headers[CABECALHO_CURSOR] = proximo
     
-    response = []
-    for produto in produtos:
+    produtos_resposta = []
+    for produto, tem_imagem in produtos:
         produto_dict = produto.__dict__.copy()
-        if produto_dict.get("imagem"):
-            produto_dict["imagem"] = base64.b64encode(produto_dict["imagem"]).decode("utf-8")
-        response.append(ProdutoResponse(**produto_dict))
+        produto_dict["imagem_url"] = imagem_url(produto.codigo, tem_imagem)
+        produtos_resposta.append(ProdutoResponse(**produto_dict))
     
-    return response
+    return produtos_resposta
 
 # ----------------------------------------------------------------------------------------------------------
 
 @router.get("/ver_edicao/{codigo}")
 async def ver_produto(codigo: int, db: AsyncSession = Depends(get_db)):
     # busca produto
-    query_produto = select(DimProduto).where(DimProduto.codigo == codigo)
+    query_produto = (
+        select(DimProduto, DimProduto.imagem.isnot(None).label("tem_imagem"))
+        .where(DimProduto.codigo == codigo)
+    )
     result = await db.execute(query_produto)
-    produto = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if not produto:
+    if not row:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
+    produto, tem_imagem = row
 
     # busca todas as categorias disponíveis
     query_categorias = select(DimCategoria)
@@ -56,8 +69,7 @@ async def ver_produto(codigo: int, db: AsyncSession = Depends(get_db)):
 
     # prepara retorno
     produto_dict = produto.__dict__.copy()
-    if produto_dict.get("imagem"):
-        produto_dict["imagem"] = base64.b64encode(produto_dict["imagem"]).decode("utf-8")
+    produto_dict["imagem_url"] = imagem_url(produto.codigo, tem_imagem)
 
     return {
         "produto": produto_dict,
@@ -122,7 +134,12 @@ async def editar_lote(
     lote.fornecedor = fornecedor
     lote.validade = validade_date   # <- agora é sempre None ou date válido
 
+    # fornecedor e validade fazem parte do saldo do lote: recalcula só este lote
+    await db.flush()
+    await recalcular_saldos(db, codigo, lote.lote)
+
     await db.commit()
+    marcar_dados_alterados()
     await db.refresh(lote)
     return {"success": True, "message": "Lote atualizado com sucesso"}
 
@@ -138,6 +155,8 @@ async def deletar_produto(codigo: int, db: AsyncSession = Depends(get_db)):
         
     await db.delete(produto_deletado)
     await db.commit()
+    marcar_dados_alterados()
+    indice_produtos.remover(codigo)
 
     return ProdutoDelete(
         codigo=produto_deletado.codigo,
@@ -229,6 +248,8 @@ async def editar_produto(
         await db.execute(stmt_categoria)
 
     await db.commit()
+    marcar_dados_alterados()
+    indice_produtos.adicionar(codigo, nome_basico)
     await db.refresh(produto)
 
     return {"success": True, "message": "Produto atualizado com sucesso!"}
\ No newline at end of file
@@ -1,45 +1,88 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case, literal
 from app.core.database import get_db
-from app.models.estoque import EstoqueReal
+from app.core.aquecimento import registrar_consulta
+from app.core.paginacao import Pagina, paginar, codificar_cursor, CABECALHO_CURSOR
+from app.core.estoque import estoque_por_produto
+from app.core.jobs import registrar_tipo
+from app.core.reposicao import ESTOQUE_SEGURANCA_NIVEL_SERVICO, cache_reposicao, calcular_parametros
 from app.schemas.estoque import EstoqueResponse, CatalogoResponse
-from app.models.saida import FactSaida
 from app.schemas.saidas import EstoqueSeguranca
 from app.models.produto import DimProduto
+from app.models.saldo import SaldoEstoque
 from app.models.categoria import *
 from typing import List
 from sqlalchemy import func
-import base64
+from app.core.imagens import imagem_url
 
 router = APIRouter()
 
+def get_estoque_query():
+    estoque = estoque_por_produto()
+    return (
+        select(
+            DimProduto.codigo,
+            DimProduto.nome_basico,
+            func.coalesce(estoque.c.quantidade, 0).label("quantidade"),
+            func.coalesce(estoque.c.quant_recente, 0).label("quant_recente")
+        )
+        .outerjoin(estoque, estoque.c.codigo == DimProduto.codigo)
+    )
+
 @router.get("/estoque", response_model=List[EstoqueResponse])
-async def listar_estoque(db: AsyncSession = Depends(get_db)):
-    query = select(EstoqueReal)
+async def listar_estoque(response: Response, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    query = paginar(get_estoque_query(), [DimProduto.codigo], pagina)
     result = await db.execute(query)
-    rows = result.scalars().all()
+    rows = result.mappings().all()
+
+    proximo = pagina.proximo(len(rows), (rows[-1]["codigo"],) if rows else None)
+    if proximo:
+        response.headers[CABECALHO_CURSOR] = proximo
     return rows
 
 @router.get("/estoqueseguranca", response_model=List[EstoqueSeguranca])
-async def calcularestoque(db: AsyncSession = Depends(get_db)):
-    query = (
-        select(
-            FactSaida.codigo,
-            ((func.max(FactSaida.quant) + func.min(FactSaida.quant)) / 2).label("estoque_seguranca")
-        )
-        .group_by(FactSaida.codigo)
-    )
-    result = await db.execute(query)
-    rows = result.all()  # retorna lista de tuplas (codigo, estoque_seguranca)
+async def calcularestoque(
+    nivel_servico: float = Query(ESTOQUE_SEGURANCA_NIVEL_SERVICO, ge=0.5, le=0.9999, description="Probabilidade de não faltar no lead time"),
+):
+    # servido do cálculo em memória (app/core/reposicao.py), refeito periodicamente em segundo plano
+    parametros = await cache_reposicao.obter()
+    return Response(content=parametros.corpo(nivel_servico), media_type="application/json")
 
-    # transformar em lista de dicts
-    return [{"codigo": r[0], "estoque_seguranca": r[1]} for r in rows]
+@router.get("/estoqueseguranca/{codigo}", response_model=EstoqueSeguranca)
+async def calcularestoque_produto(
+    codigo: int,
+    nivel_servico: float = Query(ESTOQUE_SEGURANCA_NIVEL_SERVICO, ge=0.5, le=0.9999, description="Probabilidade de não faltar no lead time"),
+):
+    parametros = await cache_reposicao.obter()
+    linha = parametros.produto(codigo, nivel_servico)
+    if linha is None:
+        raise HTTPException(status_code=404, detail="Produto sem movimentação no período do cálculo")
+    return linha
 
-@router.get("/ver-catalogo", response_model=List[CatalogoResponse])
-async def ver_catalogo(db: AsyncSession = Depends(get_db)):
+# recálculo completo, fora do cache, em segundo plano: POST /jobs/estoqueseguranca (ver app/core/jobs.py)
+async def exportar_estoque_seguranca(db: AsyncSession, parametros: dict):
+    calculo = await calcular_parametros(db)
+    # montar as linhas de todos os produtos leva centenas de ms: fora do event loop
+    yield await asyncio.to_thread(calculo.linhas, parametros.get("nivel_servico", ESTOQUE_SEGURANCA_NIVEL_SERVICO))
+
+registrar_tipo("estoqueseguranca", exportar_estoque_seguranca, parametros=("nivel_servico",))
 
-    query = (
+def get_catalogo_query():
+    """
+    Catálogo completo: produto, saldo total e categorias agregadas em texto.
+    O saldo é uma subconsulta correlacionada (índice de SaldoEstoque por
+    produto) em vez do JOIN com estoque_por_produto(), que agregava o saldo
+    de todos os produtos mesmo para uma página de 100.
+    """
+    quantidade = (
+        select(func.coalesce(func.sum(SaldoEstoque.saldo), 0))
+        .where(SaldoEstoque.codigo == DimProduto.codigo)
+        .scalar_subquery()
+    )
+
+    return (
         select(
             DimProduto.codigo,
             DimProduto.nome_basico,
@@ -47,7 +90,7 @@ async def ver_catalogo(db: AsyncSession = Depends(get_db)):
             DimProduto.descricao_tecnica,
             DimProduto.fabricante,
             DimProduto.observacoes_adicional,
-            DimProduto.imagem,
+            DimProduto.imagem.isnot(None).label("tem_imagem"),
             DimProduto.unidade,
             DimProduto.preco_de_venda,
             case(
@@ -62,10 +105,9 @@ async def ver_catalogo(db: AsyncSession = Depends(get_db)):
             DimProduto.largura,
             DimProduto.profundidade,
             DimProduto.peso,
-            EstoqueReal.quantidade,
+            quantidade.label("quantidade"),
             func.string_agg(DimCategoria.categoria, ', ').label("categorias")
         )
-        .outerjoin(EstoqueReal, EstoqueReal.codigo == DimProduto.codigo)
         .outerjoin(FactCategoria, FactCategoria.codigo == DimProduto.codigo)
         .outerjoin(DimCategoria, DimCategoria.idcategoria == FactCategoria.idcategoria)
         .group_by(
@@ -75,7 +117,6 @@ async def ver_catalogo(db: AsyncSession = Depends(get_db)):
             DimProduto.descricao_tecnica,
             DimProduto.fabricante,
             DimProduto.observacoes_adicional,
-            DimProduto.imagem,
             DimProduto.unidade,
             DimProduto.preco_de_venda,
             DimProduto.fragilidade,
@@ -86,26 +127,39 @@ async def ver_catalogo(db: AsyncSession = Depends(get_db)):
             DimProduto.altura,
             DimProduto.largura,
             DimProduto.profundidade,
-            DimProduto.peso,
-            EstoqueReal.quantidade
+            DimProduto.peso
         )
     )
 
+@router.get("/ver-catalogo", response_model=List[CatalogoResponse])
+async def ver_catalogo(response: Response, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    query = paginar(get_catalogo_query(), [DimProduto.codigo], pagina)
+
     result = await db.execute(query)
     rows = result.mappings().all()
 
-    response = []
+    proximo = pagina.proximo(len(rows), (rows[-1]["codigo"],) if rows else None)
+    if proximo:
+        response.headers[CABECALHO_CURSOR] = proximo
+
+    produtos_resposta = []
     for row in rows:
         produto_dict = dict(row)
 
-        # converte imagem se existir
-        if produto_dict.get("imagem") and isinstance(produto_dict["imagem"], (bytes, bytearray)):
-            produto_dict["imagem"] = base64.b64encode(produto_dict["imagem"]).decode("utf-8")
+        # a imagem é servida por /api/produtos/{codigo}/imagem
+        produto_dict["imagem_url"] = imagem_url(produto_dict["codigo"], produto_dict.pop("tem_imagem"))
 
         # garante que categorias nunca seja None
         if not produto_dict.get("categorias"):
             produto_dict["categorias"] = "Nenhuma categoria registrada"
 
-        response.append(produto_dict)
+        produtos_resposta.append(produto_dict)
+
+    return produtos_resposta
+
 
-    return response
\ No newline at end of file
+# primeira página e páginas seguintes geram SQL diferente; o cursor de aquecimento fica depois de qualquer código
+_CURSOR_AQUECIMENTO = codificar_cursor((2 ** 62,))
+registrar_consulta("estoque", lambda: paginar(get_estoque_query(), [DimProduto.codigo], Pagina(limit=1, after=_CURSOR_AQUECIMENTO)))
+registrar_consulta("catalogo", lambda: paginar(get_catalogo_query(), [DimProduto.codigo], Pagina(limit=1, after=_CURSOR_AQUECIMENTO)))
+registrar_consulta("catalogo_inicio", lambda: paginar(get_catalogo_query(), [DimProduto.codigo], Pagina(limit=1, after=None)))
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from app.core.eventos import HEARTBEAT, RETRY, RespostaEventos, distribuidor_eventos
+
+router = APIRouter(tags=["Eventos"])
+
+
+@router.get("/eventos/estoque")
+async def eventos_estoque(
+    codigo: list[int] | None = Query(None, description="Só os eventos destes produtos (pode repetir)"),
+    last_event_id: str | None = Header(None),
+):
+    """
+    Stream text/event-stream com os eventos de estoque depois do commit:
+    "saldo" {codigo, lote, fornecedor, delta, saldo}, "produto" {codigo}
+    ({codigo, removido} na exclusão) e "ressincronizar", quando eventos
+    podem ter sido perdidos e o cliente deve reler /estoque. Na reconexão
+    (Last-Event-ID) os eventos perdidos são reenviados quando possível.
+    """
+    assinante = distribuidor_eventos.assinar(set(codigo) if codigo else None)
+    if assinante is None:
+        detalhe = "Servidor em encerramento" if distribuidor_eventos.encerrando else "Limite de conexões de eventos atingido"
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detalhe)
+    if last_event_id is None:
+        # o id do início é o do último evento antes da assinatura: nada fica entre os dois
+        inicio = distribuidor_eventos.inicio()
+    else:
+        # na reconexão o id vem nos eventos reenviados (ou no "ressincronizar"); o
+        # início não pode adiantá-lo, senão uma queda logo depois pularia o reenvio
+        inicio = RETRY
+        distribuidor_eventos.retomar(assinante, last_event_id)
+
+    async def fluxo():
+        try:
+            # também envia os cabeçalhos de imediato
+            yield inicio
+            # o pulso do distribuidor acorda o laço a cada EVENTOS_HEARTBEAT mesmo sem eventos
+            while not assinante.desconectado:
+                quadros = await assinante.proximos()
+                # vários eventos acumulados vão numa única escrita
+                yield b"".join(quadros) if quadros else HEARTBEAT
+        finally:
+            distribuidor_eventos.cancelar(assinante)
+
+    return RespostaEventos(
+        assinante,
+        fluxo(),
+        media_type="text/event-stream",
+        # sem buffer em proxies (nginx) e sem cache
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
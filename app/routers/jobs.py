@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Body, HTTPException, status
+from fastapi.responses import FileResponse
+from app.core import jobs
+from app.schemas.jobs import JobRequest, JobResponse, TipoJobResponse
+
+router = APIRouter(tags=["Jobs"])
+
+
+def montar_resposta(estado: dict) -> JobResponse:
+    resultado_url = f"/jobs/{estado['id']}/resultado" if estado["status"] == jobs.CONCLUIDO else None
+    return JobResponse(**estado, resultado_url=resultado_url)
+
+
+def buscar_estado(id: str) -> dict:
+    estado = jobs.consultar(id)
+    if estado is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado ou já expirado")
+    return estado
+
+
+@router.get("/jobs/tipos", response_model=list[TipoJobResponse])
+async def listar_tipos():
+    return [
+        TipoJobResponse(tipo=nome, parametros=list(tipo.parametros), concorrencia=tipo.concorrencia)
+        for nome, tipo in jobs.tipos().items()
+    ]
+
+
+@router.get("/jobs", response_model=list[JobResponse])
+async def listar_jobs():
+    # só os jobs recebidos por este worker
+    return [montar_resposta(estado) for estado in jobs.listar()]
+
+
+@router.post("/jobs/{tipo}", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submeter_job(tipo: str, pedido: JobRequest = Body(default_factory=JobRequest)):
+    tipo_job = jobs.tipos().get(tipo)
+    if tipo_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tipo de job desconhecido: {tipo}")
+
+    parametros = pedido.model_dump(exclude_none=True)
+    invalidos = set(parametros) - set(tipo_job.parametros)
+    if invalidos:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Parâmetros não aceitos pelo job {tipo}: {', '.join(sorted(invalidos))}"
+        )
+
+    job = jobs.submeter(tipo, parametros)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Fila de jobs cheia, tente novamente mais tarde")
+    return montar_resposta(job.para_dict())
+
+
+@router.get("/jobs/{id}", response_model=JobResponse)
+async def ver_job(id: str):
+    return montar_resposta(buscar_estado(id))
+
+
+@router.get("/jobs/{id}/resultado")
+async def baixar_resultado(id: str):
+    estado = buscar_estado(id)
+    if estado["status"] != jobs.CONCLUIDO:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job ainda sem resultado (status {estado['status']})")
+    arquivo = jobs.arquivo_resultado(id)
+    if not arquivo.exists():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Resultado expirado")
+    return FileResponse(arquivo, media_type="text/csv", filename=f"{estado['tipo']}-{id}.csv")
+
+
+@router.delete("/jobs/{id}", response_model=JobResponse)
+async def cancelar_job(id: str):
+    # em andamento: cancela (o arquivo parcial é apagado); já terminado: apaga o resultado
+    estado = jobs.cancelar(id)
+    if estado is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado ou já expirado")
+    return montar_resposta(estado)
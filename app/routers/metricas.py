@@ -0,0 +1,62 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.aquecimento import estado
+from app.core.cache import estatisticas_caches
+from app.core.database import estatisticas_pool
+from app.core.eventos import distribuidor_eventos
+from app.core.metricas import texto_prometheus
+from app.core.security import estatisticas_cache_principais, estatisticas_hash
+
+router = APIRouter(prefix="/metrics", tags=["Métricas"])
+
+
+@router.get("", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """Latência por rota, status, requisições em andamento e SQL por requisição (formato Prometheus)."""
+    pool = estatisticas_pool()
+    extras = {
+        "db_pool_checked_out": pool.get("em_uso", 0),
+        "db_pool_idle": pool.get("ociosas", 0),
+        "db_pool_overflow": pool.get("overflow", 0),
+        "db_pool_wait_seconds_total": pool["espera_total_s"],
+        "db_pool_timeouts_total": pool["timeouts"],
+    }
+    # clientes de /eventos/estoque e filas descartadas por clientes lentos
+    eventos = distribuidor_eventos.estatisticas()
+    extras["sse_clients"] = eventos["clientes"]
+    extras["sse_listen_connected"] = int(eventos["conectado"])
+    extras["sse_events_received_total"] = eventos["recebidos"]
+    extras["sse_queue_drops_total"] = eventos["descartes"]
+    # tempos de subida do worker, para acompanhar regressões de importação e aquecimento
+    inicializacao = estado()
+    extras["app_ready"] = int(inicializacao["pronto"])
+    for nome, chave in (
+        ("app_startup_import_seconds", "importacao_s"),
+        ("app_startup_init_seconds", "inicializacao_s"),
+        ("app_startup_warmup_seconds", "aquecimento_s"),
+    ):
+        if inicializacao[chave] is not None:
+            extras[nome] = inicializacao[chave]
+    return PlainTextResponse(texto_prometheus(extras), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/auth")
+async def metricas_auth():
+    """Pool de threads do bcrypt e cache de usuários autenticados."""
+    return {
+        "bcrypt": estatisticas_hash(),
+        "cache_principais": estatisticas_cache_principais(),
+    }
+
+
+@router.get("/db")
+async def metricas_db():
+    """Ocupação do pool de conexões deste worker e tempo de espera por checkout."""
+    return estatisticas_pool()
+
+
+@router.get("/cache")
+async def metricas_cache():
+    """Hits e misses dos caches de resposta versionados deste worker."""
+    return estatisticas_caches()
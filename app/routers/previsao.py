@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.core.aquecimento import registrar_consulta
+from app.core.database import get_db
+from app.core.previsao import iniciar_previsao
+from app.models import PrevisaoDemanda, PrevisaoExecucao
+from app.schemas.previsao import PrevisaoResponse, ExecucaoPrevisaoResponse
+
+router = APIRouter(tags=["Previsão"])
+
+
+def get_previsao_query(codigo: int):
+    """Previsão do produto na última execução concluída (chave primária (idexecucao, codigo))."""
+    ultima = (
+        select(func.max(PrevisaoExecucao.idexecucao))
+        .where(PrevisaoExecucao.status == "concluida")
+        .scalar_subquery()
+    )
+    return (
+        select(PrevisaoDemanda, PrevisaoExecucao.concluida_em)
+        .join(PrevisaoExecucao, PrevisaoExecucao.idexecucao == PrevisaoDemanda.idexecucao)
+        .where(PrevisaoDemanda.idexecucao == ultima, PrevisaoDemanda.codigo == codigo)
+    )
+
+registrar_consulta("previsao", lambda: get_previsao_query(-1))
+
+
+@router.post("/previsao/executar", response_model=ExecucaoPrevisaoResponse, status_code=status.HTTP_202_ACCEPTED)
+async def executar_previsao(db: AsyncSession = Depends(get_db)):
+    # o cálculo roda em segundo plano no pool de processos; acompanhe por /previsao/execucoes/{id}
+    idexecucao = await iniciar_previsao()
+    if idexecucao is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Já existe uma previsão em execução")
+    return await db.get(PrevisaoExecucao, idexecucao)
+
+
+@router.get("/previsao/execucoes", response_model=list[ExecucaoPrevisaoResponse])
+async def listar_execucoes(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(PrevisaoExecucao).order_by(PrevisaoExecucao.idexecucao.desc()).limit(20))
+    return result.scalars().all()
+
+
+@router.get("/previsao/execucoes/{idexecucao}", response_model=ExecucaoPrevisaoResponse)
+async def ver_execucao(idexecucao: int, db: AsyncSession = Depends(get_db)):
+    execucao = await db.get(PrevisaoExecucao, idexecucao)
+    if execucao is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Execução não encontrada")
+    return execucao
+
+
+@router.get("/previsao/{codigo}", response_model=PrevisaoResponse)
+async def ver_previsao(
+    codigo: int,
+    dias: int = Query(30, ge=1, le=365, description="Horizonte da previsão"),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(get_previsao_query(codigo))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sem previsão para o produto (nenhuma execução concluída ou produto sem saídas)")
+
+    previsao, calculada_em = row
+    return PrevisaoResponse(
+        codigo=codigo,
+        idexecucao=previsao.idexecucao,
+        calculada_em=calculada_em,
+        metodo=previsao.metodo,
+        alfa=previsao.alfa,
+        previsao_diaria=round(previsao.previsao_diaria, 4),
+        dias=dias,
+        previsao_periodo=round(previsao.previsao_diaria * dias, 2),
+        demanda_media=round(previsao.demanda_media, 4),
+        erro_medio=round(previsao.erro_medio, 4) if previsao.erro_medio is not None else None,
+        dias_com_demanda=previsao.dias_com_demanda
+    )
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert, select
+from sqlalchemy import Float, insert, select, func, case, literal, or_
 from app.models.produto import DimProduto
+from app.core.aquecimento import registrar_consulta
+from app.core.autocompletar import indice_produtos
+from app.core.busca import BUSCA_SIMILARIDADE_MINIMA, consulta_texto, sem_acento, trigramas_disponiveis
+from app.core.cache import marcar_dados_alterados
 from app.core.database import get_db
+from app.core.imagens import IMAGEM_CACHE_MAX_AGE, imagem_url, tipo_imagem, etag_corresponde
+from app.core.paginacao import LIMITE_PADRAO, Pagina, paginar
 from app.models.categoria import FactCategoria, DimCategoria
+from app.schemas.produto import BuscaProdutosResponse, ProdutoAutocomplete
 
 from typing import List, Union
 
@@ -76,6 +83,8 @@ async def cadastrar_produto(
             await db.execute(stmt_categoria)
 
         await db.commit()
+        marcar_dados_alterados()
+        indice_produtos.adicionar(codigo, nome_basico)
         return {"success": True, "message": "Produto cadastrado"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -92,4 +101,134 @@ async def ver_produto(db: AsyncSession = Depends(get_db)):
             {"idcategoria": c.idcategoria, "categoria": c.categoria}
             for c in todas_categorias
         ]
-    }
\ No newline at end of file
+    }
+
+def _colunas_busca():
+    return (
+        DimProduto.codigo,
+        DimProduto.nome_basico,
+        DimProduto.nome_modificador,
+        DimProduto.fabricante,
+        DimProduto.descricao_tecnica,
+        DimProduto.unidade,
+        DimProduto.preco_de_venda,
+        DimProduto.imagem.isnot(None).label("tem_imagem"),
+    )
+
+
+def get_busca_query(texto: str, pagina: Pagina):
+    """
+    Busca textual pelo índice GIN de DimProduto.busca, ordenada por
+    relevância (ts_rank_cd) e código. Um número digitado também encontra o
+    produto com aquele código, à frente dos demais. A página é por keyset
+    em (-relevância, código).
+    """
+    consulta = consulta_texto(texto)
+    # tipo explícito: o cursor da página é validado contra ele (paginar)
+    relevancia = func.ts_rank_cd(DimProduto.busca, consulta, type_=Float)
+    filtro = DimProduto.busca.op("@@")(consulta)
+    if texto.strip().isdigit():
+        codigo = int(texto.strip())
+        relevancia = relevancia + case((DimProduto.codigo == codigo, 1), else_=0)
+        filtro = or_(filtro, DimProduto.codigo == codigo)
+
+    query = select(*_colunas_busca(), relevancia.label("relevancia")).where(filtro)
+    return paginar(query, [-relevancia, DimProduto.codigo], pagina)
+
+
+def get_busca_aproximada_query(texto: str, limite: int):
+    """Nomes parecidos por trigramas (pg_trgm), para erros de digitação; usa o índice ix_dimproduto_nome_trgm."""
+    nome = func.lower(func.sem_acento(DimProduto.nome_basico))
+    alvo = literal(sem_acento(texto).lower())
+    similaridade = func.similarity(nome, alvo)
+    return (
+        select(*_colunas_busca(), similaridade.label("relevancia"))
+        .where(nome.op("%")(alvo), similaridade >= BUSCA_SIMILARIDADE_MINIMA)
+        .order_by(similaridade.desc(), DimProduto.codigo)
+        .limit(limite)
+    )
+
+
+@router.get("/produtos/buscar", response_model=BuscaProdutosResponse)
+async def buscar_produtos(
+    q: str = Query(..., min_length=1, max_length=200, description="Nome, modificador, fabricante, descrição ou código"),
+    pagina: Pagina = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    if consulta_texto(q) is None:
+        raise HTTPException(status_code=400, detail="Informe ao menos uma palavra para a busca")
+    # a busca sempre pagina, mesmo sem ?limit=
+    if not pagina.ativa:
+        pagina.limit = LIMITE_PADRAO
+
+    modo = "texto"
+    result = await db.execute(get_busca_query(q, pagina))
+    rows = result.mappings().all()
+
+    # nada encontrado na primeira página: tenta nomes parecidos, se o banco tiver pg_trgm
+    if not rows and pagina.after is None and await trigramas_disponiveis(db):
+        modo = "aproximado"
+        result = await db.execute(get_busca_aproximada_query(q, pagina.limit))
+        rows = result.mappings().all()
+
+    dados = []
+    for row in rows:
+        item = dict(row)
+        item["imagem_url"] = imagem_url(item["codigo"], item.pop("tem_imagem"))
+        dados.append(item)
+
+    proximo = None
+    if modo == "texto" and rows:
+        proximo = pagina.proximo(len(rows), (-rows[-1]["relevancia"], rows[-1]["codigo"]))
+    return BuscaProdutosResponse(dados=dados, proximo=proximo, modo=modo)
+
+
+registrar_consulta("busca_produtos", lambda: get_busca_query("aquecimento", Pagina(limit=1, after=None)))
+
+
+@router.get("/produtos/autocomplete", response_model=List[ProdutoAutocomplete])
+async def autocomplete_produtos(
+    prefixo: str = Query(..., min_length=1, max_length=100, description="Início do código ou de uma palavra do nome"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    # servido do índice em memória do worker (app/core/autocompletar.py), sem consultar o banco
+    if not indice_produtos.pronto:
+        raise HTTPException(status_code=503, detail="Índice de autocomplete ainda carregando")
+    return indice_produtos.buscar(prefixo, limit)
+
+
+@router.get("/produtos/{codigo}/imagem")
+async def imagem_produto(codigo: int, request: Request, db: AsyncSession = Depends(get_db)):
+    if_none_match = request.headers.get("if-none-match")
+
+    # o hash é coluna gerada (migração 0009): com If-None-Match só ele é lido, para
+    # responder 304 sem tocar no blob; sem o cabeçalho hash e bytes vêm juntos
+    if if_none_match:
+        query = select(DimProduto.imagem_md5).where(DimProduto.codigo == codigo)
+    else:
+        query = select(DimProduto.imagem_md5, DimProduto.imagem).where(DimProduto.codigo == codigo)
+
+    result = await db.execute(query)
+    row = result.first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    if row[0] is None:
+        raise HTTPException(status_code=404, detail="Produto sem imagem")
+
+    etag = f'"{row[0]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={IMAGEM_CACHE_MAX_AGE}",
+    }
+
+    if etag_corresponde(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if if_none_match:
+        result = await db.execute(select(DimProduto.imagem).where(DimProduto.codigo == codigo))
+        conteudo = result.scalar_one()
+    else:
+        conteudo = row[1]
+
+    return Response(content=conteudo, media_type=tipo_imagem(conteudo), headers=headers)
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
-from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload, aliased
+from sqlalchemy import select, insert, func, any_, bindparam, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
+from pydantic import ValidationError
+from app.core.cache import marcar_dados_alterados
 from app.core.database import SessionLocal
+from app.core.jobs import em_lotes, registrar_tipo
+from app.core.paginacao import Pagina, paginar
+from app.core.estoque import registrar_recebimento, registrar_recebimentos
 from app.models import DimProduto, FactRecebimento, FactCategoria, DimCategoria
-from typing import Optional
-from app.schemas.recebimentos import AddReceiptRequest, AddReceiptResponse, ReceiptResponse
-import base64
+from typing import Optional, Any
+from app.schemas.recebimentos import (
+    AddReceiptRequest,
+    AddReceiptResponse,
+    AddReceiptBatchResponse,
+    ReceiptLineError,
+    ReceiptResponse
+)
+from app.core.imagens import imagem_url
+import csv
+import io
+import os
+
+RECEBIMENTOS_LOTE_MAXIMO = int(os.getenv("RECEBIMENTOS_LOTE_MAXIMO", "50000"))
+# tamanho aceito por linha do CSV de recebimentos; o arquivo é recusado antes de
+# ser lido se passar de RECEBIMENTOS_LOTE_MAXIMO linhas desse tamanho
+RECEBIMENTOS_CSV_BYTES_LINHA = int(os.getenv("RECEBIMENTOS_CSV_BYTES_LINHA", "512"))
 
 router = APIRouter()
 
@@ -14,120 +34,115 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.get("/recebimento", response_model=ReceiptResponse)
-async def recebimento(db: AsyncSession = Depends(get_db), codigo: Optional[int] = None):
-    try:
-        if codigo:
-            query = (
-            select(
-                func.to_char(FactRecebimento.data_receb, 'DD/MM/YYYY').label('data_receb'),
-                DimProduto.codigo,
-                DimProduto.nome_basico,
-                DimProduto.fabricante,
-                FactRecebimento.fornecedor,
-                FactRecebimento.preco_de_aquisicao,
-                DimProduto.imagem,
-                FactRecebimento.quant,
-                FactRecebimento.lote,
-                func.to_char(FactRecebimento.validade, 'DD/MM/YYYY').label('validade'),
-                DimProduto.preco_de_venda,
-                DimProduto.fragilidade,
-                DimCategoria.categoria.label("categoria")
-            )
-            .select_from(FactRecebimento)
-            .join(DimProduto, FactRecebimento.codigo == DimProduto.codigo)
-            .outerjoin(FactCategoria, DimProduto.codigo == FactCategoria.codigo)
-            .outerjoin(DimCategoria, FactCategoria.idcategoria == DimCategoria.idcategoria)
-            .where(FactRecebimento.codigo == codigo)
-            )
-        else:
-            query = (
-                select(
-                    func.to_char(FactRecebimento.data_receb, 'DD/MM/YYYY').label('data_receb'),
-                    DimProduto.codigo,
-                    DimProduto.nome_basico,
-                    DimProduto.fabricante,
-                    FactRecebimento.fornecedor,
-                    FactRecebimento.preco_de_aquisicao,
-                    DimProduto.imagem,
-                    FactRecebimento.quant,
-                    FactRecebimento.lote,
-                    func.to_char(FactRecebimento.validade, 'DD/MM/YYYY').label('validade'),
-                    DimProduto.preco_de_venda,
-                    DimProduto.fragilidade,
-                    DimCategoria.categoria.label("categoria")
-                )
-                .select_from(FactRecebimento)
-                .join(DimProduto, FactRecebimento.codigo == DimProduto.codigo)
-                .outerjoin(FactCategoria, DimProduto.codigo == FactCategoria.codigo)
-                .outerjoin(DimCategoria, FactCategoria.idcategoria == DimCategoria.idcategoria)
-            )
-        
-        result = await db.execute(query)
-        recebimentos = result.mappings().all()
-    except Exception as e:
-        print("Erro ao buscar recebimentos:", e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno, por favor tente novamente mais tarde")
+def get_recebimentos_query(pagina: Pagina, codigo: Optional[int] = None):
+    """
+    Função auxiliar para construir a query de recebimentos.
+    A página é recortada em FactRecebimento antes do JOIN com as categorias,
+    assim um recebimento com várias categorias nunca fica dividido entre páginas.
+    """
+    recebimentos_sub = select(FactRecebimento)
+    if codigo:
+        recebimentos_sub = recebimentos_sub.where(FactRecebimento.codigo == codigo)
+    recebimentos_sub = paginar(
+        recebimentos_sub,
+        [FactRecebimento.data_receb, FactRecebimento.idrecebimento],
+        pagina
+    ).subquery()
+    r = aliased(FactRecebimento, recebimentos_sub)
+
+    query = (
+        select(
+            r.idrecebimento,
+            r.data_receb.label('data_receb_chave'),
+            func.to_char(r.data_receb, 'DD/MM/YYYY').label('data_receb'),
+            DimProduto.codigo,
+            DimProduto.nome_basico,
+            DimProduto.fabricante,
+            r.fornecedor,
+            r.preco_de_aquisicao,
+            DimProduto.imagem.isnot(None).label("tem_imagem"),
+            r.quant,
+            r.lote,
+            func.to_char(r.validade, 'DD/MM/YYYY').label('validade'),
+            DimProduto.preco_de_venda,
+            DimProduto.fragilidade,
+            DimCategoria.categoria.label("categoria")
+        )
+        .select_from(r)
+        .join(DimProduto, r.codigo == DimProduto.codigo)
+        .outerjoin(FactCategoria, DimProduto.codigo == FactCategoria.codigo)
+        .outerjoin(DimCategoria, FactCategoria.idcategoria == DimCategoria.idcategoria)
+    )
+    if pagina.ativa:
+        query = query.order_by(r.data_receb, r.idrecebimento)
+
+    return query
+
+def formatar_recebimento(row: dict) -> dict:
+    row['imagem_url'] = imagem_url(row['codigo'], row.pop('tem_imagem'))
+    row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
+    return row
 
+def montar_resposta(recebimentos, pagina: Pagina) -> ReceiptResponse:
     # Converter para JSON
     dados = []
+    ids = set()
+    ultima_chave = None
     for rec in recebimentos:
         row = dict(rec)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-        row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+        ultima_chave = (row.pop('data_receb_chave'), row['idrecebimento'])
+        ids.add(row['idrecebimento'])
+        dados.append(formatar_recebimento(row))
 
     return ReceiptResponse(
-        dados=dados
+        dados=dados,
+        proximo=pagina.proximo(len(ids), ultima_chave)
     )
 
+@router.get("/recebimento", response_model=ReceiptResponse)
+async def recebimento(db: AsyncSession = Depends(get_db), codigo: Optional[int] = None, pagina: Pagina = Depends()):
+    # fora do try: cursor inválido é 400, não erro interno
+    query = get_recebimentos_query(pagina, codigo)
+    try:
+        result = await db.execute(query)
+        recebimentos = result.mappings().all()
+    except Exception as e:
+        print("Erro ao buscar recebimentos:", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno, por favor tente novamente mais tarde")
+
+    return montar_resposta(recebimentos, pagina)
+
 # apenas com get e path parameter
 @router.get("/recebimento/{codigo}", response_model=ReceiptResponse)
-async def recebimento(codigo: int, db: AsyncSession = Depends(get_db)):
+async def recebimento(codigo: int, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    # fora do try: cursor inválido é 400, não erro interno
+    query = get_recebimentos_query(pagina, codigo)
     try:
-        query = (
-            select(
-                func.to_char(FactRecebimento.data_receb, 'DD/MM/YYYY').label('data_receb'),
-                DimProduto.codigo,
-                DimProduto.nome_basico,
-                DimProduto.fabricante,
-                FactRecebimento.fornecedor,
-                FactRecebimento.preco_de_aquisicao,
-                DimProduto.imagem,
-                FactRecebimento.quant,
-                FactRecebimento.lote,
-                func.to_char(FactRecebimento.validade, 'DD/MM/YYYY').label('validade'),
-                DimProduto.preco_de_venda,
-                DimProduto.fragilidade,
-                DimCategoria.categoria.label("categoria")
-            )
-            .select_from(FactRecebimento)
-            .join(DimProduto, FactRecebimento.codigo == DimProduto.codigo)
-            .outerjoin(FactCategoria, DimProduto.codigo == FactCategoria.codigo)
-            .outerjoin(DimCategoria, FactCategoria.idcategoria == DimCategoria.idcategoria)
-            .where(FactRecebimento.codigo == codigo)
-        )
-
         result = await db.execute(query)
         recebimentos = result.mappings().all()
-        print("Recebimentos encontrados:", recebimentos)
     except Exception as e:
         print("erro:", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno, por favor tente novamente mais tarde")
 
-    # Converter para JSON
-    dados = []
-    for rec in recebimentos:
-        row = dict(rec)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-            row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+    return montar_resposta(recebimentos, pagina)
 
-    return ReceiptResponse(
-        dados=dados
-    )
+# dump completo em segundo plano: POST /jobs/recebimentos (ver app/core/jobs.py), sem ordenação
+def formatar_recebimento_exportado(row: dict) -> dict:
+    del row['data_receb_chave']
+    return formatar_recebimento(row)
+
+def exportar_recebimentos(db: AsyncSession, parametros: dict):
+    query = get_recebimentos_query(Pagina(limit=None, after=None), parametros.get("codigo"))
+    return em_lotes(db, query)
+
+async def contar_recebimentos(db: AsyncSession, parametros: dict) -> int:
+    # recebimentos, não linhas: com várias categorias o recebimento se repete, daí o total ser estimativa
+    query = select(func.count()).select_from(FactRecebimento)
+    if parametros.get("codigo"):
+        query = query.where(FactRecebimento.codigo == parametros["codigo"])
+    return (await db.execute(query)).scalar_one()
+
+registrar_tipo("recebimentos", exportar_recebimentos, parametros=("codigo",), contar=contar_recebimentos, formatar=formatar_recebimento_exportado)
 
 # com o método post
 # @router.post("/Recebimento", response_model=ReceiveResponse)
@@ -192,7 +207,12 @@ async def add_receipt(data: AddReceiptRequest, db: AsyncSession = Depends(get_db
 
     try:
         db.add(new_receipt)
+        # saldo do lote atualizado na mesma transação do recebimento
+        await registrar_recebimento(
+            db, data.codigo, data.lote, data.fornecedor, data.quant, data.data_receb, data.validade
+        )
         await db.commit()
+        marcar_dados_alterados()
         await db.refresh(new_receipt)
     except Exception as e:
         await db.rollback()
@@ -201,3 +221,113 @@ async def add_receipt(data: AddReceiptRequest, db: AsyncSession = Depends(get_db
     return AddReceiptResponse(
         message="Recebimento adicionado com sucesso!"
     )
+
+async def inserir_recebimentos(linhas: list, db: AsyncSession) -> AddReceiptBatchResponse:
+    """
+    Valida e insere um lote de recebimentos em uma única transação:
+    uma consulta para todos os códigos, INSERTs multi-row e o saldo por lote
+    atualizado em bloco. Linhas inválidas são relatadas e as demais inseridas.
+    """
+    if len(linhas) > RECEBIMENTOS_LOTE_MAXIMO:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Máximo de {RECEBIMENTOS_LOTE_MAXIMO} recebimentos por lote")
+
+    erros = []
+    validos = []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            recebimento = AddReceiptRequest.model_validate(linha)
+        except ValidationError as e:
+            codigo = linha.get("codigo") if isinstance(linha, dict) else None
+            erros.append(ReceiptLineError(
+                linha=numero,
+                codigo=codigo if isinstance(codigo, int) else None,
+                erro="; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            ))
+            continue
+        if recebimento.quant <= 0:
+            erros.append(ReceiptLineError(linha=numero, codigo=recebimento.codigo, erro="Quantidade deve ser maior que zero"))
+            continue
+        validos.append((numero, recebimento))
+
+    #checa de uma vez se os códigos existem
+    codigos = list({r.codigo for _, r in validos})
+    try:
+        # "= ANY(array)" envia todos os códigos em um único parâmetro
+        result = await db.execute(
+            select(DimProduto.codigo).where(
+                DimProduto.codigo == any_(bindparam("codigos", codigos, type_=ARRAY(BigInteger)))
+            )
+        )
+        existentes = set(result.scalars().all())
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro no banco de dados. Erro: {e}")
+
+    novos = []
+    for numero, r in validos:
+        if r.codigo not in existentes:
+            erros.append(ReceiptLineError(linha=numero, codigo=r.codigo, erro=f"Produto com código: {r.codigo} não encontrado."))
+            continue
+        novos.append(r.model_dump())
+
+    try:
+        if novos:
+            # executemany na tabela (Core, não ORM): o SQLAlchemy agrupa as linhas
+            # em INSERTs multi-row ("insertmanyvalues") sem separar por colunas nulas
+            await db.execute(insert(FactRecebimento.__table__), novos)
+        await registrar_recebimentos(db, novos)
+        await db.commit()
+        marcar_dados_alterados()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao adicionar recebimentos no banco de dados. Erro: {e}")
+
+    erros.sort(key=lambda erro: erro.linha)
+    return AddReceiptBatchResponse(
+        message=f"{len(novos)} recebimento(s) adicionado(s), {len(erros)} com erro",
+        inseridos=len(novos),
+        erros=erros
+    )
+
+@router.post("/adicionar-recebimentos/lote", response_model=AddReceiptBatchResponse)
+async def add_receipts(linhas: list[dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_db)):
+    # recebe dicts e valida linha a linha, para relatar os erros por linha em vez de um 422 do lote inteiro
+    return await inserir_recebimentos(linhas, db)
+
+@router.post("/adicionar-recebimentos/lote/csv", response_model=AddReceiptBatchResponse)
+async def add_receipts_csv(arquivo: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    """
+    CSV com cabeçalho: data_receb,quant,codigo,validade,preco_de_aquisicao,lote,fornecedor
+    (separador ',' ou ';'), em UTF-8 ou Windows-1252 (CSV salvo pelo Excel).
+    Campos vazios são tratados como nulos.
+    """
+    limite = (RECEBIMENTOS_LOTE_MAXIMO + 1) * RECEBIMENTOS_CSV_BYTES_LINHA
+    muito_grande = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Arquivo muito grande: máximo de {RECEBIMENTOS_LOTE_MAXIMO} recebimentos por lote"
+    )
+    if arquivo.size is not None and arquivo.size > limite:
+        raise muito_grande
+    dados = await arquivo.read(limite + 1)
+    if len(dados) > limite:
+        raise muito_grande
+
+    try:
+        conteudo = dados.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        try:
+            conteudo = dados.decode("cp1252")
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Não foi possível ler o arquivo: salve o CSV em UTF-8"
+            )
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo.split("\n", 1)[0], delimiters=",;")
+    except csv.Error:
+        dialeto = csv.excel
+
+    linhas = [
+        {campo: (valor if valor not in ("", None) else None) for campo, valor in registro.items()}
+        for registro in csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    ]
+    return await inserir_recebimentos(linhas, db)
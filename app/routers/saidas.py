@@ -1,10 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy import select, func
+from datetime import date, timedelta
+import os
+from app.core.aquecimento import registrar_consulta
+from app.core.cache import CacheVersionado, marcar_dados_alterados
 from app.core.database import SessionLocal
-from app.models import DimProduto, FactRecebimento, FactSaida
-from app.schemas.saidas import SaidaResponse, AddSaidaRequest, AddSaidaResponse, FornecedoresResponse, LotesResponse
-import base64
+from app.core.jobs import em_lotes, registrar_tipo
+from app.core.paginacao import Pagina, paginar
+from app.core.estoque import baixar_saldo, alocar_saida_fefo, get_baixa_saldo_query
+from app.models import DimProduto, FactRecebimento, FactSaida, SaldoEstoque
+from app.schemas.saidas import (
+    SaidaResponse,
+    AddSaidaRequest,
+    AddSaidaResponse,
+    AddSaidaAutoRequest,
+    AddSaidaAutoResponse,
+    FornecedoresResponse,
+    LotesResponse,
+    LotesDisponiveisResponse,
+    LotesVencendoResponse
+)
+from app.core.imagens import etag_corresponde, imagem_url
 
 router = APIRouter()
 
@@ -12,74 +30,87 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.get("/saidas", response_model=SaidaResponse)
-async def issue(db: AsyncSession = Depends(get_db)):
+def get_saidas_query(pagina: Pagina, codigo: int | None = None):
+    """
+    Função auxiliar para construir a query de saídas.
+    A página é recortada em FactSaida antes dos JOINs, que podem repetir a saída.
+    """
+    saidas_sub = select(FactSaida)
+    if codigo is not None:
+        saidas_sub = saidas_sub.where(FactSaida.codigo == codigo)
+    saidas_sub = paginar(
+        saidas_sub,
+        [FactSaida.data_saida, FactSaida.idrecebimento],
+        pagina
+    ).subquery()
+    s = aliased(FactSaida, saidas_sub)
+
     # Query com ORM
     query = (
         select(
+            s.idrecebimento.label('idsaida'),
+            s.data_saida.label('data_saida_chave'),
             DimProduto.codigo,
             DimProduto.nome_basico,
             DimProduto.fabricante,
-            FactSaida.fornecedor,
+            s.fornecedor,
             FactRecebimento.preco_de_aquisicao,
-            DimProduto.imagem,
-            FactSaida.quant,
-            func.to_char(FactSaida.data_saida, 'DD/MM/YYYY').label('data_saida'),
+            DimProduto.imagem.isnot(None).label("tem_imagem"),
+            s.quant,
+            func.to_char(s.data_saida, 'DD/MM/YYYY').label('data_saida'),
             FactRecebimento.lote,
             func.to_char(FactRecebimento.validade, 'DD/MM/YYYY').label('validade'),
             DimProduto.preco_de_venda,
             DimProduto.fragilidade
         )
-        .join(DimProduto, FactSaida.codigo == DimProduto.codigo)
+        .select_from(s)
+        .join(DimProduto, s.codigo == DimProduto.codigo)
         .join(FactRecebimento, 
-            (FactSaida.codigo == FactRecebimento.codigo) &
-            (FactSaida.lote == FactRecebimento.lote))
+            (s.codigo == FactRecebimento.codigo) &
+            (s.lote == FactRecebimento.lote))
     )
+    if pagina.ativa:
+        query = query.order_by(s.data_saida, s.idrecebimento)
 
-    try:
-        result = await db.execute(query)
-        saidas = result.mappings().all()
-    except Exception as e:
-        print('erro:', e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha em buscar saídas no banco de dados")
-    
+    return query
+
+def formatar_saida(row: dict) -> dict:
+    row['imagem_url'] = imagem_url(row['codigo'], row.pop('tem_imagem'))
+    row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
+    return row
+
+def montar_resposta(saidas, pagina: Pagina) -> SaidaResponse:
     # transforma em uma lista para evitar erro do pydantic
     dados = []
+    ids = set()
+    ultima_chave = None
     for saida in saidas:
         row = dict(saida)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-        row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+        ultima_chave = (row.pop('data_saida_chave'), row['idsaida'])
+        ids.add(row['idsaida'])
+        dados.append(formatar_saida(row))
 
     return SaidaResponse(
-        dados=dados
+        dados=dados,
+        proximo=pagina.proximo(len(ids), ultima_chave)
     )
 
+@router.get("/saidas", response_model=SaidaResponse)
+async def issue(db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    query = get_saidas_query(pagina)
+
+    try:
+        result = await db.execute(query)
+        saidas = result.mappings().all()
+    except Exception as e:
+        print('erro:', e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha em buscar saídas no banco de dados")
+
+    return montar_resposta(saidas, pagina)
+
 @router.get("/saidas/{codigo}", response_model=SaidaResponse)
-async def issue(codigo: int, db: AsyncSession = Depends(get_db)):
-    # Query com ORM
-    query = (
-        select(
-            DimProduto.codigo,
-            DimProduto.nome_basico,
-            DimProduto.fabricante,
-            FactSaida.fornecedor,
-            FactRecebimento.preco_de_aquisicao,
-            DimProduto.imagem,
-            FactSaida.quant,
-            func.to_char(FactSaida.data_saida, 'DD/MM/YYYY').label('data_saida'),
-            FactRecebimento.lote,
-            func.to_char(FactRecebimento.validade, 'DD/MM/YYYY').label('validade'),
-            DimProduto.preco_de_venda,
-            DimProduto.fragilidade
-        )
-        .join(DimProduto, FactSaida.codigo == DimProduto.codigo)
-        .join(FactRecebimento, 
-            (FactSaida.codigo == FactRecebimento.codigo) &
-            (FactSaida.lote == FactRecebimento.lote))
-        .where(FactSaida.codigo == codigo)
-    )
+async def issue(codigo: int, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    query = get_saidas_query(pagina, codigo)
 
     try:
         result = await db.execute(query)
@@ -88,65 +119,43 @@ async def issue(codigo: int, db: AsyncSession = Depends(get_db)):
         print('erro:', e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha em buscar saídas no banco de dados")
 
-    # para Evitar erro do pydantic e transformar decimal em float
-    dados = []
-    for saida in saidas:
-        row = dict(saida)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-        row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+    return montar_resposta(saidas, pagina)
 
-    return SaidaResponse(
-        dados=dados
-    )
+# dump completo em segundo plano: POST /jobs/saidas (ver app/core/jobs.py), sem ordenação
+def formatar_saida_exportado(row: dict) -> dict:
+    del row['data_saida_chave']
+    return formatar_saida(row)
 
-@router.post("/adicionar-saida", response_model=AddSaidaResponse)
-async def add_issue(data: AddSaidaRequest, db: AsyncSession = Depends(get_db)):   
-    # utilização de subqueries para evitar duplicação de colunas
-    # subquery de recebimentos
-    recebimentos_subq = (
-        select(func.coalesce(func.sum(FactRecebimento.quant), 0))
-        .where(
-            FactRecebimento.codigo == data.codigo,
-            FactRecebimento.lote == data.numbLote,
-            FactRecebimento.fornecedor == data.fornecedor
-        )
-    ).scalar_subquery()
-
-    # subquery de saídas
-    saidas_subq = (
-        select(func.coalesce(func.sum(FactSaida.quant), 0))
-        .where(
-            FactSaida.codigo == data.codigo,
-            FactSaida.lote == data.numbLote,
-            FactSaida.fornecedor == data.fornecedor
-        )
-    ).scalar_subquery()
+def exportar_saidas(db: AsyncSession, parametros: dict):
+    query = get_saidas_query(Pagina(limit=None, after=None), parametros.get("codigo"))
+    return em_lotes(db, query)
 
-    # query final
-    query = select((recebimentos_subq - saidas_subq).label("EstoqueDisponivel"))
+async def contar_saidas(db: AsyncSession, parametros: dict) -> int:
+    query = select(func.count()).select_from(FactSaida)
+    if "codigo" in parametros:
+        query = query.where(FactSaida.codigo == parametros["codigo"])
+    return (await db.execute(query)).scalar_one()
 
-    try: 
-        result = await db.execute(query)
-        quantidade_disponivel = result.scalar() or 0
-        quantidade_disponivel = int(quantidade_disponivel) # transforma para fazer comparação
+registrar_tipo("saidas", exportar_saidas, parametros=("codigo",), contar=contar_saidas, formatar=formatar_saida_exportado)
 
-        if quantidade_disponivel < data.quantidade:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantidade no estoque insuficiente")
+@router.post("/adicionar-saida", response_model=AddSaidaResponse)
+async def add_issue(data: AddSaidaRequest, db: AsyncSession = Depends(get_db)):   
+    if data.quantidade <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantidade deve ser maior que zero")
 
-        # Adicionando saída no banco de dados
-        new_issue = FactSaida(
-            data_saida=data.data_saida,
-            quant=data.quantidade,
-            codigo=data.codigo,
-            lote=data.numbLote,
-            fornecedor=data.fornecedor
+    try:
+        # conferência do saldo e inserção da saída em um único comando,
+        # com trava apenas na linha de saldo do lote (ver baixar_saldo)
+        saida = await baixar_saldo(
+            db, data.codigo, data.numbLote, data.fornecedor, data.quantidade, data.data_saida
         )
 
-        db.add(new_issue)
+        if saida is None:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantidade no estoque insuficiente")
+
         await db.commit()
-        await db.refresh(new_issue)
+        marcar_dados_alterados()
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -157,6 +166,32 @@ async def add_issue(data: AddSaidaRequest, db: AsyncSession = Depends(get_db)):
         message="Saída adicionada com sucesso!"
     )
 
+@router.post("/adicionar-saida/auto", response_model=AddSaidaAutoResponse)
+async def add_issue_auto(data: AddSaidaAutoRequest, db: AsyncSession = Depends(get_db)):
+    if data.quantidade <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantidade deve ser maior que zero")
+
+    try:
+        # escolhe os lotes por validade (FEFO) e grava todas as saídas na mesma transação
+        alocacao = await alocar_saida_fefo(db, data.codigo, data.quantidade, data.data_saida)
+
+        if alocacao is None:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantidade no estoque insuficiente")
+
+        await db.commit()
+        marcar_dados_alterados()
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha ao adicionar saída")
+
+    return AddSaidaAutoResponse(
+        message=f"Saída adicionada em {len(alocacao)} lote(s)",
+        alocacao=alocacao
+    )
+
 @router.get("/fornecedores/{codigo}", response_model=FornecedoresResponse)
 async def fornecedores(codigo: int, db: AsyncSession = Depends(get_db)):
     query = (
@@ -183,41 +218,44 @@ async def fornecedores(codigo: int, db: AsyncSession = Depends(get_db)):
         dados=dados
     )
 
-@router.get("/lotes/", response_model=LotesResponse)
-async def lotes(fornecedor: str | None = None, codigo: int | None = None, db: AsyncSession = Depends(get_db)):
-    # utilização de subqueries para evitar duplicação de colunas
-    # subquery de recebimentos
-    recebimentos_subq = (
-        select(func.coalesce(func.sum(FactRecebimento.quant), 0))
-        .where(
-            FactRecebimento.codigo == codigo,
-            FactRecebimento.fornecedor == fornecedor
-        )
-    ).scalar_subquery()
-
-    # subquery de saídas
-    saidas_subq = (
-        select(func.coalesce(func.sum(FactSaida.quant), 0))
-        .where(
-            FactSaida.codigo == codigo,
-            FactSaida.fornecedor == fornecedor
-        )
-    ).scalar_subquery()
-
-    # query final
+def get_lotes_query(codigo: int | None, fornecedor: str | None = None, ocultar_vazios: bool = False):
+    """
+    Disponível por lote (recebido menos saído) de um produto, opcionalmente
+    de um só fornecedor, do vencimento mais próximo ao mais distante (lotes
+    sem validade por último). Lê os saldos materializados em SaldoEstoque,
+    os mesmos que a baixa da saída confere: uma linha por (lote, fornecedor)
+    pelo índice único uq_saldoestoque_lote, sem somar o histórico de fatos.
+    """
     query = (
         select(
-            (recebimentos_subq - saidas_subq).label("EstoqueDisponivel"),
-            FactRecebimento.lote
-        )
-        .group_by(
-            FactRecebimento.lote
+            SaldoEstoque.lote,
+            SaldoEstoque.fornecedor,
+            SaldoEstoque.validade,
+            SaldoEstoque.quant_recebida,
+            SaldoEstoque.quant_saida,
+            SaldoEstoque.saldo.label("EstoqueDisponivel")
         )
-        .where(
-            FactRecebimento.codigo == codigo,
-            FactRecebimento.fornecedor == fornecedor
+        .where(SaldoEstoque.codigo == codigo)
+        .order_by(
+            SaldoEstoque.validade.asc().nulls_last(),
+            SaldoEstoque.lote,
+            SaldoEstoque.fornecedor
         )
     )
+    if fornecedor is not None:
+        query = query.where(SaldoEstoque.fornecedor == fornecedor)
+    if ocultar_vazios:
+        query = query.where(SaldoEstoque.saldo > 0)
+    return query
+
+registrar_consulta("lotes", lambda: get_lotes_query(-1, ""))
+registrar_consulta("lotes_produto", lambda: get_lotes_query(-1, ocultar_vazios=True))
+# roda na transação desfeita do aquecimento e não encontra lote: nada é gravado
+registrar_consulta("adicionar_saida", lambda: get_baixa_saldo_query(-1, "", "", 1, date.today()))
+
+@router.get("/lotes/", response_model=LotesResponse)
+async def lotes(fornecedor: str | None = None, codigo: int | None = None, db: AsyncSession = Depends(get_db)):
+    query = get_lotes_query(codigo, fornecedor)
     
     try:
         result = await db.execute(query)
@@ -229,10 +267,130 @@ async def lotes(fornecedor: str | None = None, codigo: int | None = None, db: As
         "id": row.lote,
         "codigo": codigo,
         "lote": row.lote,
-        "fornecedor": fornecedor,
+        "fornecedor": row.fornecedor,
+        "validade": row.validade,
         "estoqueDisponivel": row.EstoqueDisponivel
     } for row in query_result]
 
     return LotesResponse(
         dados=dados
-    )
\ No newline at end of file
+    )
+
+def get_lotes_vencendo_query(desde: date, ate: date, limite: int):
+    """
+    Lotes com saldo positivo e validade entre as datas, os primeiros a vencer
+    até o limite, pelo índice parcial ix_saldoestoque_validade_disponivel:
+    o custo depende dos lotes na janela, não do histórico de recebimentos.
+    """
+    query = (
+        select(
+            SaldoEstoque.codigo,
+            DimProduto.nome_basico,
+            SaldoEstoque.lote,
+            SaldoEstoque.fornecedor,
+            SaldoEstoque.validade,
+            SaldoEstoque.saldo
+        )
+        .join(DimProduto, DimProduto.codigo == SaldoEstoque.codigo)
+        # mesmo predicado do índice parcial
+        .where(SaldoEstoque.saldo > 0, SaldoEstoque.validade.isnot(None), SaldoEstoque.validade.between(desde, ate))
+        .order_by(SaldoEstoque.validade, SaldoEstoque.codigo, SaldoEstoque.lote, SaldoEstoque.fornecedor)
+        .limit(limite)
+    )
+    return query
+
+registrar_consulta("lotes_vencendo", lambda: get_lotes_vencendo_query(date.min, date.min, 1))
+
+# painéis consultam a lista de vencimentos o tempo todo; só refaz a consulta após uma escrita
+LOTES_VENCENDO_MAXIMO = int(os.getenv("LOTES_VENCENDO_MAXIMO", "2000"))
+cache_lotes_vencendo = CacheVersionado("lotesVencendo")
+
+@router.get("/lotes/vencendo", response_model=LotesVencendoResponse)
+async def lotes_vencendo(
+    request: Request,
+    dias: int = Query(30, ge=0, le=3650, description="Janela, em dias a partir de hoje"),
+    vencidos_ha: int = Query(0, ge=0, le=3650, description="Inclui lotes já vencidos com saldo, até tantos dias atrás"),
+    limit: int = Query(LOTES_VENCENDO_MAXIMO, ge=1, le=LOTES_VENCENDO_MAXIMO, description="Máximo de lotes, os primeiros a vencer"),
+    db: AsyncSession = Depends(get_db)
+):
+    hoje = date.today()
+    desde = hoje - timedelta(days=vencidos_ha)
+    ate = hoje + timedelta(days=dias)
+
+    async def montar() -> bytes:
+        # um a mais que o limite, só para saber se a lista foi cortada
+        result = await db.execute(get_lotes_vencendo_query(desde, ate, limit + 1))
+        rows = result.mappings().all()
+        truncado = len(rows) > limit
+        rows = rows[:limit]
+
+        # agrupa por produto mantendo a ordem do lote que vence primeiro
+        produtos: dict[int, dict] = {}
+        for row in rows:
+            produto = produtos.get(row.codigo)
+            if produto is None:
+                produto = produtos[row.codigo] = {
+                    "codigo": row.codigo,
+                    "nome_basico": row.nome_basico,
+                    "primeira_validade": row.validade,
+                    "saldo_total": 0,
+                    "lotes": []
+                }
+            produto["saldo_total"] += row.saldo
+            produto["lotes"].append({
+                "lote": row.lote,
+                "fornecedor": row.fornecedor,
+                "validade": row.validade,
+                "dias_restantes": (row.validade - hoje).days,
+                "saldo": row.saldo
+            })
+
+        resposta = LotesVencendoResponse(
+            referencia=hoje,
+            desde=desde,
+            ate=ate,
+            total_lotes=len(rows),
+            truncado=truncado,
+            dados=list(produtos.values())
+        )
+        return resposta.model_dump_json().encode()
+
+    try:
+        corpo, etag = await cache_lotes_vencendo.obter(montar, chave=(hoje, dias, vencidos_ha, limit))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao buscar lotes vencendo: {str(e)}")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+@router.get("/lotes/{codigo}", response_model=LotesDisponiveisResponse)
+async def lotes_produto(
+    codigo: int,
+    fornecedor: str | None = None,
+    ocultar_vazios: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    query = get_lotes_query(codigo, fornecedor, ocultar_vazios)
+
+    try:
+        result = await db.execute(query)
+        query_result = result.mappings().all()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao buscar lotes: {str(e)}")
+
+    dados = [{
+        "lote": row.lote,
+        "fornecedor": row.fornecedor,
+        "validade": row.validade,
+        "quant_recebida": row.quant_recebida,
+        "quant_saida": row.quant_saida,
+        "disponivel": row.EstoqueDisponivel
+    } for row in query_result]
+
+    return LotesDisponiveisResponse(
+        codigo=codigo,
+        total_disponivel=sum(row["disponivel"] for row in dados),
+        dados=dados
+    )
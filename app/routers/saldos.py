@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from sqlalchemy.orm import sessionmaker, aliased
+from sqlalchemy import select, func
+from app.core.aquecimento import registrar_consulta
 from app.core.database import SessionLocal
+from app.core.jobs import em_lotes, registrar_tipo
+from app.core.paginacao import Pagina, paginar
 from app.models.produto import DimProduto
-from app.models import FactSaida, FactRecebimento
+from app.models import SaldoEstoque
 from app.schemas.saldos import SaldosResponse
-import base64
+from app.core.imagens import imagem_url
 
 router = APIRouter()
 
@@ -18,102 +20,95 @@ def get_saldos_query():
     """
     Função auxiliar para construir a query base de saldos.
     Isso evita duplicação de código entre as endpoints.
+    Os saldos vêm da tabela materializada SaldoEstoque (um registro por lote).
     """
-    # subquery para agregar os dados de recebimento
-    recebimento_sub = select(
-        FactRecebimento.lote,
-        FactRecebimento.fornecedor,
-        FactRecebimento.validade,
-        FactRecebimento.codigo,
-        func.sum(FactRecebimento.quant).label('quant_recebimento')
-    ).group_by(
-        FactRecebimento.lote,
-        FactRecebimento.fornecedor,
-        FactRecebimento.validade,
-        FactRecebimento.codigo
-    ).subquery()
-
-    # subquery para agregar os dados de saida
-    saida_sub = select(
-        FactSaida.lote,
-        FactSaida.fornecedor,
-        func.sum(FactSaida.quant).label('quant_saida')
-    ).group_by(
-        FactSaida.lote,
-        FactSaida.fornecedor
-    ).subquery()
-
-    # aliased para referenciar as subqueries de forma clara
-    r = aliased(recebimento_sub)
-    s = aliased(saida_sub)
-
-    # query principal com os JOINs
     query = select(
         DimProduto.codigo,
         DimProduto.nome_basico,
-        r.c.lote,
-        DimProduto.imagem,
+        SaldoEstoque.lote,
+        DimProduto.imagem.isnot(None).label("tem_imagem"),
         DimProduto.fragilidade,
         DimProduto.fabricante,
-        r.c.fornecedor,
+        SaldoEstoque.fornecedor,
         DimProduto.preco_de_venda,
         # Note: func.to_char é uma função específica do PostgreSQL.
-        func.to_char(r.c.validade, 'DD/MM/YYYY').label('validade'),
-        func.coalesce(r.c.quant_recebimento, 0).label('quant_recebimento'),
-        func.coalesce(s.c.quant_saida, 0).label('quant_saida'),
-        (func.coalesce(r.c.quant_recebimento, 0) - func.coalesce(s.c.quant_saida, 0)).label('saldo')
+        func.to_char(SaldoEstoque.validade, 'DD/MM/YYYY').label('validade'),
+        SaldoEstoque.quant_recebida.label('quant_recebimento'),
+        SaldoEstoque.quant_saida,
+        SaldoEstoque.saldo
     ).join(
-        r, DimProduto.codigo == r.c.codigo
-    ).outerjoin(
-        s, and_(r.c.lote == s.c.lote, r.c.fornecedor == s.c.fornecedor)
+        SaldoEstoque, DimProduto.codigo == SaldoEstoque.codigo
     )
 
     return query
 
 
-@router.get("/saldos", response_model=SaldosResponse)
-async def balance(db: AsyncSession = Depends(get_db)):
+registrar_consulta("saldos_produto", lambda: get_saldos_query().where(DimProduto.codigo == -1))
+
+
+def formatar_saldo(row: dict) -> dict:
+    row['imagem_url'] = imagem_url(row['codigo'], row.pop('tem_imagem'))
+    row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
+    return row
+
+
+async def buscar_saldos(db: AsyncSession, pagina: Pagina, codigo: int | None = None) -> SaldosResponse:
+    """
+    A paginação é por produto: primeiro busca a página de códigos, depois
+    todos os lotes desses produtos, para que um produto não fique dividido.
+    """
     query = get_saldos_query()
+    codigos = None
+    if codigo is not None:
+        query = query.where(DimProduto.codigo == codigo)
+    if pagina.ativa:
+        # fora do try: cursor inválido é 400, não erro interno
+        # só produtos com lotes: paginar pelo cadastro inteiro devolvia páginas vazias (join com SaldoEstoque)
+        query_codigos = select(SaldoEstoque.codigo).distinct()
+        if codigo is not None:
+            query_codigos = query_codigos.where(SaldoEstoque.codigo == codigo)
+        query_codigos = paginar(query_codigos, [SaldoEstoque.codigo], pagina)
 
     try:
+        if pagina.ativa:
+            codigos = (await db.execute(query_codigos)).scalars().all()
+            query = query.where(DimProduto.codigo.in_(codigos)).order_by(DimProduto.codigo)
+
         result = await db.execute(query)
         saldos = result.mappings().all()
     except Exception as e:
         print('erro:', e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha interna do servidor")
 
-    dados = []
-    for saldo in saldos:
-        row = dict(saldo)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-        row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+    # Para evitar erros do pydantic
+    dados = [formatar_saldo(dict(saldo)) for saldo in saldos]
 
     return SaldosResponse(
-        dados=dados
-    )    
+        dados=dados,
+        proximo=pagina.proximo(len(codigos), (codigos[-1],)) if codigos else None
+    )
+
+
+@router.get("/saldos", response_model=SaldosResponse)
+async def balance(db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    return await buscar_saldos(db, pagina)
 
 @router.get("/saldos/{codigo}", response_model=SaldosResponse)
-async def balance(codigo: int, db: AsyncSession = Depends(get_db)):
-    query = get_saldos_query().where(DimProduto.codigo == codigo)
+async def balance(codigo: int, db: AsyncSession = Depends(get_db), pagina: Pagina = Depends()):
+    return await buscar_saldos(db, pagina, codigo)
 
-    try:
-        result = await db.execute(query)
-        saldos = result.mappings().all()
-    except Exception as e:
-        print('erro:', e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Falha interna do servidor")
 
-    # Para evitar erros do pydantic
-    dados = []
-    for saldo in saldos:
-        row = dict(saldo)
-        if row.get('imagem') and isinstance(row.get('imagem'), (bytes, bytearray)):
-            row['imagem'] =  base64.b64encode(row["imagem"]).decode("utf-8")
-        row['fragilidade'] = 'SIM' if row['fragilidade'] else 'NÃO'
-        dados.append(row)
+# dump completo em segundo plano: POST /jobs/saldos (ver app/core/jobs.py)
+def exportar_saldos(db: AsyncSession, parametros: dict):
+    query = get_saldos_query().order_by(DimProduto.codigo, SaldoEstoque.lote, SaldoEstoque.fornecedor)
+    if "codigo" in parametros:
+        query = query.where(DimProduto.codigo == parametros["codigo"])
+    return em_lotes(db, query)
 
-    return SaldosResponse(
-        dados=dados
-    )
\ No newline at end of file
+async def contar_saldos(db: AsyncSession, parametros: dict) -> int:
+    query = select(func.count()).select_from(SaldoEstoque)
+    if "codigo" in parametros:
+        query = query.where(SaldoEstoque.codigo == parametros["codigo"])
+    return (await db.execute(query)).scalar_one()
+
+registrar_tipo("saldos", exportar_saldos, parametros=("codigo",), contar=contar_saldos, formatar=formatar_saldo)
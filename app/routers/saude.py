@@ -0,0 +1,23 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.core.aquecimento import estado, pronto
+
+router = APIRouter(tags=["Saúde"])
+
+
+@router.get("/live")
+async def live():
+    """O processo está de pé e o event loop responde (não consulta o banco)."""
+    return {"status": "vivo"}
+
+
+@router.get("/ready")
+async def ready():
+    """200 só depois da inicialização e do aquecimento deste worker; antes disso, 503."""
+    dados = estado()
+    if not pronto():
+        dados["status"] = "falhou" if dados["erro"] else "aquecendo"
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=dados)
+    dados["status"] = "pronto"
+    return dados
@@ -15,7 +15,7 @@ class CatalogoResponse(BaseModel):
     fabricante: Optional[str]
     categorias: Optional[str]
     observacoes_adicional: Optional[str]
-    imagem: Optional[str]
+    imagem_url: Optional[str]
     unidade: Optional[str]
     preco_de_venda: Optional[float]
     fragilidade: str
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class JobRequest(BaseModel):
+    # cada tipo aceita só alguns destes (ver GET /jobs/tipos)
+    codigo: Optional[int] = None
+    nivel_servico: Optional[float] = Field(None, ge=0.5, le=0.9999)
+
+class JobResponse(BaseModel):
+    id: str
+    tipo: str
+    parametros: dict
+    status: str  # pendente, executando, concluido, falhou ou cancelado
+    criado_em: datetime
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    expira_em: Optional[datetime] = None  # depois disso o resultado é apagado
+    linhas: int
+    total: Optional[int] = None  # estimativa, quando o tipo sabe contar antes
+    percentual: Optional[float] = None
+    tamanho_bytes: Optional[int] = None
+    erro: Optional[str] = None
+    resultado_url: Optional[str] = None  # GET para baixar o CSV, quando concluido
+
+class TipoJobResponse(BaseModel):
+    tipo: str
+    parametros: list[str]
+    concorrencia: int
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+class PrevisaoResponse(BaseModel):
+    codigo: int
+    idexecucao: int
+    calculada_em: datetime
+    metodo: str  # ses (suavização exponencial), croston (demanda intermitente) ou sem_demanda
+    alfa: Optional[float] = None
+    previsao_diaria: float
+    dias: int
+    previsao_periodo: float  # previsao_diaria * dias
+    demanda_media: float
+    erro_medio: Optional[float] = None
+    dias_com_demanda: int
+
+class ExecucaoPrevisaoResponse(BaseModel):
+    idexecucao: int
+    status: str
+    iniciada_em: datetime
+    concluida_em: Optional[datetime] = None
+    produtos: int
+    processos: int
+    duracao_s: Optional[float] = None
+    erro: Optional[str] = None
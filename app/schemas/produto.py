@@ -41,7 +41,7 @@ class ProdutoResponse(BaseModel):
     peso: float
     observacoes_adicional: Optional[str]
     inserido_por: str
-    imagem: Optional[str]  # agora base64
+    imagem_url: Optional[str] = None  # bytes em /api/produtos/{codigo}/imagem
 
     class Config:
         orm_mode = True
@@ -97,4 +97,26 @@ class LoteResponse(BaseModel):
 # EDITAR LOTE  
 class LotePatch(BaseModel):
     validade: Optional[date] = None
-    fornecedor: Optional[str] = None
\ No newline at end of file
+    fornecedor: Optional[str] = None
+
+# BUSCA DE PRODUTOS (sem os bytes da imagem)
+class ProdutoBusca(BaseModel):
+    codigo: int
+    nome_basico: str
+    nome_modificador: Optional[str] = None
+    fabricante: Optional[str] = None
+    descricao_tecnica: Optional[str] = None
+    unidade: Optional[str] = None
+    preco_de_venda: Optional[float] = None
+    imagem_url: Optional[str] = None
+    relevancia: float
+
+class BuscaProdutosResponse(BaseModel):
+    dados: list[ProdutoBusca]
+    proximo: Optional[str] = None  # cursor da próxima página (?after=)
+    modo: str  # "texto" (busca textual) ou "aproximado" (trigramas, quando a textual não acha nada)
+
+# AUTOCOMPLETE (código e nome, servido da memória)
+class ProdutoAutocomplete(BaseModel):
+    codigo: int
+    nome_basico: str
@@ -18,5 +18,16 @@ class AddReceiptRequest(BaseModel):
 class AddReceiptResponse(BaseModel):
     message: str | None
 
+class ReceiptLineError(BaseModel):
+    linha: int  # posição do registro no lote, começando em 1
+    codigo: int | None = None
+    erro: str
+
+class AddReceiptBatchResponse(BaseModel):
+    message: str | None
+    inseridos: int
+    erros: list[ReceiptLineError]
+
 class ReceiptResponse(BaseModel):
-    dados: list
\ No newline at end of file
+    dados: list
+    proximo: str | None = None  # cursor da próxima página (?after=)
\ No newline at end of file
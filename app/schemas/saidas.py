@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import date
+from typing import Optional
 
 class AddSaidaRequest(BaseModel):
     fornecedor: str
@@ -12,8 +13,25 @@ class AddSaidaRequest(BaseModel):
 class AddSaidaResponse(BaseModel):
     message: str | None
 
+class AddSaidaAutoRequest(BaseModel):
+    codigo: int
+    quantidade: int
+    data_saida: date
+
+class AlocacaoLote(BaseModel):
+    lote: str
+    fornecedor: Optional[str]
+    validade: Optional[date]
+    quantidade: int
+    saldo_restante: int
+
+class AddSaidaAutoResponse(BaseModel):
+    message: str | None
+    alocacao: list[AlocacaoLote]
+
 class SaidaResponse(BaseModel):
     dados: list
+    proximo: str | None = None  # cursor da próxima página (?after=)
 
 class FornecedoresResponse(BaseModel):
     dados: list
@@ -21,6 +39,46 @@ class FornecedoresResponse(BaseModel):
 class LotesResponse(BaseModel):
     dados: list
 
+class LoteDisponivel(BaseModel):
+    lote: str
+    fornecedor: Optional[str]
+    validade: Optional[date]
+    quant_recebida: int
+    quant_saida: int
+    disponivel: int
+
+class LotesDisponiveisResponse(BaseModel):
+    codigo: int
+    total_disponivel: int
+    dados: list[LoteDisponivel]  # vencimento mais próximo primeiro
+
+class LoteVencendo(BaseModel):
+    lote: str
+    fornecedor: Optional[str]
+    validade: date
+    dias_restantes: int  # negativo: já vencido
+    saldo: int
+
+class ProdutoVencendo(BaseModel):
+    codigo: int
+    nome_basico: str
+    primeira_validade: date
+    saldo_total: int
+    lotes: list[LoteVencendo]
+
+class LotesVencendoResponse(BaseModel):
+    referencia: date
+    desde: date
+    ate: date
+    total_lotes: int
+    truncado: bool  # havia mais lotes na janela do que o limite
+    dados: list[ProdutoVencendo]  # produtos pelo lote que vence primeiro
+
 class EstoqueSeguranca(BaseModel):
     codigo: int
-    estoque_seguranca: float
\ No newline at end of file
+    estoque_seguranca: float
+    ponto_reposicao: float
+    demanda_media: float  # unidades por dia
+    demanda_desvio: float
+    lead_time_dias: float
+    lead_time_desvio: float
\ No newline at end of file
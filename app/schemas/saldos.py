@@ -2,4 +2,5 @@ from pydantic import BaseModel
 
 class SaldosResponse(BaseModel):
     dados: list
+    proximo: str | None = None  # cursor da próxima página (?after=)
     
\ No newline at end of file
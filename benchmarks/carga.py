@@ -0,0 +1,214 @@
+"""
+Benchmark de carga de ponta a ponta: dispara requisições contra o app real
+(no mesmo processo via ASGITransport, ou --url de um servidor rodando) sobre
+a massa de benchmarks.dados_sinteticos e mede, por endpoint, vazão e
+latência p50/p95/p99. Cada endpoint roda numa fase própria de --duracao
+segundos com --concorrencia clientes; as escritas (/adicionar-saida) vêm por
+último para não invalidar o cache das leituras no meio da medição.
+O resultado vai para benchmarks/resultados/carga-<data>.json; --comparar
+mostra a diferença em relação a uma execução anterior.
+Execute: python -m benchmarks.dados_sinteticos --produtos 50000 --recebimentos 5000000
+         python -m benchmarks.carga --duracao 30 --concorrencia 50
+         python -m benchmarks.carga --comparar benchmarks/resultados/carga-20250101-120000.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal
+from app.core.paginacao import codificar_cursor
+from app.models import DimProduto, FactRecebimento, SaldoEstoque
+from benchmarks.dados_sinteticos import EMAIL_BENCHMARK, SENHA_BENCHMARK
+
+ENDPOINTS = ["login", "estoque", "saldos", "ver-catalogo", "telaInicial", "adicionar-saida"]
+RESULTADOS = Path(__file__).parent / "resultados"
+
+
+class Massa:
+    """Códigos e lotes da massa sintética usados para montar as requisições."""
+
+    def __init__(self, codigos: list[int], lotes: list[tuple], recebimentos: int):
+        self.codigos = codigos
+        self.lotes = lotes
+        self.recebimentos = recebimentos
+
+
+async def carregar_massa(args) -> Massa:
+    fim = args.codigo_inicial + args.produtos_maximo
+    async with SessionLocal() as db:
+        codigos = (await db.execute(
+            select(DimProduto.codigo).where(DimProduto.codigo.between(args.codigo_inicial, fim))
+        )).scalars().all()
+        # lotes com saldo de sobra, para as saídas da fase de escrita não esbarrarem em saldo zerado
+        lotes = (await db.execute(
+            select(SaldoEstoque.codigo, SaldoEstoque.lote, SaldoEstoque.fornecedor)
+            .where(SaldoEstoque.codigo.between(args.codigo_inicial, fim), SaldoEstoque.saldo >= 100)
+            .order_by(func.random())
+            .limit(5000)
+        )).all()
+        recebimentos = (await db.execute(
+            select(func.count()).select_from(FactRecebimento)
+            .where(FactRecebimento.codigo.between(args.codigo_inicial, fim))
+        )).scalar_one()
+    return Massa(list(codigos), [tuple(l) for l in lotes], recebimentos)
+
+
+def _listagem(caminho: str, massa: Massa) -> tuple:
+    # metade das páginas é a primeira, metade continua de um código qualquer (keyset)
+    params = {"limit": 100}
+    if random.random() < 0.5:
+        params["after"] = codificar_cursor((random.choice(massa.codigos),))
+    return "GET", caminho, params, None
+
+
+def requisicao(endpoint: str, massa: Massa) -> tuple:
+    """(método, caminho, query string, corpo JSON) de uma requisição sorteada do endpoint."""
+    if endpoint == "login":
+        return "POST", "/login", None, {"email": EMAIL_BENCHMARK, "senha": SENHA_BENCHMARK}
+    if endpoint == "estoque":
+        return _listagem("/estoque", massa)
+    if endpoint == "saldos":
+        return _listagem("/saldos", massa)
+    if endpoint == "ver-catalogo":
+        return _listagem("/ver-catalogo", massa)
+    if endpoint == "telaInicial":
+        # painel padrão (cacheado) misturado com gráficos por produto, que variam
+        if random.random() < 0.5:
+            return "GET", "/telaInicial", None, None
+        return "GET", "/telaInicial", {"codigo": random.choice(massa.codigos), "granularidade": "semana"}, None
+    if endpoint == "adicionar-saida":
+        codigo, lote, fornecedor = random.choice(massa.lotes)
+        return "POST", "/adicionar-saida", None, {
+            "fornecedor": fornecedor,
+            "codigo": codigo,
+            "quantidade": 1,
+            "numbLote": lote,
+            "data_saida": date.today().isoformat(),
+        }
+    raise ValueError(f"Endpoint desconhecido: {endpoint}")
+
+
+async def _cliente(cliente: httpx.AsyncClient, endpoint: str, massa: Massa, ate: float, latencias: list, status: Counter):
+    while time.perf_counter() < ate:
+        metodo, caminho, params, corpo = requisicao(endpoint, massa)
+        inicio = time.perf_counter()
+        try:
+            resposta = await cliente.request(metodo, caminho, params=params, json=corpo)
+            await resposta.aread()
+            status[resposta.status_code] += 1
+        except httpx.HTTPError as e:
+            status[type(e).__name__] += 1
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def fase(cliente: httpx.AsyncClient, endpoint: str, massa: Massa, args) -> dict:
+    # aquecimento: conexões do pool, statements preparados e caches, fora da medição
+    await asyncio.gather(*[
+        _cliente(cliente, endpoint, massa, time.perf_counter() + args.aquecimento, [], Counter())
+        for _ in range(args.concorrencia)
+    ])
+
+    latencias: list[float] = []
+    status: Counter = Counter()
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente(cliente, endpoint, massa, inicio + args.duracao, latencias, status)
+        for _ in range(args.concorrencia)
+    ])
+    duracao = time.perf_counter() - inicio
+
+    percentis = statistics.quantiles(latencias, n=100, method="inclusive") if len(latencias) > 1 else latencias * 99
+    erros = sum(n for s, n in status.items() if not (isinstance(s, int) and s < 400))
+    return {
+        "requisicoes": len(latencias),
+        "duracao_s": round(duracao, 2),
+        "vazao_rps": round(len(latencias) / duracao, 1),
+        "p50_ms": round(percentis[49] * 1000, 2),
+        "p95_ms": round(percentis[94] * 1000, 2),
+        "p99_ms": round(percentis[98] * 1000, 2),
+        "max_ms": round(max(latencias, default=0) * 1000, 2),
+        "erros": erros,
+        "status": {str(s): n for s, n in sorted(status.items(), key=lambda item: str(item[0]))},
+    }
+
+
+def imprimir(resultados: dict, anterior: dict | None):
+    print(f"{'endpoint':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'erros':>6}")
+    for endpoint, r in resultados.items():
+        print(f"{endpoint:<16} {r['vazao_rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['erros']:>6}")
+        antes = (anterior or {}).get(endpoint)
+        if antes:
+            variacao = lambda chave: (r[chave] - antes[chave]) / antes[chave] * 100 if antes[chave] else 0.0
+            print(f"{'  vs anterior':<16} {variacao('vazao_rps'):>+7.1f}% {variacao('p50_ms'):>+7.1f}% "
+                  f"{variacao('p95_ms'):>+7.1f}% {variacao('p99_ms'):>+7.1f}%")
+
+
+async def main(args):
+    random.seed(args.semente)
+    massa = await carregar_massa(args)
+    if not massa.codigos:
+        print("❌ Massa sintética não encontrada: rode antes python -m benchmarks.dados_sinteticos")
+        return 1
+    if "adicionar-saida" in args.endpoints and not massa.lotes:
+        print("❌ Nenhum lote da massa sintética com saldo para a fase de saídas")
+        return 1
+    print(f"massa: {len(massa.codigos)} produtos, {massa.recebimentos} recebimentos")
+
+    if args.url:
+        transporte = None
+        base_url = args.url
+    else:
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    resultados = {}
+    limites = httpx.Limits(max_connections=args.concorrencia)
+    async with httpx.AsyncClient(transport=transporte, base_url=base_url, timeout=60, limits=limites) as cliente:
+        for endpoint in args.endpoints:
+            print(f"→ {endpoint} ({args.duracao}s, {args.concorrencia} clientes)")
+            resultados[endpoint] = await fase(cliente, endpoint, massa, args)
+
+    anterior = None
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding="utf-8"))["endpoints"]
+    imprimir(resultados, anterior)
+
+    saida = Path(args.saida) if args.saida else RESULTADOS / f"carga-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps({
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "alvo": args.url or "in-process",
+        "concorrencia": args.concorrencia,
+        "duracao_s": args.duracao,
+        "massa": {"produtos": len(massa.codigos), "recebimentos": massa.recebimentos},
+        "endpoints": resultados,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"resultado salvo em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga de ponta a ponta sobre a massa sintética")
+    parser.add_argument("--url", default=None, help="URL de um servidor rodando; sem ela o app roda no mesmo processo")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--duracao", type=float, default=30, help="segundos medidos por endpoint")
+    parser.add_argument("--aquecimento", type=float, default=3, help="segundos de aquecimento antes de cada fase")
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--codigo-inicial", type=int, default=800_000_000, help="início da faixa da massa sintética")
+    parser.add_argument("--produtos-maximo", type=int, default=10_000_000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do resultado")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior para comparação")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,175 @@
+"""
+Gera uma massa de dados sintética de almoxarifado para os benchmarks, via
+COPY (asyncpg copy_records_to_table), e reconstrói saldos e movimento
+diário a partir dela. Os produtos ocupam uma faixa de códigos reservada
+(--codigo-inicial), então a massa pode ser removida sem tocar no resto.
+Cada recebimento gera no máximo uma saída posterior do mesmo lote, com
+parte da quantidade recebida: nenhum lote fica negativo.
+Execute: python -m benchmarks.dados_sinteticos --produtos 50000 --recebimentos 5000000
+         python -m benchmarks.dados_sinteticos --limpar
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import delete, text
+
+from app.core.database import SessionLocal, engine
+from app.core.estoque import recalcular_movimentos, recalcular_saldos
+from app.core.security import get_password_hash
+from app.models import DimProduto, FactCategoria, FactRecebimento, FactSaida
+from app.models.usuario import DimUsuario
+
+EMAIL_BENCHMARK = "benchmark.carga@exemplo.com"
+SENHA_BENCHMARK = "senha-benchmark"
+
+_NOMES = ["Parafuso", "Porca", "Arruela", "Luva", "Cabo", "Fita", "Caneta", "Papel", "Toner", "Lâmpada",
+          "Disjuntor", "Tomada", "Cola", "Tinta", "Pincel", "Broca", "Chave", "Martelo", "Alicate", "Trena"]
+_MODIFICADORES = ["inox", "zincado", "azul", "preto", "A4", "10mm", "20mm", "LED", "bivolt", "reforçado"]
+_FABRICANTES = ["Acme", "Tramontina", "Bic", "Faber", "Tigre", "Pial", "3M", "Vonder"]
+
+
+def _imagem_sintetica(tamanho: int) -> bytes:
+    # assinatura PNG + bytes aleatórios: só o tamanho importa para o benchmark
+    return b"\x89PNG\r\n\x1a\n" + random.randbytes(max(tamanho - 8, 0))
+
+
+def _produtos(args):
+    for i in range(args.produtos):
+        codigo = args.codigo_inicial + i
+        com_imagem = random.random() < args.fracao_imagens
+        yield (
+            codigo,
+            f"{random.choice(_NOMES)} {i}",
+            random.choice(_MODIFICADORES),
+            "Item sintético para benchmark",
+            random.choice(_FABRICANTES),
+            "un",
+            round(random.uniform(1, 500), 2),
+            random.random() < 0.1,
+            random.randint(1, 40),
+            random.randint(1, 20),
+            random.randint(1, 5),
+            round(random.uniform(1, 100), 1),
+            round(random.uniform(1, 100), 1),
+            round(random.uniform(1, 100), 1),
+            round(random.uniform(0.01, 30), 2),
+            None,
+            _imagem_sintetica(int(random.gauss(args.imagem_kb, args.imagem_kb / 4) * 1024)) if com_imagem else None,
+            "benchmarks.dados_sinteticos",
+        )
+
+
+def _categorias(args, ids_categoria: list[int]):
+    for i in range(args.produtos):
+        for idcategoria in random.sample(ids_categoria, k=random.randint(1, len(ids_categoria))):
+            yield (args.codigo_inicial + i, idcategoria)
+
+
+def _movimentos(args, recebimentos: list, saidas: list):
+    """Preenche as listas em blocos; chamado até atingir --recebimentos."""
+    hoje = date.today()
+    codigo = args.codigo_inicial + random.randrange(args.produtos)
+    indice_lote = random.randrange(args.lotes_por_produto)
+    lote = f"L{indice_lote}"
+    fornecedor = f"Fornecedor {indice_lote % 7}"
+    data_receb = hoje - timedelta(days=random.randrange(args.dias))
+    validade = data_receb + timedelta(days=random.randint(30, 720)) if random.random() < 0.8 else None
+    quant = random.randint(10, 500)
+    recebimentos.append((data_receb, quant, codigo, validade, round(random.uniform(1, 300), 2), lote, fornecedor))
+    if random.random() < args.fracao_saidas:
+        dias_depois = random.randint(0, max((hoje - data_receb).days, 0))
+        saidas.append((data_receb + timedelta(days=dias_depois), random.randint(1, quant), codigo, lote, fornecedor))
+
+
+async def limpar(args):
+    fim = args.codigo_inicial + args.produtos_maximo
+    async with SessionLocal() as db:
+        faixa = lambda coluna: coluna.between(args.codigo_inicial, fim)
+        await db.execute(delete(FactSaida).where(faixa(FactSaida.codigo)))
+        await db.execute(delete(FactRecebimento).where(faixa(FactRecebimento.codigo)))
+        await db.execute(delete(FactCategoria).where(faixa(FactCategoria.codigo)))
+        await db.execute(delete(DimProduto).where(faixa(DimProduto.codigo)))
+        await db.execute(delete(DimUsuario).where(DimUsuario.email == EMAIL_BENCHMARK))
+        await db.commit()
+    print("Massa sintética removida")
+
+
+async def gerar(args):
+    random.seed(args.semente)
+    await limpar(args)
+
+    async with engine.connect() as conn:
+        # conexão asyncpg por baixo do SQLAlchemy, fora de transação: cada COPY é confirmado sozinho
+        bruta = (await conn.get_raw_connection()).driver_connection
+        ids_categoria = [r["idcategoria"] for r in await bruta.fetch("SELECT idcategoria FROM dimcategoria")]
+
+        inicio = time.perf_counter()
+        await bruta.copy_records_to_table(
+            "dimproduto",
+            columns=["codigo", "nome_basico", "nome_modificador", "descricao_tecnica", "fabricante", "unidade",
+                     "preco_de_venda", "fragilidade", "rua", "coluna", "andar", "altura", "largura",
+                     "profundidade", "peso", "observacoes_adicional", "imagem", "inserido_por"],
+            records=_produtos(args),
+        )
+        if ids_categoria:
+            await bruta.copy_records_to_table(
+                "factcategoria", columns=["codigo", "idcategoria"], records=_categorias(args, ids_categoria)
+            )
+        print(f"{args.produtos} produtos em {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        total_receb = total_saidas = 0
+        while total_receb < args.recebimentos:
+            recebimentos, saidas = [], []
+            bloco = min(args.bloco, args.recebimentos - total_receb)
+            while len(recebimentos) < bloco:
+                _movimentos(args, recebimentos, saidas)
+            await bruta.copy_records_to_table(
+                "factrecebimento",
+                columns=["data_receb", "quant", "codigo", "validade", "preco_de_aquisicao", "lote", "fornecedor"],
+                records=recebimentos,
+            )
+            await bruta.copy_records_to_table(
+                "factsaidas", columns=["data_saida", "quant", "codigo", "lote", "fornecedor"], records=saidas
+            )
+            total_receb += len(recebimentos)
+            total_saidas += len(saidas)
+            print(f"  {total_receb}/{args.recebimentos} recebimentos, {total_saidas} saídas "
+                  f"({time.perf_counter() - inicio:.0f}s)")
+
+    inicio = time.perf_counter()
+    async with SessionLocal() as db:
+        await recalcular_saldos(db)
+        await recalcular_movimentos(db)
+        db.add(DimUsuario(
+            email=EMAIL_BENCHMARK,
+            nome="Usuário benchmark",
+            senha=get_password_hash(SENHA_BENCHMARK),
+            inserido_por="benchmarks.dados_sinteticos",
+        ))
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+    print(f"Saldos e movimento diário reconstruídos em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Massa de dados sintética para benchmarks")
+    parser.add_argument("--produtos", type=int, default=50_000)
+    parser.add_argument("--recebimentos", type=int, default=5_000_000)
+    parser.add_argument("--fracao-saidas", type=float, default=1.0, help="fração dos recebimentos que gera uma saída")
+    parser.add_argument("--lotes-por-produto", type=int, default=20)
+    parser.add_argument("--dias", type=int, default=730, help="histórico gerado, em dias até hoje")
+    parser.add_argument("--fracao-imagens", type=float, default=0.3, help="fração dos produtos com imagem")
+    parser.add_argument("--imagem-kb", type=int, default=120, help="tamanho médio das imagens")
+    parser.add_argument("--codigo-inicial", type=int, default=800_000_000, help="início da faixa reservada de códigos")
+    parser.add_argument("--produtos-maximo", type=int, default=10_000_000, help="tamanho da faixa apagada por --limpar")
+    parser.add_argument("--bloco", type=int, default=200_000, help="linhas por COPY")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true", help="apenas remove a massa sintética")
+    args = parser.parse_args()
+    asyncio.run(limpar(args) if args.limpar else gerar(args))
@@ -0,0 +1,142 @@
+"""
+Teste de estresse de /adicionar-saida: dispara saídas concorrentes contra um
+mesmo lote e confere que o saldo nunca fica negativo (sem overselling).
+Com --lotes N as saídas são distribuídas entre N lotes do mesmo produto,
+mostrando que a trava é por lote e não serializa o produto inteiro.
+Execute: python -m benchmarks.estresse_saidas --concorrencia 200 --requisicoes 2000
+         python -m benchmarks.estresse_saidas --url http://localhost:8000  (servidor já rodando)
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+import httpx
+from sqlalchemy import delete, func, select
+
+from app.core.database import SessionLocal
+from app.core.estoque import registrar_recebimento
+from app.models import DimProduto, FactRecebimento, FactSaida, SaldoEstoque
+
+LOTE = "ESTRESSE"
+FORNECEDOR = "Fornecedor Estresse"
+
+
+def nome_lote(indice: int) -> str:
+    return f"{LOTE}-{indice}"
+
+
+async def preparar(codigo: int, estoque: int, lotes: int):
+    async with SessionLocal() as db:
+        await limpar(db, codigo)
+        db.add(DimProduto(
+            codigo=codigo,
+            nome_basico="Produto estresse",
+            nome_modificador="benchmark",
+            inserido_por="benchmarks.estresse_saidas",
+        ))
+        await db.flush()
+        for indice in range(lotes):
+            db.add(FactRecebimento(
+                data_receb=date.today(), quant=estoque, codigo=codigo, validade=None,
+                preco_de_aquisicao=1, lote=nome_lote(indice), fornecedor=FORNECEDOR,
+            ))
+            await registrar_recebimento(db, codigo, nome_lote(indice), FORNECEDOR, estoque, date.today(), None)
+        await db.commit()
+
+
+async def limpar(db, codigo: int):
+    await db.execute(delete(FactSaida).where(FactSaida.codigo == codigo))
+    await db.execute(delete(FactRecebimento).where(FactRecebimento.codigo == codigo))
+    await db.execute(delete(DimProduto).where(DimProduto.codigo == codigo))
+    await db.commit()
+
+
+async def disparar(cliente: httpx.AsyncClient, codigo: int, lote: str, quantidade: int, semaforo: asyncio.Semaphore, latencias: list):
+    corpo = {
+        "fornecedor": FORNECEDOR,
+        "codigo": codigo,
+        "quantidade": quantidade,
+        "numbLote": lote,
+        "data_saida": date.today().isoformat(),
+    }
+    async with semaforo:
+        inicio = time.perf_counter()
+        resposta = await cliente.post("/adicionar-saida", json=corpo)
+        latencias.append(time.perf_counter() - inicio)
+        return resposta.status_code
+
+
+async def main(args):
+    await preparar(args.codigo, args.estoque, args.lotes)
+
+    if args.url:
+        transporte = None
+        base_url = args.url
+    else:
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    semaforo = asyncio.Semaphore(args.concorrencia)
+    latencias: list[float] = []
+    limites = httpx.Limits(max_connections=args.concorrencia)
+    async with httpx.AsyncClient(transport=transporte, base_url=base_url, timeout=60, limits=limites) as cliente:
+        inicio = time.perf_counter()
+        status = await asyncio.gather(*[
+            disparar(cliente, args.codigo, nome_lote(i % args.lotes), args.quantidade, semaforo, latencias)
+            for i in range(args.requisicoes)
+        ])
+        duracao = time.perf_counter() - inicio
+
+    async with SessionLocal() as db:
+        total_saidas = (await db.execute(
+            select(func.coalesce(func.sum(FactSaida.quant), 0)).where(FactSaida.codigo == args.codigo)
+        )).scalar_one()
+        saldos = (await db.execute(
+            select(SaldoEstoque.saldo).where(SaldoEstoque.codigo == args.codigo)
+        )).scalars().all()
+        if not args.manter:
+            await limpar(db, args.codigo)
+
+    sucessos = status.count(200)
+    recusadas = status.count(400)
+    outros = len(status) - sucessos - recusadas
+    saldo = sum(saldos)
+    estoque_total = args.estoque * args.lotes
+    # cada lote aceita no máximo estoque // quantidade saídas das requisições que recebeu
+    por_lote = [len(range(i, args.requisicoes, args.lotes)) for i in range(args.lotes)]
+    esperado = sum(min(n, args.estoque // args.quantidade) for n in por_lote)
+    latencias.sort()
+
+    print(f"requisições: {len(status)}  concorrência: {args.concorrencia}  lotes: {args.lotes}")
+    print(f"aceitas: {sucessos}  recusadas (sem saldo): {recusadas}  outros status: {outros}")
+    print(f"estoque inicial: {estoque_total}  total baixado: {total_saidas}  saldo final: {saldo}")
+    print(f"duração: {duracao:.2f}s  vazão: {len(status) / duracao:.0f} req/s  ({sucessos / duracao:.0f} saídas/s)")
+    print(f"latência p50: {statistics.median(latencias) * 1000:.1f} ms  "
+          f"p99: {latencias[int(len(latencias) * 0.99) - 1] * 1000:.1f} ms")
+
+    ok = (
+        outros == 0
+        and min(saldos) >= 0
+        and total_saidas == sucessos * args.quantidade
+        and saldo == estoque_total - total_saidas
+        and sucessos == esperado
+    )
+    print("✅ sem overselling" if ok else "❌ inconsistência detectada")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estresse de saídas concorrentes em um único lote")
+    parser.add_argument("--url", default=None, help="URL de um servidor rodando; sem ela o app roda no mesmo processo")
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--estoque", type=int, default=1000, help="quantidade recebida em cada lote de teste")
+    parser.add_argument("--lotes", type=int, default=1, help="número de lotes entre os quais as saídas se dividem")
+    parser.add_argument("--quantidade", type=int, default=1, help="quantidade de cada saída")
+    parser.add_argument("--codigo", type=int, default=990_000_001, help="código do produto de teste")
+    parser.add_argument("--manter", action="store_true", help="não apaga o produto de teste ao final")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,266 @@
+"""
+Teste de carga de GET /eventos/estoque: conecta --clientes streams SSE a um
+servidor rodando (o LISTEN do Postgres sobe no startup do app, por isso não
+há modo no mesmo processo), dispara --saidas saídas em sequência num lote de
+teste, a --taxa por segundo, e mede a latência entre o envio de cada saída e
+a chegada do evento em cada cliente, além de eventos perdidos.
+
+--lentos N abre mais N streams com buffer de recepção mínimo que nunca são
+lidos: com --rajada (recebimentos em lote, um evento por lote novo) a fila
+deles no servidor enche e eles devem receber "ressincronizar" (ou ser
+desconectados) sem atrasar nem fazer perder eventos dos clientes normais.
+Clientes e servidor dividem a máquina, então a latência inclui o custo do
+próprio teste. O resultado vai para benchmarks/resultados/eventos-<data>.json.
+Execute: uvicorn app.main:app --port 8000 --timeout-graceful-shutdown 10
+         python -m benchmarks.eventos --clientes 1000 --saidas 200 --taxa 20
+         python -m benchmarks.eventos --clientes 1000 --lentos 20 --rajada 4000 --rajadas 5
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import socket
+import statistics
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.database import SessionLocal
+from app.core.estoque import registrar_recebimento
+from app.models import DimProduto, FactRecebimento, FactSaida
+
+RESULTADOS = Path(__file__).parent / "resultados"
+LOTE = "EVENTOS"
+FORNECEDOR = "Fornecedor Eventos"
+
+
+class Cliente:
+    def __init__(self):
+        self.conectado = asyncio.Event()
+        self.chegadas: dict[int, float] = {}  # saldo do lote de teste -> instante de chegada
+        self.ressincronizacoes = 0
+        self.eventos = 0
+        self.encerrado = False
+
+
+async def preparar(codigo: int, estoque: int):
+    async with SessionLocal() as db:
+        await limpar(db, codigo)
+        db.add(DimProduto(
+            codigo=codigo,
+            nome_basico="Produto eventos",
+            nome_modificador="benchmark",
+            inserido_por="benchmarks.eventos",
+        ))
+        await db.flush()
+        db.add(FactRecebimento(
+            data_receb=date.today(), quant=estoque, codigo=codigo, validade=None,
+            preco_de_aquisicao=1, lote=LOTE, fornecedor=FORNECEDOR,
+        ))
+        await registrar_recebimento(db, codigo, LOTE, FORNECEDOR, estoque, date.today(), None)
+        await db.commit()
+
+
+async def limpar(db, codigo: int):
+    await db.execute(delete(FactSaida).where(FactSaida.codigo == codigo))
+    await db.execute(delete(FactRecebimento).where(FactRecebimento.codigo == codigo))
+    await db.execute(delete(DimProduto).where(DimProduto.codigo == codigo))
+    await db.commit()
+
+
+async def escutar(http: httpx.AsyncClient, cliente: Cliente, params: dict):
+    try:
+        async with http.stream("GET", "/eventos/estoque", params=params) as resposta:
+            tipo = None
+            async for linha in resposta.aiter_lines():
+                if linha.startswith("retry:"):
+                    cliente.conectado.set()
+                elif linha.startswith("event: "):
+                    tipo = linha[7:]
+                elif linha.startswith("data: "):
+                    cliente.eventos += 1
+                    if tipo == "ressincronizar":
+                        cliente.ressincronizacoes += 1
+                    elif tipo == "saldo":
+                        evento = json.loads(linha[6:])
+                        if evento["lote"] == LOTE:
+                            cliente.chegadas.setdefault(evento["saldo"], time.perf_counter())
+    except (httpx.HTTPError, asyncio.CancelledError):
+        pass
+    finally:
+        cliente.encerrado = True
+        cliente.conectado.set()
+
+
+async def escutar_sem_ler(http: httpx.AsyncClient, cliente: Cliente, params: dict, parar: asyncio.Event):
+    """Cliente lento: recebe o início do stream e para de ler até o fim do teste."""
+    try:
+        async with http.stream("GET", "/eventos/estoque", params=params) as resposta:
+            linhas = resposta.aiter_lines()
+            await linhas.__anext__()
+            cliente.conectado.set()
+            await parar.wait()
+            async for linha in linhas:
+                if linha.startswith("event: ressincronizar"):
+                    cliente.ressincronizacoes += 1
+    except (httpx.HTTPError, asyncio.CancelledError, StopAsyncIteration):
+        pass
+    finally:
+        cliente.encerrado = True
+        cliente.conectado.set()
+
+
+async def metricas_sse(http: httpx.AsyncClient) -> dict:
+    texto = (await http.get("/metrics")).text
+    return {
+        linha.split()[0]: float(linha.split()[1])
+        for linha in texto.splitlines()
+        if linha.startswith("sse_")
+    }
+
+
+async def main(args):
+    # cada stream é um socket no cliente
+    _, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (maximo, maximo))
+
+    await preparar(args.codigo, args.saidas + 10)
+    params = {"codigo": args.codigo} if args.filtrar else {}
+
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    tempo = httpx.Timeout(60, read=None)
+    lentos_transporte = httpx.AsyncHTTPTransport(
+        socket_options=[(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)], limits=limites
+    )
+    async with httpx.AsyncClient(base_url=args.url, timeout=tempo, limits=limites) as http, \
+            httpx.AsyncClient(base_url=args.url, timeout=tempo, transport=lentos_transporte) as http_lentos:
+        clientes = [Cliente() for _ in range(args.clientes)]
+        lentos = [Cliente() for _ in range(args.lentos)]
+        parar_lentos = asyncio.Event()
+
+        inicio = time.perf_counter()
+        tarefas = [asyncio.create_task(escutar(http, c, params)) for c in clientes]
+        tarefas += [asyncio.create_task(escutar_sem_ler(http_lentos, c, params, parar_lentos)) for c in lentos]
+        await asyncio.gather(*[c.conectado.wait() for c in clientes + lentos])
+        conexao = time.perf_counter() - inicio
+        conectados = sum(not c.encerrado for c in clientes)
+        print(f"{conectados}/{len(clientes)} clientes (+{len(lentos)} lentos) conectados em {conexao:.2f}s")
+        print(f"servidor: {await metricas_sse(http)}")
+
+        # saídas em sequência: o saldo depois de cada uma identifica o evento
+        enviados: dict[int, float] = {}
+        saldo = args.saidas + 10
+        intervalo = 1 / args.taxa
+        proxima = time.perf_counter()
+        for _ in range(args.saidas):
+            await asyncio.sleep(max(0.0, proxima - time.perf_counter()))
+            proxima += intervalo
+            saldo -= 1
+            enviados[saldo] = time.perf_counter()
+            resposta = await http.post("/adicionar-saida", json={
+                "fornecedor": FORNECEDOR, "codigo": args.codigo, "quantidade": 1,
+                "numbLote": LOTE, "data_saida": date.today().isoformat(),
+            })
+            resposta.raise_for_status()
+
+        rajada_s = None
+        if args.rajada:
+            # recebimentos em lotes novos: um evento por lote, todos no commit do lote
+            inicio = time.perf_counter()
+            for r in range(args.rajadas):
+                linhas = [{
+                    "data_receb": date.today().isoformat(), "quant": 1, "codigo": args.codigo, "validade": None,
+                    "preco_de_aquisicao": 1, "lote": f"{LOTE}-{r}-{i}", "fornecedor": FORNECEDOR,
+                } for i in range(args.rajada)]
+                resposta = await http.post("/adicionar-recebimentos/lote", json=linhas)
+                resposta.raise_for_status()
+            rajada_s = time.perf_counter() - inicio
+
+        # espera os últimos eventos chegarem
+        esperado = set(enviados)
+        limite = time.perf_counter() + args.espera
+        while time.perf_counter() < limite:
+            if all(esperado <= c.chegadas.keys() for c in clientes if not c.encerrado) and not args.rajada:
+                break
+            await asyncio.sleep(0.1)
+        servidor = await metricas_sse(http)
+
+        parar_lentos.set()
+        await asyncio.sleep(1)
+        # antes do cancelamento: só os streams que o servidor encerrou
+        lentos_desconectados = sum(c.encerrado for c in lentos)
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async with SessionLocal() as db:
+        if not args.manter:
+            await limpar(db, args.codigo)
+
+    latencias = sorted(
+        (c.chegadas[s] - enviados[s]) * 1000
+        for c in clientes for s in enviados if s in c.chegadas
+    )
+    perdidos = sum(len(esperado - c.chegadas.keys()) for c in clientes)
+    def p(q):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * q))] if latencias else None
+
+    resultado = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "url": args.url,
+        "clientes": args.clientes,
+        "conectados": conectados,
+        "lentos": args.lentos,
+        "filtro_por_codigo": args.filtrar,
+        "conexao_s": round(conexao, 3),
+        "saidas": args.saidas,
+        "taxa": args.taxa,
+        "entregas_esperadas": len(esperado) * conectados,
+        "entregas": len(latencias),
+        "perdidos": perdidos,
+        "latencia_ms": {
+            "p50": round(statistics.median(latencias), 1) if latencias else None,
+            "p95": round(p(0.95), 1) if latencias else None,
+            "p99": round(p(0.99), 1) if latencias else None,
+            "max": round(latencias[-1], 1) if latencias else None,
+        },
+        "rajada": {"lotes": args.rajada * args.rajadas, "envio_s": round(rajada_s, 3)} if args.rajada else None,
+        "ressincronizacoes_clientes": sum(c.ressincronizacoes for c in clientes),
+        "ressincronizacoes_lentos": sum(c.ressincronizacoes for c in lentos),
+        "lentos_desconectados": lentos_desconectados,
+        "servidor": servidor,
+    }
+    print(f"entregas: {resultado['entregas']}/{resultado['entregas_esperadas']}  perdidas: {perdidos}")
+    print(f"latência envio -> evento: {resultado['latencia_ms']}")
+    print(f"ressincronizações: clientes {resultado['ressincronizacoes_clientes']}  lentos {resultado['ressincronizacoes_lentos']}"
+          f"  lentos desconectados: {resultado['lentos_desconectados']}")
+    print(f"servidor: {servidor}")
+
+    saida = Path(args.saida) if args.saida else RESULTADOS / f"eventos-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"resultado salvo em {saida}")
+    ok = perdidos == 0 and conectados == args.clientes and resultado["ressincronizacoes_clientes"] == 0
+    print("✅ todos os eventos entregues" if ok else "❌ eventos perdidos, clientes não conectados ou ressincronizados")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga de clientes SSE em /eventos/estoque")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL do servidor rodando")
+    parser.add_argument("--clientes", type=int, default=1000)
+    parser.add_argument("--lentos", type=int, default=0, help="streams extras que nunca são lidos")
+    parser.add_argument("--saidas", type=int, default=200)
+    parser.add_argument("--taxa", type=float, default=20, help="saídas por segundo")
+    parser.add_argument("--rajada", type=int, default=0, help="lotes por recebimento em lote (até 5000)")
+    parser.add_argument("--rajadas", type=int, default=1)
+    parser.add_argument("--espera", type=float, default=10, help="segundos de espera pelos últimos eventos")
+    parser.add_argument("--filtrar", action="store_true", help="clientes assinam só o produto de teste (?codigo=)")
+    parser.add_argument("--codigo", type=int, default=990_000_002, help="código do produto de teste")
+    parser.add_argument("--manter", action="store_true", help="não apaga o produto de teste ao final")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do resultado")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
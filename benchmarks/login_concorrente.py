@@ -0,0 +1,129 @@
+"""
+Mede o impacto do bcrypt de /login nas demais rotas: enquanto N logins
+concorrentes rodam em ciclo, uma rota sem relação (padrão /api/ver_categorias)
+é consultada continuamente e a latência p50/p99 é comparada com a medida
+sem logins em andamento.
+Com --sincrono (apenas no mesmo processo) o hash volta a rodar dentro do
+event loop, reproduzindo o comportamento anterior para comparação.
+Execute: python -m benchmarks.login_concorrente --logins 50
+         python -m benchmarks.login_concorrente --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.database import SessionLocal
+from app.core.security import get_password_hash
+from app.models.usuario import DimUsuario
+
+EMAIL = "benchmark.login@exemplo.com"
+SENHA = "senha-benchmark"
+
+
+async def preparar():
+    async with SessionLocal() as db:
+        await db.execute(delete(DimUsuario).where(DimUsuario.email == EMAIL))
+        db.add(DimUsuario(
+            email=EMAIL,
+            nome="Usuário benchmark",
+            senha=get_password_hash(SENHA),
+            inserido_por="benchmarks.login_concorrente",
+        ))
+        await db.commit()
+
+
+async def limpar():
+    async with SessionLocal() as db:
+        await db.execute(delete(DimUsuario).where(DimUsuario.email == EMAIL))
+        await db.commit()
+
+
+def percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * p), len(valores) - 1)] * 1000
+
+
+async def sondar(cliente: httpx.AsyncClient, rota: str, duracao: float, intervalo: float) -> list[float]:
+    latencias = []
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        resposta = await cliente.get(rota)
+        resposta.raise_for_status()
+        latencias.append(time.perf_counter() - inicio)
+        await asyncio.sleep(intervalo)
+    return latencias
+
+
+async def logins_em_ciclo(cliente: httpx.AsyncClient, parar: asyncio.Event, contagem: dict):
+    while not parar.is_set():
+        resposta = await cliente.post("/login", json={"email": EMAIL, "senha": SENHA})
+        contagem[resposta.status_code] = contagem.get(resposta.status_code, 0) + 1
+
+
+def resumo(titulo: str, latencias: list[float]):
+    print(f"{titulo:<22} amostras: {len(latencias):>5}  "
+          f"p50: {statistics.median(latencias) * 1000:7.1f} ms  p99: {percentil(latencias, 0.99):7.1f} ms")
+
+
+async def main(args):
+    await preparar()
+
+    if args.url:
+        transporte = None
+        base_url = args.url
+    else:
+        from app.main import app
+        if args.sincrono:
+            from app.core.security import verify_password
+            from app.routers import auth
+
+            async def verificar_no_loop(senha, hash_senha):
+                return verify_password(senha, hash_senha)
+
+            auth.verificar_senha = verificar_no_loop
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    limites = httpx.Limits(max_connections=args.logins + 5)
+    async with httpx.AsyncClient(transport=transporte, base_url=base_url, timeout=120, limits=limites) as cliente:
+        # aquece o pool de conexões antes de medir
+        await sondar(cliente, args.rota, 0.5, args.intervalo)
+        base = await sondar(cliente, args.rota, args.duracao, args.intervalo)
+
+        parar = asyncio.Event()
+        contagem: dict[int, int] = {}
+        tarefas = [asyncio.create_task(logins_em_ciclo(cliente, parar, contagem)) for _ in range(args.logins)]
+        sob_carga = await sondar(cliente, args.rota, args.duracao, args.intervalo)
+        parar.set()
+        await asyncio.gather(*tarefas)
+
+        metricas = None
+        if not args.sincrono:
+            metricas = (await cliente.get("/metrics/auth")).json()
+
+    await limpar()
+
+    print(f"rota sondada: {args.rota}  logins concorrentes: {args.logins}  "
+          f"modo: {'hash no event loop' if args.sincrono else 'pool de threads'}")
+    resumo("sem logins", base)
+    resumo("durante os logins", sob_carga)
+    print(f"logins concluídos: {sum(contagem.values())}  status: {contagem}")
+    if metricas:
+        print(f"pool bcrypt: {metricas['bcrypt']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência de rotas comuns durante logins concorrentes")
+    parser.add_argument("--url", default=None, help="URL de um servidor rodando; sem ela o app roda no mesmo processo")
+    parser.add_argument("--logins", type=int, default=50, help="logins simultâneos em ciclo")
+    parser.add_argument("--rota", default="/api/ver_categorias", help="rota sem relação com autenticação a ser sondada")
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos de sondagem em cada fase")
+    parser.add_argument("--intervalo", type=float, default=0.01, help="pausa entre sondagens, em segundos")
+    parser.add_argument("--sincrono", action="store_true", help="roda o bcrypt no event loop (comportamento antigo)")
+    asyncio.run(main(parser.parse_args()))
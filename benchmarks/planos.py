@@ -0,0 +1,234 @@
+"""
+Regressão de planos das consultas quentes dos routers: compila cada
+consulta como o app faz, roda EXPLAIN (ANALYZE, BUFFERS) sobre a massa de
+benchmarks.dados_sinteticos e compara com a referência salva em
+benchmarks/planos_referencia.json (impressão digital do plano e tempo),
+versionada junto com o código e gerada sobre a massa padrão abaixo.
+Falha (código de saída 1) quando uma consulta passa a fazer Seq Scan numa
+tabela de fatos ou estoura o orçamento de tempo; mudança de plano e tempo
+acima de --tolerancia vezes a referência são avisos (ou falhas, com --estrito).
+Tudo roda numa transação desfeita ao final: o EXPLAIN ANALYZE da saída
+executa o comando de verdade, mas nada fica gravado.
+Execute: python -m benchmarks.dados_sinteticos --produtos 50000 --recebimentos 5000000
+         python -m benchmarks.planos --atualizar   (grava a referência; recusa se houver falhas)
+         python -m benchmarks.planos
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from app.core.database import engine
+from app.core.estoque import get_baixa_saldo_query
+from app.core.paginacao import Pagina, codificar_cursor, paginar
+from app.models import DimProduto, FactRecebimento, MovimentoDiario, SaldoEstoque
+from app.routers.chart import get_movimentacoes_query, get_produtos_query
+from app.routers.estoque import get_catalogo_query
+from app.routers.produtos import get_busca_query
+from app.routers.saidas import get_lotes_query, get_lotes_vencendo_query
+from app.routers.saldos import get_saldos_query
+
+REFERENCIA = Path(__file__).parent / "planos_referencia.json"
+
+# tabelas que crescem com o histórico: um Seq Scan nelas é regressão, salvo nas consultas que as agregam inteiras
+TABELAS_FATO = {"factrecebimento", "factsaidas", "factcategoria", "saldoestoque", "movimentodiario"}
+
+
+class Consulta:
+    def __init__(self, nome: str, montar, orcamento_ms: float, seq_scan_permitido: frozenset = frozenset()):
+        self.nome = nome
+        self.montar = montar
+        self.orcamento_ms = orcamento_ms
+        self.seq_scan_permitido = seq_scan_permitido
+
+
+class Amostra:
+    """Parâmetros reais tirados da massa: o produto com mais recebimentos e um lote dele com saldo."""
+
+    def __init__(self, codigo: int, lote: str, fornecedor: str | None, codigos_pagina: list[int], ultimo_dia: date):
+        self.codigo = codigo
+        self.lote = lote
+        self.fornecedor = fornecedor
+        self.codigos_pagina = codigos_pagina
+        self.ultimo_dia = ultimo_dia
+
+
+def _pagina(apos: int) -> Pagina:
+    return Pagina(limit=100, after=codificar_cursor((apos,)))
+
+
+CONSULTAS = [
+    Consulta("saldos_pagina", lambda a: get_saldos_query()
+             .where(DimProduto.codigo.in_(a.codigos_pagina)).order_by(DimProduto.codigo), 50),
+    Consulta("saldos_produto", lambda a: get_saldos_query().where(DimProduto.codigo == a.codigo), 20),
+    Consulta("catalogo_pagina", lambda a: paginar(get_catalogo_query(), [DimProduto.codigo], _pagina(a.codigos_pagina[0])),
+             200, frozenset({"saldoestoque"})),
+    Consulta("tela_inicial_produtos", lambda a: get_produtos_query(), 2000, frozenset({"saldoestoque"})),
+    Consulta("tela_inicial_produto", lambda a: get_produtos_query(a.codigo), 20),
+    # o gráfico geral soma um ano inteiro do movimento diário; a resposta fica no cache de /telaInicial
+    Consulta("tela_inicial_movimentos_ano", lambda a: get_movimentacoes_query(
+        a.ultimo_dia - timedelta(days=364), a.ultimo_dia, "dia"), 3000, frozenset({"movimentodiario"})),
+    Consulta("tela_inicial_movimentos_produto", lambda a: get_movimentacoes_query(
+        a.ultimo_dia - timedelta(days=364), a.ultimo_dia, "semana", a.codigo), 50),
+    Consulta("busca_produtos", lambda a: get_busca_query("parafuso inox", Pagina(limit=100, after=None)), 50),
+    Consulta("lotes", lambda a: get_lotes_query(a.codigo, a.fornecedor), 20),
+    Consulta("lotes_produto", lambda a: get_lotes_query(a.codigo, ocultar_vazios=True), 20),
+    Consulta("lotes_vencendo", lambda a: get_lotes_vencendo_query(a.ultimo_dia, a.ultimo_dia + timedelta(days=30), 2001), 50),
+    Consulta("adicionar_saida", lambda a: get_baixa_saldo_query(a.codigo, a.lote, a.fornecedor, 1, date.today()), 20),
+]
+
+
+async def carregar_amostra(conn, args) -> Amostra | None:
+    fim = args.codigo_inicial + args.produtos_maximo
+    codigo = (await conn.execute(
+        select(FactRecebimento.codigo)
+        .where(FactRecebimento.codigo.between(args.codigo_inicial, fim))
+        .group_by(FactRecebimento.codigo)
+        .order_by(func.count().desc())
+        .limit(1)
+    )).scalar()
+    if codigo is None:
+        return None
+    lote = (await conn.execute(
+        select(SaldoEstoque.lote, SaldoEstoque.fornecedor)
+        .where(SaldoEstoque.codigo == codigo)
+        .order_by(SaldoEstoque.saldo.desc())
+        .limit(1)
+    )).first()
+    meio = args.codigo_inicial + (await conn.execute(
+        select(func.count()).select_from(DimProduto).where(DimProduto.codigo.between(args.codigo_inicial, fim))
+    )).scalar_one() // 2
+    codigos_pagina = (await conn.execute(
+        select(DimProduto.codigo).where(DimProduto.codigo >= meio).order_by(DimProduto.codigo).limit(100)
+    )).scalars().all()
+    ultimo_dia = (await conn.execute(select(func.max(MovimentoDiario.dia)))).scalar() or date.today()
+    return Amostra(codigo, lote.lote, lote.fornecedor, list(codigos_pagina), ultimo_dia)
+
+
+def impressao_digital(no: dict) -> str:
+    """Forma do plano (tipos de nó, tabelas e índices), sem custos nem linhas estimadas."""
+    partes = [no["Node Type"]]
+    for chave in ("Join Type", "Relation Name", "Index Name", "Strategy"):
+        if chave in no:
+            partes.append(f"{chave}={no[chave]}")
+    filhos = ",".join(impressao_digital(filho) for filho in no.get("Plans", []))
+    return "(" + " ".join(partes) + (" [" + filhos + "]" if filhos else "") + ")"
+
+
+def seq_scans(no: dict) -> set[str]:
+    tabelas = {no["Relation Name"]} if no["Node Type"] == "Seq Scan" else set()
+    for filho in no.get("Plans", []):
+        tabelas |= seq_scans(filho)
+    return tabelas
+
+
+def buffers(no: dict) -> int:
+    return no.get("Shared Hit Blocks", 0) + no.get("Shared Read Blocks", 0)
+
+
+async def explicar(conn, statement, repeticoes: int) -> tuple[dict, float]:
+    """Plano da última execução e mediana do tempo de execução das repetições, em ms."""
+    compilado = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    parametros = tuple(compilado.params[nome] for nome in compilado.positiontup or ())
+    tempos = []
+    for _ in range(repeticoes):
+        # savepoint por repetição: as saídas executadas pelo ANALYZE não se acumulam entre elas
+        async with conn.begin_nested() as savepoint:
+            # sem o tempo por nó (não é usado): a medição de cada linha inflava o total
+            # das agregações grandes bem acima do tempo que o app vê
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, TIMING OFF, BUFFERS, FORMAT JSON) " + str(compilado), parametros
+            )
+            plano = result.scalar()
+            await savepoint.rollback()
+        plano = (json.loads(plano) if isinstance(plano, str) else plano)[0]
+        tempos.append(plano["Execution Time"] + plano.get("Planning Time", 0))
+    return plano, statistics.median(tempos)
+
+
+async def main(args):
+    if not REFERENCIA.exists() and not args.atualizar:
+        print(f"⚠️  {REFERENCIA.name} não encontrada: mudanças de plano e de tempo não serão comparadas")
+    referencia = json.loads(REFERENCIA.read_text(encoding="utf-8")) if REFERENCIA.exists() else {}
+    consultas = [c for c in CONSULTAS if not args.consultas or c.nome in args.consultas]
+    resultados = {}
+    falhas, avisos = [], []
+
+    async with engine.connect() as conn:
+        transacao = await conn.begin()
+        amostra = await carregar_amostra(conn, args)
+        if amostra is None:
+            print("❌ Massa sintética não encontrada: rode antes python -m benchmarks.dados_sinteticos")
+            return 1
+
+        for consulta in consultas:
+            plano, ms = await explicar(conn, consulta.montar(amostra), args.repeticoes)
+            raiz = plano["Plan"]
+            digital = impressao_digital(raiz)
+            resultados[consulta.nome] = {
+                "impressao_digital": hashlib.sha1(digital.encode()).hexdigest()[:16],
+                "forma": digital,
+                "ms": round(ms, 3),
+                "buffers": buffers(raiz),
+            }
+
+            problemas = []
+            proibidos = (seq_scans(raiz) & TABELAS_FATO) - consulta.seq_scan_permitido
+            if proibidos:
+                falhas.append(f"{consulta.nome}: Seq Scan em {', '.join(sorted(proibidos))}")
+                problemas.append("seq scan")
+            orcamento = consulta.orcamento_ms * args.fator_orcamento
+            if ms > orcamento:
+                falhas.append(f"{consulta.nome}: {ms:.1f} ms acima do orçamento de {orcamento:.0f} ms")
+                problemas.append("orçamento")
+
+            anterior = referencia.get(consulta.nome)
+            if anterior and anterior["impressao_digital"] != resultados[consulta.nome]["impressao_digital"]:
+                avisos.append(f"{consulta.nome}: plano mudou\n    antes:  {anterior['forma']}\n    agora:  {digital}")
+                problemas.append("plano mudou")
+            if anterior and ms > anterior["ms"] * args.tolerancia and ms - anterior["ms"] > 1:
+                avisos.append(f"{consulta.nome}: {ms:.1f} ms contra {anterior['ms']:.1f} ms da referência")
+                problemas.append("mais lenta")
+
+            print(f"{'❌' if problemas else '✅'} {consulta.nome:<34} {ms:>9.2f} ms  "
+                  f"{buffers(raiz):>8} buffers  {' / '.join(problemas)}")
+            if args.verbose:
+                print(f"    {digital}")
+
+        await transacao.rollback()
+
+    for aviso in avisos:
+        print(f"⚠️  {aviso}")
+    for falha in falhas:
+        print(f"❌ {falha}")
+
+    if args.atualizar:
+        # uma referência gravada com Seq Scan ou fora do orçamento fixaria a regressão
+        if falhas:
+            print(f"❌ referência não gravada: corrija as falhas acima antes de atualizar {REFERENCIA.name}")
+            return 1
+        referencia.update(resultados)
+        REFERENCIA.write_text(json.dumps(referencia, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"referência gravada em {REFERENCIA}")
+        return 0
+    return 1 if falhas or (args.estrito and avisos) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regressão de planos das consultas quentes")
+    parser.add_argument("--consultas", nargs="+", choices=[c.nome for c in CONSULTAS], default=None)
+    parser.add_argument("--repeticoes", type=int, default=5, help="execuções por consulta (vale a mediana)")
+    parser.add_argument("--fator-orcamento", type=float, default=1.0, help="multiplica os orçamentos (máquinas lentas)")
+    parser.add_argument("--tolerancia", type=float, default=2.0, help="quantas vezes o tempo da referência vira aviso")
+    parser.add_argument("--estrito", action="store_true", help="avisos (plano mudou, mais lenta) também falham")
+    parser.add_argument("--atualizar", action="store_true", help="grava os resultados como nova referência")
+    parser.add_argument("--verbose", "-v", action="store_true", help="mostra a forma de cada plano")
+    parser.add_argument("--codigo-inicial", type=int, default=800_000_000, help="início da faixa da massa sintética")
+    parser.add_argument("--produtos-maximo", type=int, default=10_000_000)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
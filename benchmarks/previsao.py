@@ -0,0 +1,100 @@
+"""
+Benchmark do job de previsão de demanda (app/core/previsao.py): carrega as
+séries uma vez e mede o tempo de parede do ajuste no pool de processos para
+cada combinação de quantidade de produtos e de processos. "0 processos" é o
+ajuste no próprio processo, sem pool, como referência; o tempo de subir o
+pool (spawn) é medido à parte, porque no app ele é pago uma vez só.
+Nada é gravado no banco. O resultado vai para
+benchmarks/resultados/previsao-<data>.json.
+Execute: python -m benchmarks.dados_sinteticos --produtos 50000 --recebimentos 5000000
+         python -m benchmarks.previsao --produtos 1000 5000 20000 --processos 0 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.core.database import engine
+from app.core.previsao import calcular_previsoes, carregar_series, criar_pool, prever_fatia
+
+RESULTADOS = Path(__file__).parent / "resultados"
+
+
+async def medir(series: list, dias: int, processos: int, repeticoes: int) -> dict:
+    if processos == 0:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            prever_fatia(series, dias)
+        return {"subida_pool_s": 0.0, "ajuste_s": (time.perf_counter() - inicio) / repeticoes}
+
+    inicio = time.perf_counter()
+    pool = criar_pool(processos)
+    # uma tarefa por processo só para que todos subam antes da medição
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(pool, prever_fatia, [], dias) for _ in range(processos)])
+    subida = time.perf_counter() - inicio
+    try:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            await calcular_previsoes(series, dias, pool, processos)
+        return {"subida_pool_s": subida, "ajuste_s": (time.perf_counter() - inicio) / repeticoes}
+    finally:
+        pool.shutdown()
+
+
+async def main(args):
+    inicio = time.perf_counter()
+    async with engine.connect() as conn:
+        todas, dias = await carregar_series(conn)
+    carga = time.perf_counter() - inicio
+    if not todas:
+        print("❌ Nenhuma saída no período: rode antes python -m benchmarks.dados_sinteticos")
+        return 1
+    print(f"{len(todas)} séries de {dias} dias carregadas em {carga:.2f}s ({os.cpu_count()} CPUs)")
+    print(f"{'produtos':>9} {'processos':>9} {'subida pool':>12} {'ajuste':>9} {'produtos/s':>11} {'speedup':>8}")
+
+    resultados = []
+    for produtos in args.produtos:
+        series = todas[:produtos]
+        referencia = None
+        for processos in args.processos:
+            medida = await medir(series, dias, processos, args.repeticoes)
+            if referencia is None:
+                referencia = medida["ajuste_s"]
+            resultado = {
+                "produtos": len(series),
+                "processos": processos,
+                "subida_pool_s": round(medida["subida_pool_s"], 3),
+                "ajuste_s": round(medida["ajuste_s"], 3),
+                "produtos_por_s": round(len(series) / medida["ajuste_s"], 1),
+                "speedup": round(referencia / medida["ajuste_s"], 2),
+            }
+            resultados.append(resultado)
+            print(f"{resultado['produtos']:>9} {processos:>9} {resultado['subida_pool_s']:>11.2f}s "
+                  f"{resultado['ajuste_s']:>8.2f}s {resultado['produtos_por_s']:>11.0f} {resultado['speedup']:>7.2f}x")
+
+    saida = Path(args.saida) if args.saida else RESULTADOS / f"previsao-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps({
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "cpus": os.cpu_count(),
+        "dias": dias,
+        "carga_series_s": round(carga, 3),
+        "resultados": resultados,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"resultado salvo em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo do job de previsão por quantidade de produtos e de processos")
+    parser.add_argument("--produtos", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--processos", type=int, nargs="+", default=sorted({0, 1, 2, os.cpu_count() or 1}),
+                        help="0 = sem pool, no próprio processo")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do resultado")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,59 @@
+# migrations/env.py
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import DATABASE_URL, Base
+import app.models  # noqa: F401  registra as tabelas no metadata para o --autogenerate
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def incluir_objeto(objeto, nome, tipo, refletido, comparado):
+    # FactAdicionar, LoginsAtivos, VersaoProdutos e AlteracoesProdutos existem só no banco (sem model): o autogenerate não deve propor apagá-las
+    if tipo == "table" and refletido and comparado is None:
+        return False
+    return True
+
+
+def _configurar(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=incluir_objeto,
+        compare_type=True,
+        # cada migração na sua transação, para que autocommit_block (CREATE INDEX CONCURRENTLY) funcione
+        transaction_per_migration=True,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    _configurar(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _executar(connection) -> None:
+    _configurar(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(_executar)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
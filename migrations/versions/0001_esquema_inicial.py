@@ -0,0 +1,118 @@
+"""esquema inicial
+
+As tabelas de wmsSrpit.txt, como o esquema foi distribuído antes das
+migrações (sem as inserções iniciais; a view vw_EstoqueReal vem na 0003).
+Bancos já existentes, criados a partir desse arquivo, não rodam esta
+migração: alembic stamp 0001_esquema_inicial e depois alembic upgrade head
+(ver README.md).
+
+Revision ID: 0001_esquema_inicial
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_esquema_inicial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dimusuario",
+        sa.Column("idusuario", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("nome", sa.String(255), nullable=False),
+        sa.Column("senha", sa.String(255), nullable=False),
+        sa.Column("datanasc", sa.Date(), nullable=True),
+        sa.Column("dataentrada", sa.Date(), nullable=True),
+    )
+    op.create_table(
+        "dimprofessor",
+        sa.Column("sn", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("nome", sa.String(255), nullable=False),
+        sa.Column("senha", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+    )
+    op.create_table(
+        "factadicionar",
+        sa.Column("idadicionar", sa.BigInteger(), primary_key=True),
+        sa.Column("idusuario", sa.Integer(), nullable=False),
+        sa.Column("sn", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "dimcategoria",
+        sa.Column("idcategoria", sa.BigInteger(), primary_key=True),
+        sa.Column("categoria", sa.String(255), nullable=False),
+    )
+    op.create_table(
+        "dimproduto",
+        sa.Column("codigo", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("nome_basico", sa.String(255), nullable=False),
+        sa.Column("nome_modificador", sa.String(255), nullable=True),
+        sa.Column("descricao_tecnica", sa.Text(), nullable=True),
+        sa.Column("fabricante", sa.String(255), nullable=True),
+        sa.Column("observacoes_adicional", sa.Text(), nullable=True),
+        sa.Column("imagem", sa.LargeBinary(), nullable=True),
+        sa.Column("unidade", sa.String(50), nullable=True),
+        sa.Column("preco_de_venda", sa.Numeric(10, 2), nullable=True),
+        sa.Column("fragilidade", sa.Boolean(), nullable=True),
+        sa.Column("inserido_por", sa.String(255), nullable=False),
+        sa.Column("rua", sa.Integer(), nullable=True),
+        sa.Column("coluna", sa.Integer(), nullable=True),
+        sa.Column("andar", sa.Integer(), nullable=True),
+        sa.Column("altura", sa.Float(), nullable=True),
+        sa.Column("largura", sa.Float(), nullable=True),
+        sa.Column("profundidade", sa.Float(), nullable=True),
+        sa.Column("peso", sa.Float(), nullable=True),
+    )
+    op.create_table(
+        "factcategoria",
+        sa.Column("idcategoriaproduto", sa.BigInteger(), primary_key=True),
+        sa.Column("codigo", sa.BigInteger(), nullable=False),
+        sa.Column("idcategoria", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "factrecebimento",
+        sa.Column("idrecebimento", sa.BigInteger(), primary_key=True),
+        sa.Column("data_receb", sa.Date(), nullable=False),
+        sa.Column("quant", sa.BigInteger(), nullable=False),
+        sa.Column("codigo", sa.BigInteger(), nullable=False),
+        sa.Column("validade", sa.Date(), nullable=False),
+        sa.Column("preco_de_aquisicao", sa.Numeric(10, 2), nullable=False),
+        sa.Column("lote", sa.String(30), nullable=False),
+        sa.Column("fornecedor", sa.String(255), nullable=True),
+    )
+    op.create_table(
+        "loginsativos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("usuarioemail", sa.String(255), nullable=False),
+        sa.Column("logintimestamp", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.Column("logouttimestamp", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "factsaidas",
+        sa.Column("idrecebimento", sa.Integer(), primary_key=True),
+        sa.Column("data_saida", sa.Date(), nullable=False),
+        sa.Column("quant", sa.BigInteger(), nullable=False),
+        sa.Column("lote", sa.String(30), nullable=False),
+        sa.Column("codigo", sa.BigInteger(), nullable=False),
+        sa.Column("fornecedor", sa.String(255), nullable=True),
+    )
+
+    # RELACIONAMENTOS de wmsSrpit.txt, com os mesmos nomes
+    op.create_foreign_key("fk_adicionar_sn", "factadicionar", "dimprofessor", ["sn"], ["sn"])
+    op.create_foreign_key("fk_adicionar_usuario", "factadicionar", "dimusuario", ["idusuario"], ["idusuario"])
+    op.create_foreign_key("fk_categoria_produto", "factcategoria", "dimproduto", ["codigo"], ["codigo"])
+    op.create_foreign_key("fk_categoria_categoria", "factcategoria", "dimcategoria", ["idcategoria"], ["idcategoria"])
+    op.create_foreign_key("fk_recebimento_produto", "factrecebimento", "dimproduto", ["codigo"], ["codigo"])
+
+
+def downgrade() -> None:
+    for tabela in (
+        "factsaidas", "loginsativos", "factrecebimento", "factcategoria",
+        "dimproduto", "dimcategoria", "factadicionar", "dimprofessor", "dimusuario",
+    ):
+        op.drop_table(tabela)
@@ -0,0 +1,71 @@
+"""saldos por lote e movimento diário
+
+Tabelas materializadas que o app mantém a cada recebimento e saída:
+saldoestoque (saldo por produto, lote e fornecedor) e movimentodiario
+(totais por dia e produto para o gráfico de /telaInicial). Elas não
+existem no esquema original (0001): são criadas vazias e o app as preenche
+a partir de FactRecebimento/FactSaidas na primeira inicialização
+(inicializar_saldos em app/core/estoque.py).
+
+Também acerta no esquema original o que o app já supunha: a coluna
+dimusuario.inserido_por (gravada pelo cadastro de usuários), validade
+opcional nos recebimentos e ON DELETE CASCADE nas chaves de FactCategoria
+e FactRecebimento para DimProduto.
+
+Revision ID: 0002_saldos_movimento
+Revises: 0001_esquema_inicial
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_saldos_movimento"
+down_revision = "0001_esquema_inicial"
+branch_labels = None
+depends_on = None
+
+
+def _chave_produto(tabela: str, nome: str, ondelete: str | None) -> None:
+    op.drop_constraint(nome, tabela, type_="foreignkey")
+    op.create_foreign_key(nome, tabela, "dimproduto", ["codigo"], ["codigo"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: bancos criados pelo create_all de versões antigas do app já têm a coluna
+    op.execute("ALTER TABLE dimusuario ADD COLUMN IF NOT EXISTS inserido_por varchar(255)")
+    op.alter_column("factrecebimento", "validade", existing_type=sa.Date(), nullable=True)
+    _chave_produto("factcategoria", "fk_categoria_produto", "CASCADE")
+    _chave_produto("factrecebimento", "fk_recebimento_produto", "CASCADE")
+
+    op.create_table(
+        "saldoestoque",
+        sa.Column("idsaldo", sa.BigInteger(), primary_key=True),
+        sa.Column("codigo", sa.BigInteger(), sa.ForeignKey("dimproduto.codigo", ondelete="CASCADE"), nullable=False),
+        sa.Column("lote", sa.String(30), nullable=False),
+        sa.Column("fornecedor", sa.String(255), nullable=True),
+        sa.Column("validade", sa.Date(), nullable=True),
+        sa.Column("quant_recebida", sa.BigInteger(), nullable=False),
+        sa.Column("quant_saida", sa.BigInteger(), nullable=False),
+        sa.Column("saldo", sa.BigInteger(), sa.Computed("quant_recebida - quant_saida")),
+        sa.Column("data_ultimo_receb", sa.Date(), nullable=True),
+        sa.Column("quant_ultimo_receb", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("codigo", "lote", "fornecedor", name="uq_saldoestoque_lote", postgresql_nulls_not_distinct=True),
+    )
+    op.create_table(
+        "movimentodiario",
+        sa.Column("dia", sa.Date(), primary_key=True),
+        sa.Column("codigo", sa.BigInteger(), sa.ForeignKey("dimproduto.codigo", ondelete="CASCADE"), primary_key=True),
+        sa.Column("quant_recebida", sa.BigInteger(), nullable=False),
+        sa.Column("quant_saida", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_movimentodiario_codigo_dia", "movimentodiario", ["codigo", "dia"])
+
+
+def downgrade() -> None:
+    op.drop_table("movimentodiario")
+    op.drop_table("saldoestoque")
+
+    _chave_produto("factrecebimento", "fk_recebimento_produto", None)
+    _chave_produto("factcategoria", "fk_categoria_produto", None)
+    # validade continua opcional: recebimentos sem validade não voltariam ao NOT NULL
+    op.drop_column("dimusuario", "inserido_por")
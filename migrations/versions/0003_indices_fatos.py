@@ -0,0 +1,95 @@
+"""índices das tabelas de fatos e view vw_EstoqueReal
+
+Índices compostos por produto nos caminhos de acesso das consultas
+(filtro por codigo, somas por codigo/fornecedor/lote em /lotes/, recálculo
+de saldo por lote), criados com CONCURRENTLY para não travar escritas em
+tabelas grandes. Substituem os índices (codigo, fornecedor) criados à mão
+em bancos antigos, se existirem.
+
+Revision ID: 0003_indices_fatos
+Revises: 0002_saldos_movimento
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003_indices_fatos"
+down_revision = "0002_saldos_movimento"
+branch_labels = None
+depends_on = None
+
+INDICES = [
+    ("ix_factrecebimento_codigo_fornecedor_lote", "factrecebimento", ["codigo", "fornecedor", "lote"]),
+    ("ix_factsaidas_codigo_fornecedor_lote", "factsaidas", ["codigo", "fornecedor", "lote"]),
+    ("ix_factcategoria_codigo", "factcategoria", ["codigo"]),
+]
+SUBSTITUIDOS = [
+    ("ix_factrecebimento_codigo_fornecedor", "factrecebimento"),
+    ("ix_factsaidas_codigo_fornecedor", "factsaidas"),
+]
+
+VIEW_ESTOQUE_REAL = """
+    CREATE OR REPLACE VIEW vw_EstoqueReal AS
+    WITH CTE_RecebimentosAgrupados AS (
+        SELECT
+            CODIGO,
+            DATA_RECEB,
+            SUM(QUANT) AS TOTAL_QUANT_RECEB
+        FROM
+            FactRecebimento
+        GROUP BY
+            CODIGO,
+            DATA_RECEB
+    ),
+    CTE_SaidasAgrupadas AS (
+        SELECT
+            CODIGO,
+            SUM(QUANT) AS TOTAL_QUANT_SAIDA
+        FROM
+            FactSaidas
+        GROUP BY
+            CODIGO
+    ),
+    CTE_QuantidadesMaisRecentes AS (
+        SELECT
+            CODIGO,
+            TOTAL_QUANT_RECEB,
+            ROW_NUMBER() OVER (PARTITION BY CODIGO ORDER BY DATA_RECEB DESC) AS RowNum
+        FROM
+            CTE_RecebimentosAgrupados
+    )
+    SELECT
+        dp.CODIGO AS codigo,
+        dp.NOME_BASICO AS nome_basico,
+        COALESCE(SUM(fr.QUANT), 0) - COALESCE(sa.TOTAL_QUANT_SAIDA, 0) AS quantidade,
+        COALESCE(qmr.TOTAL_QUANT_RECEB, 0) AS quant_recente
+    FROM
+        DimProduto dp
+    LEFT JOIN
+        FactRecebimento fr ON dp.CODIGO = fr.CODIGO
+    LEFT JOIN
+        CTE_SaidasAgrupadas sa ON dp.CODIGO = sa.CODIGO
+    LEFT JOIN
+        CTE_QuantidadesMaisRecentes qmr ON dp.CODIGO = qmr.CODIGO AND qmr.RowNum = 1
+    GROUP BY
+        dp.CODIGO,
+        dp.NOME_BASICO,
+        sa.TOTAL_QUANT_SAIDA,
+        qmr.TOTAL_QUANT_RECEB
+"""
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas in INDICES:
+            op.create_index(nome, tabela, colunas, postgresql_concurrently=True, if_not_exists=True)
+        for nome, tabela in SUBSTITUIDOS:
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
+    op.execute(VIEW_ESTOQUE_REAL)
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW IF EXISTS vw_EstoqueReal")
+    with op.get_context().autocommit_block():
+        for nome, tabela, _ in INDICES:
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
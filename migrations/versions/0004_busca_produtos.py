@@ -0,0 +1,76 @@
+"""busca textual de produtos
+
+Coluna gerada dimproduto.busca (tsvector em português, sem acentos, com
+peso A para o nome, B para modificador e fabricante e C para a descrição)
+e índice GIN para GET /api/produtos/buscar. A remoção de acentos é feita
+por sem_acento(), uma função SQL imutável com translate(), para não
+depender da extensão unaccent. Se a extensão pg_trgm estiver disponível no
+servidor, cria também o índice de trigramas do nome usado na busca
+aproximada (erros de digitação); sem ela a rota só faz a busca textual.
+
+Adicionar a coluna gerada reescreve dimproduto (trava a tabela durante a
+migração); os índices são criados com CONCURRENTLY.
+
+Revision ID: 0004_busca_produtos
+Revises: 0003_indices_fatos
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004_busca_produtos"
+down_revision = "0003_indices_fatos"
+branch_labels = None
+depends_on = None
+
+FUNCAO_SEM_ACENTO = """
+    CREATE OR REPLACE FUNCTION sem_acento(texto text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$
+        SELECT translate(
+            texto,
+            'áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ',
+            'aaaaaeeeeiiiiooooouuuucnAAAAAEEEEIIIIOOOOOUUUUCN'
+        )
+    $$
+"""
+
+# mesma expressão de DimProduto.busca (app/models/produto.py)
+EXPRESSAO_BUSCA = (
+    "setweight(to_tsvector('portuguese', sem_acento(coalesce(nome_basico, ''))), 'A') || "
+    "setweight(to_tsvector('portuguese', sem_acento(coalesce(nome_modificador, ''))), 'B') || "
+    "setweight(to_tsvector('portuguese', sem_acento(coalesce(fabricante, ''))), 'B') || "
+    "setweight(to_tsvector('portuguese', sem_acento(coalesce(descricao_tecnica, ''))), 'C')"
+)
+
+
+def _trigramas_disponiveis() -> bool:
+    bind = op.get_bind()
+    return bool(bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar())
+
+
+def upgrade() -> None:
+    op.execute(FUNCAO_SEM_ACENTO)
+    op.add_column("dimproduto", sa.Column("busca", postgresql.TSVECTOR(), sa.Computed(EXPRESSAO_BUSCA, persisted=True)))
+    trigramas = _trigramas_disponiveis()
+    if trigramas:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_dimproduto_busca", "dimproduto", ["busca"],
+            postgresql_using="gin", postgresql_concurrently=True, if_not_exists=True,
+        )
+        if trigramas:
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_dimproduto_nome_trgm "
+                "ON dimproduto USING gin (lower(sem_acento(nome_basico)) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_dimproduto_nome_trgm")
+        op.drop_index("ix_dimproduto_busca", table_name="dimproduto", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("dimproduto", "busca")
+    op.execute("DROP FUNCTION IF EXISTS sem_acento(text)")
@@ -0,0 +1,53 @@
+"""versão do cadastro de produtos
+
+Tabela de uma linha (versaoprodutos) com um contador incrementado por
+gatilho a cada INSERT, DELETE ou UPDATE de codigo/nome_basico em
+dimproduto. Cada worker guarda o índice de autocomplete em memória
+(app/core/autocompletar.py) e consulta esse contador periodicamente para
+saber quando outro worker alterou o cadastro. O contador é transacional:
+a versão nova só aparece junto com os dados que a geraram.
+
+Revision ID: 0005_versao_produtos
+Revises: 0004_busca_produtos
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_versao_produtos"
+down_revision = "0004_busca_produtos"
+branch_labels = None
+depends_on = None
+
+FUNCAO_INCREMENTAR = """
+    CREATE OR REPLACE FUNCTION incrementar_versao_produtos() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE versaoprodutos SET versao = versao + 1 WHERE id = 1;
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "versaoprodutos",
+        sa.Column("id", sa.SmallInteger(), primary_key=True, autoincrement=False),
+        sa.Column("versao", sa.BigInteger(), nullable=False),
+        sa.CheckConstraint("id = 1", name="ck_versaoprodutos_uma_linha"),
+    )
+    op.execute("INSERT INTO versaoprodutos (id, versao) VALUES (1, 0)")
+    op.execute(FUNCAO_INCREMENTAR)
+    # por comando, não por linha: uma importação em lote incrementa uma vez só
+    op.execute(
+        "CREATE TRIGGER tg_dimproduto_versao "
+        "AFTER INSERT OR DELETE OR UPDATE OF codigo, nome_basico ON dimproduto "
+        "FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_produtos()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS tg_dimproduto_versao ON dimproduto")
+    op.execute("DROP FUNCTION IF EXISTS incrementar_versao_produtos()")
+    op.drop_table("versaoprodutos")
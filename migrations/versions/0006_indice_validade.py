@@ -0,0 +1,36 @@
+"""índice parcial de validade dos saldos por lote
+
+Para GET /lotes/vencendo: lotes com saldo positivo e validade informada,
+ordenados por validade, com as colunas da resposta no próprio índice
+(INCLUDE). Só entram no índice os lotes que ainda têm o que vencer, então
+ele não cresce com o histórico de lotes zerados. Criado com CONCURRENTLY.
+
+Revision ID: 0006_indice_validade
+Revises: 0005_versao_produtos
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_indice_validade"
+down_revision = "0005_versao_produtos"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_saldoestoque_validade_disponivel", "saldoestoque", ["validade"],
+            postgresql_where=sa.text("saldo > 0 AND validade IS NOT NULL"),
+            postgresql_include=["codigo", "lote", "fornecedor", "saldo"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_saldoestoque_validade_disponivel", table_name="saldoestoque",
+            postgresql_concurrently=True, if_exists=True,
+        )
@@ -0,0 +1,48 @@
+"""previsão de demanda
+
+Tabelas do job de previsão (app/core/previsao.py): previsaoexecucao, uma
+linha por execução, e previsaodemanda, a previsão de cada produto naquela
+execução. As execuções antigas são apagadas pelo próprio job (as previsões
+vão junto, ON DELETE CASCADE).
+
+Revision ID: 0007_previsao_demanda
+Revises: 0006_indice_validade
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_previsao_demanda"
+down_revision = "0006_indice_validade"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "previsaoexecucao",
+        sa.Column("idexecucao", sa.BigInteger(), primary_key=True),
+        sa.Column("iniciada_em", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("concluida_em", sa.DateTime(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("produtos", sa.Integer(), nullable=False),
+        sa.Column("processos", sa.Integer(), nullable=False),
+        sa.Column("duracao_s", sa.Float(), nullable=True),
+        sa.Column("erro", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "previsaodemanda",
+        sa.Column("idexecucao", sa.BigInteger(), sa.ForeignKey("previsaoexecucao.idexecucao", ondelete="CASCADE"), primary_key=True),
+        sa.Column("codigo", sa.BigInteger(), sa.ForeignKey("dimproduto.codigo", ondelete="CASCADE"), primary_key=True),
+        sa.Column("metodo", sa.String(20), nullable=False),
+        sa.Column("alfa", sa.Float(), nullable=True),
+        sa.Column("previsao_diaria", sa.Float(), nullable=False),
+        sa.Column("demanda_media", sa.Float(), nullable=False),
+        sa.Column("erro_medio", sa.Float(), nullable=True),
+        sa.Column("dias_com_demanda", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("previsaodemanda")
+    op.drop_table("previsaoexecucao")
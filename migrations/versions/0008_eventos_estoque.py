@@ -0,0 +1,136 @@
+"""eventos de estoque (LISTEN/NOTIFY)
+
+Gatilhos por comando (com tabelas de transição) em saldoestoque e
+dimproduto que publicam no canal eventos_estoque as mudanças de saldo por
+lote e as alterações de produto, para o stream GET /eventos/estoque
+(app/core/eventos.py). O NOTIFY é transacional: o evento só chega aos
+workers depois do commit e nunca sai de uma transação desfeita.
+
+O payload é um array JSON de eventos, dividido em vários NOTIFY para
+ficar abaixo do limite de 8000 bytes. Um comando que altera mais de
+MAXIMO_POR_COMANDO linhas (reconstrução dos saldos, importações grandes)
+publica um único evento "ressincronizar" em vez de um por lote.
+
+Revision ID: 0008_eventos_estoque
+Revises: 0007_previsao_demanda
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0008_eventos_estoque"
+down_revision = "0007_previsao_demanda"
+branch_labels = None
+depends_on = None
+
+MAXIMO_POR_COMANDO = 5000
+
+FUNCAO_PUBLICAR = """
+    CREATE OR REPLACE FUNCTION publicar_eventos_estoque(eventos text[]) RETURNS void
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        evento text;
+        pacote text := '';
+    BEGIN
+        FOREACH evento IN ARRAY eventos LOOP
+            IF pacote <> '' AND octet_length(pacote) + octet_length(evento) > 7000 THEN
+                PERFORM pg_notify('eventos_estoque', '[' || pacote || ']');
+                pacote := '';
+            END IF;
+            pacote := CASE WHEN pacote = '' THEN evento ELSE pacote || ',' || evento END;
+        END LOOP;
+        IF pacote <> '' THEN
+            PERFORM pg_notify('eventos_estoque', '[' || pacote || ']');
+        END IF;
+    END
+    $$
+"""
+
+FUNCAO_SALDO = f"""
+    CREATE OR REPLACE FUNCTION notificar_saldo_estoque() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        eventos text[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            eventos := ARRAY(
+                SELECT json_build_object('tipo', 'saldo', 'codigo', n.codigo, 'lote', n.lote,
+                                         'fornecedor', n.fornecedor, 'delta', n.saldo, 'saldo', n.saldo)::text
+                FROM novos n WHERE n.saldo <> 0 LIMIT {MAXIMO_POR_COMANDO + 1}
+            );
+        ELSIF TG_OP = 'UPDATE' THEN
+            eventos := ARRAY(
+                SELECT json_build_object('tipo', 'saldo', 'codigo', n.codigo, 'lote', n.lote,
+                                         'fornecedor', n.fornecedor, 'delta', n.saldo - a.saldo, 'saldo', n.saldo)::text
+                FROM novos n JOIN antigos a ON a.idsaldo = n.idsaldo
+                WHERE n.saldo <> a.saldo LIMIT {MAXIMO_POR_COMANDO + 1}
+            );
+        ELSE
+            eventos := ARRAY(
+                SELECT json_build_object('tipo', 'saldo', 'codigo', a.codigo, 'lote', a.lote,
+                                         'fornecedor', a.fornecedor, 'delta', -a.saldo, 'saldo', 0)::text
+                FROM antigos a WHERE a.saldo <> 0 LIMIT {MAXIMO_POR_COMANDO + 1}
+            );
+        END IF;
+        IF cardinality(eventos) > {MAXIMO_POR_COMANDO} THEN
+            eventos := ARRAY['{{"tipo": "ressincronizar"}}'];
+        END IF;
+        PERFORM publicar_eventos_estoque(eventos);
+        RETURN NULL;
+    END
+    $$
+"""
+
+FUNCAO_PRODUTO = f"""
+    CREATE OR REPLACE FUNCTION notificar_produto() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        eventos text[];
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            eventos := ARRAY(
+                SELECT json_build_object('tipo', 'produto', 'codigo', a.codigo, 'removido', true)::text
+                FROM antigos a LIMIT {MAXIMO_POR_COMANDO + 1}
+            );
+        ELSE
+            eventos := ARRAY(
+                SELECT json_build_object('tipo', 'produto', 'codigo', n.codigo)::text
+                FROM novos n LIMIT {MAXIMO_POR_COMANDO + 1}
+            );
+        END IF;
+        IF cardinality(eventos) > {MAXIMO_POR_COMANDO} THEN
+            eventos := ARRAY['{{"tipo": "ressincronizar"}}'];
+        END IF;
+        PERFORM publicar_eventos_estoque(eventos);
+        RETURN NULL;
+    END
+    $$
+"""
+
+# tabelas de transição não aceitam mais de um evento por gatilho: um gatilho por operação
+GATILHOS = [
+    ("tg_saldoestoque_eventos_insert", "saldoestoque", "INSERT", "NEW TABLE AS novos", "notificar_saldo_estoque"),
+    ("tg_saldoestoque_eventos_update", "saldoestoque", "UPDATE", "OLD TABLE AS antigos NEW TABLE AS novos", "notificar_saldo_estoque"),
+    ("tg_saldoestoque_eventos_delete", "saldoestoque", "DELETE", "OLD TABLE AS antigos", "notificar_saldo_estoque"),
+    ("tg_dimproduto_eventos_insert", "dimproduto", "INSERT", "NEW TABLE AS novos", "notificar_produto"),
+    ("tg_dimproduto_eventos_update", "dimproduto", "UPDATE", "NEW TABLE AS novos", "notificar_produto"),
+    ("tg_dimproduto_eventos_delete", "dimproduto", "DELETE", "OLD TABLE AS antigos", "notificar_produto"),
+]
+
+
+def upgrade() -> None:
+    op.execute(FUNCAO_PUBLICAR)
+    op.execute(FUNCAO_SALDO)
+    op.execute(FUNCAO_PRODUTO)
+    for nome, tabela, operacao, transicao, funcao in GATILHOS:
+        op.execute(
+            f"CREATE TRIGGER {nome} AFTER {operacao} ON {tabela} "
+            f"REFERENCING {transicao} FOR EACH STATEMENT EXECUTE FUNCTION {funcao}()"
+        )
+
+
+def downgrade() -> None:
+    for nome, tabela, *_ in reversed(GATILHOS):
+        op.execute(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+    op.execute("DROP FUNCTION IF EXISTS notificar_produto()")
+    op.execute("DROP FUNCTION IF EXISTS notificar_saldo_estoque()")
+    op.execute("DROP FUNCTION IF EXISTS publicar_eventos_estoque(text[])")
@@ -0,0 +1,28 @@
+"""hash da imagem do produto
+
+Coluna gerada dimproduto.imagem_md5 = md5(imagem), calculada uma vez na
+gravação da imagem, para GET /api/produtos/{codigo}/imagem montar o ETag
+e responder 304 sem ler (e descomprimir) o blob a cada revalidação.
+
+Adicionar a coluna gerada reescreve dimproduto e calcula o hash de todas
+as imagens existentes (trava a tabela durante a migração).
+
+Revision ID: 0009_hash_imagem
+Revises: 0008_eventos_estoque
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_hash_imagem"
+down_revision = "0008_eventos_estoque"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("dimproduto", sa.Column("imagem_md5", sa.Text(), sa.Computed("md5(imagem)", persisted=True)))
+
+
+def downgrade() -> None:
+    op.drop_column("dimproduto", "imagem_md5")
@@ -0,0 +1,112 @@
+"""registro de alterações do cadastro de produtos
+
+Tabela alteracoesprodutos com os códigos alterados em cada versão do
+cadastro (versaoprodutos, migração 0005), para que cada worker aplique ao
+índice de autocomplete só o que mudou desde a sua versão, em vez de reler
+dimproduto inteira a cada escrita. Os gatilhos por comando (com tabelas de
+transição) substituem o da 0005: incrementam a versão só quando codigo ou
+nome_basico mudaram de fato e gravam (versao, codigo, operacao), com
+operacao I (inserido), U (nome alterado) ou D (removido).
+
+Um comando que altera mais de MAXIMO_POR_COMANDO produtos (importações)
+grava uma única linha com codigo NULL e operacao R: os workers remontam o
+índice inteiro. Ficam guardadas só as últimas VERSOES_MANTIDAS versões; um
+worker que ficar mais atrás que isso também remonta tudo.
+
+Revision ID: 0010_alteracoes_produtos
+Revises: 0009_hash_imagem
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_alteracoes_produtos"
+down_revision = "0009_hash_imagem"
+branch_labels = None
+depends_on = None
+
+MAXIMO_POR_COMANDO = 5000
+VERSOES_MANTIDAS = 1000
+
+# UPDATE: código que sumiu é remoção, código novo ou com outro nome é alteração; as
+# demais colunas não importam. O gatilho de UPDATE não pode ter lista de colunas
+# junto com tabelas de transição, então a comparação fica aqui.
+ALTERACOES_UPDATE = """
+    SELECT a.codigo, 'D' AS operacao FROM antigos a
+    WHERE NOT EXISTS (SELECT 1 FROM novos n WHERE n.codigo = a.codigo)
+    UNION ALL
+    SELECT n.codigo, 'U' FROM novos n
+    WHERE NOT EXISTS (SELECT 1 FROM antigos a WHERE a.codigo = n.codigo AND a.nome_basico = n.nome_basico)
+"""
+
+FUNCAO_REGISTRAR = f"""
+    CREATE OR REPLACE FUNCTION registrar_alteracoes_produtos() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        nova bigint;
+        total bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO total FROM novos;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT count(*) INTO total FROM antigos;
+        ELSE
+            SELECT count(*) INTO total FROM ({ALTERACOES_UPDATE}) alteracoes;
+        END IF;
+        IF total = 0 THEN
+            RETURN NULL;
+        END IF;
+
+        UPDATE versaoprodutos SET versao = versao + 1 WHERE id = 1 RETURNING versao INTO nova;
+        IF total > {MAXIMO_POR_COMANDO} THEN
+            INSERT INTO alteracoesprodutos (versao, codigo, operacao) VALUES (nova, NULL, 'R');
+        ELSIF TG_OP = 'INSERT' THEN
+            INSERT INTO alteracoesprodutos (versao, codigo, operacao) SELECT nova, codigo, 'I' FROM novos;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO alteracoesprodutos (versao, codigo, operacao) SELECT nova, codigo, 'D' FROM antigos;
+        ELSE
+            INSERT INTO alteracoesprodutos (versao, codigo, operacao)
+            SELECT nova, codigo, operacao FROM ({ALTERACOES_UPDATE}) alteracoes;
+        END IF;
+        DELETE FROM alteracoesprodutos WHERE versao <= nova - {VERSOES_MANTIDAS};
+        RETURN NULL;
+    END
+    $$
+"""
+
+GATILHOS = [
+    ("tg_dimproduto_alteracoes_insert", "INSERT", "NEW TABLE AS novos"),
+    ("tg_dimproduto_alteracoes_update", "UPDATE", "OLD TABLE AS antigos NEW TABLE AS novos"),
+    ("tg_dimproduto_alteracoes_delete", "DELETE", "OLD TABLE AS antigos"),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "alteracoesprodutos",
+        sa.Column("versao", sa.BigInteger(), nullable=False),
+        sa.Column("codigo", sa.BigInteger(), nullable=True),
+        sa.Column("operacao", sa.CHAR(1), nullable=False),
+    )
+    op.create_index("ix_alteracoesprodutos_versao", "alteracoesprodutos", ["versao"])
+    op.execute(FUNCAO_REGISTRAR)
+    op.execute("DROP TRIGGER IF EXISTS tg_dimproduto_versao ON dimproduto")
+    for nome, operacao, transicao in GATILHOS:
+        op.execute(
+            f"CREATE TRIGGER {nome} AFTER {operacao} ON dimproduto "
+            f"REFERENCING {transicao} FOR EACH STATEMENT EXECUTE FUNCTION registrar_alteracoes_produtos()"
+        )
+
+
+def downgrade() -> None:
+    for nome, *_ in reversed(GATILHOS):
+        op.execute(f"DROP TRIGGER IF EXISTS {nome} ON dimproduto")
+    op.execute("DROP FUNCTION IF EXISTS registrar_alteracoes_produtos()")
+    # gatilho da 0005 (incrementar_versao_produtos continua lá)
+    op.execute(
+        "CREATE TRIGGER tg_dimproduto_versao "
+        "AFTER INSERT OR DELETE OR UPDATE OF codigo, nome_basico ON dimproduto "
+        "FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_produtos()"
+    )
+    op.drop_index("ix_alteracoesprodutos_versao", table_name="alteracoesprodutos")
+    op.drop_table("alteracoesprodutos")
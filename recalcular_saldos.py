@@ -0,0 +1,46 @@
+"""
+Script para reconstruir ou verificar as tabelas derivadas dos fatos:
+saldos por lote (saldoestoque) e totais por dia (movimentodiario).
+Execute: python recalcular_saldos.py             (reconstrói tudo)
+         python recalcular_saldos.py --codigo 10 (reconstrói um produto)
+         python recalcular_saldos.py --verificar (só compara com os fatos)
+"""
+
+import argparse
+import asyncio
+from app.core.database import SessionLocal
+from app.core.estoque import recalcular_saldos, verificar_saldos, recalcular_movimentos, verificar_movimentos
+
+
+async def main(verificar: bool, codigo: int | None):
+    async with SessionLocal() as db:
+        if verificar:
+            divergencias = await verificar_saldos(db)
+            divergencias_movimentos = await verificar_movimentos(db)
+            if not divergencias and not divergencias_movimentos:
+                print("✅ Tabelas de saldos e movimento diário conferem com FactRecebimento/FactSaidas")
+                return 0
+
+            if divergencias:
+                print(f"❌ {len(divergencias)} lote(s) divergente(s):")
+                for d in divergencias:
+                    print(f"   {d}")
+            if divergencias_movimentos:
+                print(f"❌ {len(divergencias_movimentos)} dia(s)/produto(s) divergente(s) no movimento diário:")
+                for d in divergencias_movimentos:
+                    print(f"   {d}")
+            return 1
+
+        linhas = await recalcular_saldos(db, codigo)
+        dias = await recalcular_movimentos(db, codigo)
+        await db.commit()
+        print(f"✅ Saldos reconstruídos: {linhas} lote(s), {dias} dia(s)/produto(s) de movimento")
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrói ou verifica as tabelas de saldos por lote e de movimento diário")
+    parser.add_argument("--verificar", action="store_true", help="apenas compara a tabela com as tabelas de fatos")
+    parser.add_argument("--codigo", type=int, default=None, help="reconstrói apenas o produto informado")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.verificar, args.codigo)))